@@ -1,24 +1,57 @@
 import pybullet as p
-import time, os
+import time, os, sys
 import numpy as np
 from DynamicObject import DynamicObject, BreakableObject
 from predict.Model.load_VQfinal2resolutionv2 import MultiLatentEncoder, AutoDecoder
-from MeshUtils import Quaternion, load_mesh, form_mesh, merge_meshes, save_mesh
+from MeshUtils import Quaternion, form_mesh, merge_arrays, save_mesh
+import utils_config  # puts 05.Colab-Runtime on sys.path for the runtime package
+from runtime.animation import AnimationRecorder
+from runtime.shapes import release
 
 def sort_impulse(e):
     return e[9]
 
+def topContacts(contacts, impulses, k):
+    """The k contacts with the largest normal force (impulses), strongest first."""
+    order = np.arange(len(contacts))
+    if len(contacts) > k:
+        order = np.argpartition(-impulses, k - 1)[:k]
+    order = order[np.argsort(-impulses[order], kind="stable")]
+    return [contacts[j] for j in order]
+
+
+# needOutput formats: "obj" merged OBJ per object per frame (exportObjByTime),
+# "cache" poses per frame into resultPath/animation (runtime.animation; bake
+# OBJ/GLB later with python -m runtime.animation)
+ANIMATION_FORMATS = ("obj", "cache")
+
+# Stages of one StartRun step, timed separately (see printStepTimes)
+STEP_STAGES = ("step", "contacts", "impact", "export", "pacing")
 
 class BreakableWorld():
-    def __init__(self, isDirect, bulletFile = "", needOutput = True, allowAutoFracture = False, timeRange = 60, hasGravity = 0, collisionNum=1, impulseMax = 100000):
+    # realtime: pace each step to at least 1/240 s of wall time and wait 5 s before
+    # the run, as an attached GUI needs; None = only when a GUI is attached.
+    # Without it simulation time is decoupled from wall time (no sleeps at all).
+    # physicsClient: run in an existing client (reset first, left connected by
+    # StopRun) instead of connecting a new one, e.g. a batch worker's DIRECT client.
+    stepPeriod = 1. / 240.
+    startDelay = 5.
+
+    def __init__(self, isDirect, bulletFile = "", needOutput = True, allowAutoFracture = False, timeRange = 60, hasGravity = 0, collisionNum=1, impulseMax = 100000, realtime = None, animationFormat = "obj", physicsClient = None):
         self.BreakableList = []  # Move to instance variable
         self.nonPhysicsClient = -1
 
         # GUI setup
-        if (not isDirect):
+        self.ownsClient = physicsClient is None
+        if physicsClient is not None:
+            self.physicsClient = physicsClient
+            p.resetSimulation(self.physicsClient)
+        elif (not isDirect):
             self.physicsClient = p.connect(p.GUI)
         else:
             self.physicsClient = p.connect(p.DIRECT)
+        # a new or reset client has no shapes: drop whatever the shape cache held for its id
+        release(self.physicsClient)
         if (bulletFile != ""):
             # Rebuild without using Bullet
             ids = p.loadBullet(bulletFile)
@@ -31,6 +64,13 @@ class BreakableWorld():
         self.hasGravity = hasGravity
         self.collisionNum = collisionNum
         self.impulseMax = impulseMax
+        self.realtime = (not isDirect) if realtime is None else realtime
+        if animationFormat not in ANIMATION_FORMATS:
+            raise ValueError(f"animationFormat must be one of {ANIMATION_FORMATS}, got {animationFormat!r}")
+        self.animationFormat = animationFormat
+        self.recorder = None
+        self.stepTimes = dict.fromkeys(STEP_STAGES, 0.0)
+        self.steps = 0
 
     def resetGravity(self):
         if self.hasGravity > 0:
@@ -131,57 +171,59 @@ class BreakableWorld():
 
     threshold = 2000
 
-    def catchImpact(self, timeFrame, impactList, bid_tar):
-        print(str(timeFrame) + " : " + str(len(impactList)))
-        if len(impactList) > 0:
-            # print(impactList[0][9])
-            totalImpulseList = []
-            detailedImpulseList = []
-            bodyList = []
-            
-            for i in range(len(self.BreakableList)):
-                bodyList.append(self.BreakableList[i].oriObj.bid)
-                totalImpulseList.append(0)
-                detailedImpulseList.append([])
-
-            for impact in impactList:
-                for i in range(len(self.BreakableList)):
-                    if bodyList[i] == impact[1] or bodyList[i] == impact[2]: # contactFlag bodyUniqueIdA bodyUniqueIdA linkIndexA linkIndexB positionOnA positionOnB contactNormalOnB contactDistance normalForce
-                        totalImpulseList[i] += impact[9]
-                    detailedImpulseList[i].append(impact)
-                    sorted(detailedImpulseList[i], key=lambda x: x[9], reverse=True)
-
-            print(bodyList)
-            print(totalImpulseList)
-            for i in range(len(totalImpulseList)):
-                # All non-static breakable objects in the list will go through threshold
-                if self.BreakableList[i].isStatic():
-                    continue
-                if totalImpulseList[i] > self.threshold:
-                    # If breakable object is in the list, start Fire Fracturable Target
-                    body_tar = bodyList[i]
-                    if (bid_tar > -1 and body_tar == bid_tar) or (bid_tar < 0):
-                        print("fire", body_tar)
-                        tarPos, tarOrn = p.getBasePositionAndOrientation(body_tar)
-                        print(tarPos, tarOrn)
-                        # linearVelocity, angularVelocity = p.getBaseVelocity(body_tar)
-                        linearVelocity, angularVelocity = self.BreakableList[i].getLastVel()
-                        print(linearVelocity, angularVelocity)
-
-                        print(detailedImpulseList[i])
-                        if self.allowAutoFracture and len(self.BreakableList[i].fracList) <= 0:
-                            result = self.BreakableList[i].startFracturing(detailedImpulseList[i], tarPos, tarOrn, body_tar, self.collisionNum, self.impulseMax)
-                            if not result:
-                                continue
-
-                        # Fire trigger
-                        self.resetGravity()
-                        print(self.BreakableList[i].fracList)
-                        fragments = max(len(self.BreakableList[i].fracList), 1)
-                        angularVelocity = tuple(0/fragments for ti in angularVelocity)
-                        self.BreakableList[i].fractureFire(tarPos, tarOrn, linearVelocity, angularVelocity)
-                        linearVelocity, angularVelocity = p.getBaseVelocity(self.BreakableList[i].fracList[0].bid)
-                        print(linearVelocity, angularVelocity)
+    def collectImpacts(self):
+        """
+        Contact points of every breakable that can still fracture, one list per breakable.
+        Only the pairs involving that body are queried (bodyA = its intact body), so
+        PyBullet hands back its contacts rather than every contact in the world.
+        """
+        impactLists = []
+        for breakable in self.BreakableList:
+            if breakable.isStatic() or not breakable.oriObj.active:
+                impactLists.append(())
+                continue
+            impactLists.append(p.getContactPoints(bodyA=breakable.oriObj.bid, physicsClientId=self.physicsClient))
+        return impactLists
+
+    def catchImpact(self, timeFrame, impactLists, bid_tar):
+        # impactLists: per breakable, its contacts (collectImpacts), each
+        # contactFlag bodyUniqueIdA bodyUniqueIdB linkIndexA linkIndexB positionOnA positionOnB contactNormalOnB contactDistance normalForce
+        print(str(timeFrame) + " : " + str(sum(len(impacts) for impacts in impactLists)))
+        for i in range(len(impactLists)):
+            impacts = impactLists[i]
+            if len(impacts) == 0:
+                continue
+            impulses = np.fromiter((impact[9] for impact in impacts), dtype=np.float64, count=len(impacts))
+            totalImpulse = impulses.sum()
+            body_tar = self.BreakableList[i].oriObj.bid
+            print(body_tar, totalImpulse)
+            # All non-static breakable objects in the list will go through threshold
+            if totalImpulse > self.threshold:
+                # If breakable object is in the list, start Fire Fracturable Target
+                if (bid_tar > -1 and body_tar == bid_tar) or (bid_tar < 0):
+                    print("fire", body_tar)
+                    tarPos, tarOrn = p.getBasePositionAndOrientation(body_tar)
+                    print(tarPos, tarOrn)
+                    # linearVelocity, angularVelocity = p.getBaseVelocity(body_tar)
+                    linearVelocity, angularVelocity = self.BreakableList[i].getLastVel()
+                    print(linearVelocity, angularVelocity)
+
+                    # strongest contacts first, ranked once
+                    detailedImpulses = topContacts(impacts, impulses, self.collisionNum)
+                    print(detailedImpulses)
+                    if self.allowAutoFracture and len(self.BreakableList[i].fracList) <= 0:
+                        result = self.BreakableList[i].startFracturing(detailedImpulses, tarPos, tarOrn, body_tar, self.collisionNum, self.impulseMax)
+                        if not result:
+                            continue
+
+                    # Fire trigger
+                    self.resetGravity()
+                    print(self.BreakableList[i].fracList)
+                    fragments = max(len(self.BreakableList[i].fracList), 1)
+                    angularVelocity = tuple(0/fragments for ti in angularVelocity)
+                    self.BreakableList[i].fractureFire(tarPos, tarOrn, linearVelocity, angularVelocity)
+                    linearVelocity, angularVelocity = p.getBaseVelocity(self.BreakableList[i].fracList[0].bid)
+                    print(linearVelocity, angularVelocity)
         
         for breakable in self.BreakableList:
             if not breakable.isStatic and breakable.oriObj.active:
@@ -190,59 +232,98 @@ class BreakableWorld():
                 self.BreakableList[i].setLastVel(linearVelocity, angularVelocity)
                 
     def exportObjByTime(self, timeStep):
-        writeBreakableList = []
-        nameList = []
-
         for i in range(len(self.BreakableList)):
             breakable = self.BreakableList[i]
-            meshList = []
+            parts = []
             (activeList, shapeList, bodyList) = breakable.getVisualization()
-            nameList.append(breakable.name)
+            # same order as getVisualization; local meshes are cached on the objects
+            dynamicObjs = [breakable.oriObj] + breakable.fracList
             print(shapeList, activeList)
             for j in range(len(activeList)):
                 if activeList[j]:
-                    vertices, faces = load_mesh(shapeList[j])
+                    vertices, faces = dynamicObjs[j].getMesh()
                     iPos, iRot = p.getBasePositionAndOrientation(bodyList[j])
-                    
-                    q = Quaternion(iRot, is_xyzw_order=True)
 
-                    vOut = []
-                    for v in vertices:
-                        newV = np.add(q.rotate(v), iPos)
-                        vOut.append(newV)
-                    vOut = np.array(vOut)
-
-                    transformedMesh = form_mesh(vOut, faces)
-                    meshList.append(transformedMesh)
-                    
-            writeBreakableList.append(meshList)
+                    # one matmul per body instead of a quaternion rotate per vertex
+                    rotation = Quaternion(iRot, is_xyzw_order=True).to_matrix()
+                    vOut = vertices @ rotation.T
+                    vOut += iPos
+                    # processed per body (vertex merging) as the exports always were
+                    posed = form_mesh(vOut, faces)
+                    parts.append((posed.vertices, posed.faces))
 
-        for i in range(len(writeBreakableList)):
-            outMesh = merge_meshes(writeBreakableList[i])
+            # bodies are only concatenated, never merged with each other
+            vertices, faces = merge_arrays(parts)
             save_mesh(
-                os.path.join(self.resultPath, f"{nameList[i]}_{timeStep}.obj"),
-                outMesh
+                os.path.join(self.resultPath, f"{breakable.name}_{timeStep}.obj"),
+                form_mesh(vertices, faces, process=False)
             )
 
+    def recordAnimation(self, timeStep):
+        # topology once per body, then only its pose: O(bodies) per frame
+        if self.recorder is None:
+            self.recorder = AnimationRecorder(os.path.join(self.resultPath, "animation"), p.getPhysicsEngineParameters(self.physicsClient)["fixedTimeStep"])
+        poses = []
+        for breakable in self.BreakableList:
+            for obj in [breakable.oriObj] + breakable.fracList:
+                if obj.active:
+                    body = self.recorder.add_body(id(obj), breakable.name, *obj.getMesh())
+                    iPos, iRot = p.getBasePositionAndOrientation(obj.bid)
+                    poses.append((body, iPos, iRot))
+        self.recorder.record(timeStep, poses)
+
     def StartRun(self):
 
-        time.sleep(5.)
+        if self.realtime:
+            time.sleep(self.startDelay)
 
         for obj in self.BreakableList:
             obj.activate()
             # obj.activate()
 
+        times = self.stepTimes
         count = 0
+        nextStep = time.perf_counter()
         while (1):
             if count > self.timeRange:
                 break
+            t0 = time.perf_counter()
             p.stepSimulation()
-            self.catchImpact(count, p.getContactPoints(), -1)
+            t1 = time.perf_counter()
+            contacts = self.collectImpacts()
+            t2 = time.perf_counter()
+            self.catchImpact(count, contacts, -1)
+            t3 = time.perf_counter()
+            times["step"] += t1 - t0
+            times["contacts"] += t2 - t1
+            times["impact"] += t3 - t2
 
-            time.sleep(1./240.)
+            if self.realtime:
+                # sleep only what is left of this step's wall-clock slot
+                nextStep = max(nextStep + self.stepPeriod, t3)
+                time.sleep(nextStep - t3)
+                times["pacing"] += time.perf_counter() - t3
             if self.needOutput:
-                self.exportObjByTime(count)
+                t4 = time.perf_counter()
+                if self.animationFormat == "cache":
+                    self.recordAnimation(count)
+                else:
+                    self.exportObjByTime(count)
+                times["export"] += time.perf_counter() - t4
             count += 1
+        self.steps += count
+
+    def printStepTimes(self):
+        total = sum(self.stepTimes.values())
+        print("%d steps (%s), %.3f s:" % (self.steps, "real time" if self.realtime else "fast", total))
+        for stage in STEP_STAGES:
+            seconds = self.stepTimes[stage]
+            print("  %-9s %8.3f s %8.3f ms/step %5.1f%%" % (
+                stage, seconds, 1000 * seconds / max(self.steps, 1), 100 * seconds / total if total else 0.0))
 
     def StopRun(self):
-        p.disconnect(self.physicsClient)
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.ownsClient:
+            release(self.physicsClient)
+            p.disconnect(self.physicsClient)
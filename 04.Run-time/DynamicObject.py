@@ -1,9 +1,11 @@
 import pybullet as p
 import glob
-from predictshapes import predict, judge
+from predictshapes import predict, predictFromLibrary, judge
 from MeshUtils import Quaternion
 import numpy as np
-import os
+import os, sys
+import utils_config  # puts 05.Colab-Runtime on sys.path for the runtime package
+from runtime.shapes import load_arrays, shape_cache
 
 
 # Class Name Dynamic Objects
@@ -20,6 +22,9 @@ class DynamicObject():
         self.cid = -1
         self.name = name
         self.path = ""
+        # local-frame mesh (in_memory_pipeline, or path once read); used instead of path when set
+        self.vertices = None
+        self.faces = None
         self.pos = [0, 0, 0]
         self.rot = [0, 0, 0, 1]
         self.lVel = [0, 0, 0]
@@ -41,6 +46,16 @@ class DynamicObject():
         self.restitution = restitution
         self.active = False
         
+    def setMesh(self, vertices, faces):
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        self.faces = np.asarray(faces, dtype=np.int64)
+
+    def getMesh(self):
+        # local-frame mesh, read from path at most once (runtime.shapes memoizes parsed files)
+        if self.vertices is None:
+            self.setMesh(*load_arrays(self.path))
+        return self.vertices, self.faces
+
     def setPos(self, pos, rot):
         self.pos = pos
         self.rot = rot
@@ -64,24 +79,25 @@ class DynamicObject():
         scale = [1, 1, 1]
         print(self.path)
         
+        # shapes come from the client's shape cache (keyed by mesh hash; a mesh in
+        # memory goes in as arrays): the same target or a duplicate fragment is built once
+        shapeCache = shape_cache(self.physicsClient)
+        meshSource = self.path if self.vertices is None else (self.vertices, self.faces)
+
         if self.vid == -1:
-            self.vid = p.createVisualShape(shapeType=p.GEOM_MESH,
-                                                fileName=self.path,
-                                                rgbaColor=self.color,
+            self.vid = shapeCache.visual(meshSource, self.color,
                                                 specularColor=specularColor,
                                                 visualFramePosition=shift,
-                                                meshScale=scale,
-                                                physicsClientId=self.physicsClient)
+                                                meshScale=scale)
         if self.cid == -1:
-            self.cid = p.createCollisionShape(shapeType=p.GEOM_MESH,
-                                                fileName=self.path,
+            self.cid = shapeCache.collision(meshSource,
                                                 collisionFramePosition=shift,
                                                 meshScale=scale)
         if self.bid == -1:
             self.bid = p.createMultiBody(baseMass=self.mass,
                                     baseInertialFramePosition=inertialFramePos,
-                                    baseCollisionShapeIndex=self.vid,
-                                    baseVisualShapeIndex=self.cid,
+                                    baseCollisionShapeIndex=self.cid,
+                                    baseVisualShapeIndex=self.vid,
                                     basePosition=self.pos,
                                     baseOrientation=self.rot,
                                     physicsClientId=self.physicsClient)
@@ -183,6 +199,19 @@ class BreakableObject():
             self.fracList.append(obj)
             count += 1
 
+    def loadFragmentMeshes(self, meshes, physicsClient):
+        """Like loadFragments, from meshes in memory (anything with .vertices / .faces)."""
+        count = 1
+        for mesh in meshes:
+            subMass = 1 / len(meshes)
+            obj = DynamicObject("fra"+str(count), physicsClient)
+            obj.setParameter("", self.defaultHidePos, [0, 0, 0, 1], [0, 0, 0], [0, 0, 0], [0, 1, 0, 1], subMass, self.friction, self.restitution)
+            obj.setMesh(mesh.vertices, mesh.faces)
+            obj.createInstance(False)
+
+            self.fracList.append(obj)
+            count += 1
+
     def startFracturing(self, impacts, pos, iRot, index, collisionNum, impulseMax):
         # print(impact[5], pos)
 
@@ -222,12 +251,20 @@ class BreakableObject():
         # if not judge(impList, posList, dirList, collisionNum):
         #     return False
 
-        predict(self.garagePath, self.oriObj.path, self.model, impList, posList, dirList, self.isBig, self.maxValue, self.isMulShapes, self.name, collisionNum)
+        # fragments in memory (in_memory_pipeline), or None when they were written to objs/
+        fragments, cooked = predictFromLibrary(self.garagePath, self.model, impList, posList, dirList, self.isBig, self.isMulShapes, self.name, collisionNum)
+        if fragments is False:
+            # a library miss decodes the codebook entry it looked up instead of encoding again
+            fragments = predict(self.garagePath, self.oriObj.path, self.model, impList, posList, dirList, self.isBig, self.maxValue, self.isMulShapes, self.name, collisionNum, cooked)
 
-        print(os.path.join(self.garagePath, "objs", "*.obj"))
         print(os.getcwd())
         os.chdir(self.ws)
-        self.loadFragments(os.path.join(self.garagePath, "objs", "*.obj"), self.physicsClient)
+        if fragments is not None:
+            print("%d fragments in memory" % (len(fragments)))
+            self.loadFragmentMeshes(fragments, self.physicsClient)
+        else:
+            print(os.path.join(self.garagePath, "objs", "*.obj"))
+            self.loadFragments(os.path.join(self.garagePath, "objs", "*.obj"), self.physicsClient)
 
         return True
 
@@ -0,0 +1,176 @@
+import os, sys, time
+import glob
+import json
+import socket
+import subprocess
+import threading
+import atexit
+from utils_config import load_config
+
+#region Persistent Houdini boolean session
+# houdini_process.py used to be started for every fracture: Houdini's Python
+# start, `import hou` and the hrpyc connection are a multi-second fixed cost
+# per impact. The session starts MeshBoolean/houdini_server.py once under
+# Houdini's Python, keeps one localhost connection to it and sends each
+# fracture's seg/*.obj batch as a JSON line (see houdini_server.py). A server
+# that died is started again on the next request.
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MeshBoolean", "houdini_server.py")
+
+class HoudiniSession:
+    def __init__(self, pythonPath, libsPath, backend = "houdini", timeout = 300, startTimeout = 120):
+        self.pythonPath = pythonPath
+        self.libsPath = libsPath
+        self.backend = backend
+        self.timeout = timeout
+        self.startTimeout = startTimeout
+        self.process = None
+        self.conn = None
+        self.reader = None
+        self.lock = threading.Lock()
+        self.startTime = 0.0
+        self.starts = 0
+        self.processed = 0
+        self.processTime = 0.0
+
+    def startServer(self):
+        # caller holds self.lock
+        if self.process is not None and self.process.poll() is None and self.conn is not None:
+            return
+
+        self.closeConnection()
+        if self.backend == "houdini" and not os.access(self.pythonPath, os.X_OK):
+            error_msg = f"Houdini path is not executable: {self.pythonPath}"
+            print(f"ERROR: {error_msg}")
+            raise PermissionError(error_msg)
+
+        start = time.time()
+        args = [self.pythonPath, SERVER_SCRIPT, "--backend", self.backend, "--libs", self.libsPath]
+        print("Start Houdini session: ", " ".join(args))
+        self.process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, bufsize=1)
+
+        # the server's output is drained (and echoed) on a thread so its pipe never fills
+        listening = threading.Event()
+        ports = []
+        def drain(stream):
+            for line in stream:
+                if not listening.is_set() and line.startswith("LISTENING "):
+                    ports.append(int(line.split()[1]))
+                    listening.set()
+                else:
+                    print("Houdini output:", line.rstrip())
+            listening.set()
+        threading.Thread(target=drain, args=(self.process.stdout,), name="houdini-output", daemon=True).start()
+
+        if not listening.wait(self.startTimeout) or not ports:
+            self.process.kill()
+            error_msg = f"Houdini session did not start (exit code {self.process.poll()})"
+            print(f"ERROR: {error_msg}")
+            raise RuntimeError(error_msg)
+
+        self.conn = socket.create_connection(("127.0.0.1", ports[0]), timeout=self.timeout)
+        self.reader = self.conn.makefile("r", encoding="utf-8")
+        self.startTime = time.time() - start
+        self.starts += 1
+        print(f"Houdini session ready on port {ports[0]} ({self.startTime:.2f} s)")
+
+    def start(self):
+        with self.lock:
+            self.startServer()
+        return self
+
+    def request(self, payload):
+        """Send one JSON request and return the server's answer."""
+        with self.lock:
+            for attempt in range(2):
+                self.startServer()
+                try:
+                    self.conn.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+                    line = self.reader.readline()
+                    if line:
+                        break
+                except socket.timeout:
+                    # a stuck server is killed, not asked to shut down
+                    self.process.kill()
+                    self.stopServer()
+                    error_msg = f"Houdini session timed out after {self.timeout} seconds"
+                    print(f"ERROR: {error_msg}")
+                    raise RuntimeError(error_msg)
+                except OSError as e:
+                    print(f"Houdini session connection lost: {e}")
+                # the server went away: start a new one and retry once
+                self.stopServer()
+            else:
+                raise RuntimeError("Houdini session closed the connection")
+
+        response = json.loads(line)
+        if not response.get("ok"):
+            error_msg = f"Houdini session failed: {response.get('error')}"
+            print(f"ERROR: {error_msg}")
+            raise RuntimeError(error_msg)
+        return response
+
+    def carve(self, workPath, objPath):
+        """Boolean every work_path/seg/*.obj against objPath into work_path/out; the written files."""
+        inputs = glob.glob(os.path.join(workPath, "seg/*.obj"))
+        response = self.request({"cmd": "carve", "obj": objPath, "inputs": inputs,
+                                 "output_dir": os.path.join(workPath, "out"),
+                                 "log": os.path.join(workPath, "log-hou.txt")})
+        with self.lock:
+            self.processed += 1
+            self.processTime += response["seconds"]
+        return response["outputs"]
+
+    def closeConnection(self):
+        if self.reader is not None:
+            self.reader.close()
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+        self.reader = None
+
+    def stopServer(self):
+        # caller holds self.lock
+        if self.process is not None and self.process.poll() is None and self.conn is not None:
+            try:
+                self.conn.sendall(b'{"cmd": "shutdown"}\n')
+                self.reader.readline()
+            except OSError:
+                pass
+        self.closeConnection()
+        if self.process is not None:
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def shutdown(self):
+        with self.lock:
+            self.stopServer()
+
+    def printMetrics(self):
+        with self.lock:
+            mean = self.processTime / self.processed if self.processed else 0.0
+            print("Houdini session: start %.2f s (%d start(s)), %d batch(es) carved, %.2f s each" % (
+                self.startTime, self.starts, self.processed, mean))
+
+
+_houdiniSession = None
+_houdiniSessionLock = threading.Lock()
+
+def getHoudiniSession():
+    """The process-wide session for houdini_path / houdini_libs, stopped at exit."""
+    global _houdiniSession
+    with _houdiniSessionLock:
+        if _houdiniSession is None:
+            config = load_config()
+            backend = config.get("houdini_backend", "houdini")
+            # the fake backend needs no Houdini, any Python runs it
+            pythonPath = config["houdini_path"] if backend == "houdini" else sys.executable
+            _houdiniSession = HoudiniSession(pythonPath, config.get("houdini_libs", ""), backend)
+            atexit.register(_houdiniSession.shutdown)
+    return _houdiniSession
+#endregion
@@ -0,0 +1,198 @@
+import os, sys, time
+import threading
+import queue
+from concurrent.futures import Future
+import numpy as np
+from utils_config import load_config
+
+#region Long-lived ImageJ/Fiji segmentation service
+# imagej.init starts a JVM and loads Fiji, and a process can only ever host one
+# JVM. The service starts it once, imports the MorphoLibJ classes once and calls
+# them directly (the former BeanShell script was recompiled on every fracture),
+# and runs queued volumes on `imagej_workers` threads inside that JVM.
+# By default volumes cross the JVM boundary through pyimagej's to_java ->
+# to_imageplus -> from_java chain. imagej_transfer "float32" / "uint8" send them
+# one slice at a time as primitive Java arrays instead (a buffer copy each way,
+# where the chain widens the relief to float64 and copies it whole several
+# times); 05.Measure/Benchmarks/imagej_transfer.py compares the two, but has
+# not been run against a Fiji install yet, so the chain stays the default.
+
+# MorphoLibJ watershed parameters, as in the former BeanShell script
+TOLERANCE = 3
+CONNECTIVITY = 6
+DAMS = True
+
+# pyimagej: ij.py.to_java / from_java conversion of the whole volume
+# float32: per-slice arrays, the same 32-bit stack pyimagej builds from the relief
+# uint8: per-slice arrays, the 0-255 relief rounded to an 8-bit stack, a quarter of the size
+TRANSFER_TYPES = ("pyimagej", "float32", "uint8")
+
+class ImageJService:
+    def __init__(self, fijiPath, workers = 1, transferType = "pyimagej"):
+        if transferType not in TRANSFER_TYPES:
+            raise ValueError(f"imagej_transfer must be one of {TRANSFER_TYPES}, got {transferType!r}")
+        self.fijiPath = fijiPath
+        self.workers = max(int(workers), 1)
+        self.transferType = transferType
+        self.requests = queue.Queue()
+        self.threads = []
+        self.ij = None
+        self.lock = threading.Lock()
+        # pyimagej's numpy <-> ImagePlus conversion is not documented as thread
+        # safe; only the MorphoLibJ calls run concurrently
+        self.convertLock = threading.Lock()
+        self.startTime = 0.0
+        self.processed = 0
+        self.processTime = 0.0
+
+    def initJVM(self):
+        # caller holds self.lock
+        if self.ij is not None:
+            return
+
+        # Check if Fiji path exists
+        if not os.path.exists(self.fijiPath):
+            error_msg = f"Fiji path does not exist: {self.fijiPath}"
+            print(f"ERROR: {error_msg}")
+            raise FileNotFoundError(error_msg)
+
+        try:
+            import imagej
+        except ImportError as e:
+            error_msg = f"ImageJ Python module not found. Please install it with: pip install imagej\nError: {str(e)}"
+            print(f"ERROR: {error_msg}")
+            raise ImportError(error_msg)
+
+        start = time.time()
+        try:
+            ij = imagej.init(self.fijiPath, mode="headless")
+        except Exception as e:
+            error_msg = f"Failed to initialize ImageJ with path: {self.fijiPath}\nError: {str(e)}"
+            print(f"ERROR: {error_msg}")
+            raise RuntimeError(error_msg)
+
+        import scyjava
+        from jpype import JArray, JByte, JFloat
+        self.JArray, self.JByte, self.JFloat = JArray, JByte, JFloat
+        self.ImagePlus = scyjava.jimport('ij.ImagePlus')
+        self.ImageStack = scyjava.jimport('ij.ImageStack')
+        self.BinaryImages = scyjava.jimport('inra.ijpb.binary.BinaryImages')
+        self.MinimaAndMaxima3D = scyjava.jimport('inra.ijpb.morphology.MinimaAndMaxima3D')
+        self.Watershed = scyjava.jimport('inra.ijpb.watershed.Watershed')
+        self.ij = ij
+        self.startTime = time.time() - start
+        print(f"ImageJ initialized successfully. Version: {ij.getVersion()} ({self.startTime:.2f} s)")
+
+    def start(self):
+        with self.lock:
+            self.initJVM()
+            if not self.threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self.work, name="imagej-%d" % (i), daemon=True)
+                    thread.start()
+                    self.threads.append(thread)
+        return self
+
+    def submit(self, discrete):
+        """Queue a normalized SDF volume; the Future resolves to the watershed labels."""
+        self.start()
+        future = Future()
+        self.requests.put((discrete, future))
+        return future
+
+    def watershed(self, discrete):
+        return self.submit(discrete).result()
+
+    def work(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            discrete, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                start = time.time()
+                result = self.runWatershed(discrete)
+                with self.lock:
+                    self.processed += 1
+                    self.processTime += time.time() - start
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+
+    def toImageStack(self, volume):
+        """numpy [z, y, x] relief -> ImageStack, one Java array per slice."""
+        depth, height, width = volume.shape
+        stack = self.ImageStack(width, height)
+        for z in range(depth):
+            if self.transferType == "uint8":
+                plane = np.clip(np.rint(volume[z]), 0, 255).astype(np.uint8)
+                pixels = self.JArray(self.JByte)(plane.view(np.int8).ravel())
+            else:
+                plane = np.ascontiguousarray(volume[z], dtype=np.float32)
+                pixels = self.JArray(self.JFloat)(plane.ravel())
+            stack.addSlice("", pixels)
+        return stack
+
+    def fromImageStack(self, stack):
+        """Label ImageStack -> int32 numpy [z, y, x], filled slice by slice."""
+        labels = np.empty((stack.getSize(), stack.getHeight(), stack.getWidth()), dtype=np.int32)
+        for z in range(labels.shape[0]):
+            pixels = np.asarray(stack.getPixels(z + 1))
+            # Java bytes / shorts are signed; labels are not
+            if pixels.dtype == np.int8:
+                pixels = pixels.view(np.uint8)
+            elif pixels.dtype == np.int16:
+                pixels = pixels.view(np.uint16)
+            labels[z] = pixels.reshape(labels.shape[1:])
+        return labels
+
+    def runWatershed(self, discrete):
+        if self.transferType == "pyimagej":
+            with self.convertLock:
+                imp = self.ij.py.to_imageplus(self.ij.py.to_java(discrete))
+            image = imp.getImageStack().duplicate()
+        else:
+            image = self.toImageStack(discrete)
+        regionalMinima = self.MinimaAndMaxima3D.extendedMinima(image, TOLERANCE, CONNECTIVITY)
+        imposedMinima = self.MinimaAndMaxima3D.imposeMinima(image, regionalMinima, CONNECTIVITY)
+        labeledMinima = self.BinaryImages.componentsLabeling(regionalMinima, CONNECTIVITY, 32)
+        resultStack = self.Watershed.computeWatershed(imposedMinima, labeledMinima, CONNECTIVITY, DAMS)
+
+        if self.transferType != "pyimagej":
+            return self.fromImageStack(resultStack)
+        resultImage = self.ImagePlus("watershed", resultStack)
+        resultImage.setCalibration(imp.getCalibration())
+        with self.convertLock:
+            return np.array(self.ij.py.from_java(resultImage))
+
+    def shutdown(self):
+        """Stop the worker threads; the JVM stays up (it cannot be restarted)."""
+        with self.lock:
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.requests.put(None)
+        for thread in threads:
+            thread.join()
+
+    def printMetrics(self):
+        with self.lock:
+            mean = self.processTime / self.processed if self.processed else 0.0
+            print("ImageJ service: JVM start %.2f s, %d volume(s) segmented, %.2f s each on %d worker(s)" % (
+                self.startTime, self.processed, mean, self.workers))
+
+
+_imageJService = None
+_imageJServiceLock = threading.Lock()
+
+def getImageJService():
+    """The process-wide service for fiji_path, with imagej_workers threads."""
+    global _imageJService
+    with _imageJServiceLock:
+        if _imageJService is None:
+            config = load_config()
+            _imageJService = ImageJService(config["fiji_path"], config.get("imagej_workers", 1),
+                                           config.get("imagej_transfer", "pyimagej"))
+    return _imageJService
+#endregion
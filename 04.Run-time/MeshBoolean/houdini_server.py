@@ -0,0 +1,134 @@
+import sys
+import os
+import glob
+import json
+import shutil
+import socket
+import time
+import argparse
+
+# Long-running Houdini boolean worker.
+# houdini_process.py pays for Houdini's Python start, `import hou` and the hrpyc
+# connection on every fracture. This server does that once, keeps the
+# connection and the /obj/geo1 network, and carves batches of segmentation
+# surfaces sent over a localhost socket, one JSON object per line:
+#
+#   {"cmd": "carve", "obj": <mesh B .obj>, "inputs": [<seg .obj>, ...],
+#    "output_dir": <dir>, "log": <log file>}
+#       -> {"ok": true, "outputs": [<out .obj>, ...], "seconds": <boolean time>}
+#   {"cmd": "ping"}     -> {"ok": true, "backend": <name>}
+#   {"cmd": "shutdown"} -> {"ok": true}, then the server exits
+#
+# Errors answer {"ok": false, "error": <message>} and keep the server running.
+# It listens on 127.0.0.1 (an ephemeral port unless --port is given) and
+# announces "LISTENING <port>" on stdout once the backend is ready.
+# --backend fake copies the inputs instead of carving them, so the session
+# can be exercised without Houdini.
+
+HOUDINI_LIBS = "/Applications/Houdini/Houdini20.5.584/Frameworks/Houdini.framework/Versions/Current/Resources/houdini/python3.11libs/"
+
+class HoudiniBackend:
+    """hrpyc session of a running Houdini holding the /obj/geo1 network."""
+    name = "houdini"
+
+    def __init__(self, libs = HOUDINI_LIBS):
+        sys.path.append(libs)
+        import hou
+        print("Houdini version: ", hou.applicationVersionString())
+        import hrpyc
+
+        self.connection, self.hou = hrpyc.import_remote_module()
+        if self.hou.node('/obj/dnmd') is None:
+            self.hou.node('/obj').createNode('null', node_name='dnmd')
+        self.file1 = self.hou.node("/obj/geo1/file1")
+        self.file2 = self.hou.node("/obj/geo1/file2")
+        self.filecache = self.hou.node("/obj/geo1/filecache1")
+        self.objFile = None
+
+    def carve(self, objFile, inputs, outputDir):
+        if objFile != self.objFile:
+            self.file2.parm("file").set(objFile)
+            self.objFile = objFile
+            print("ori obj name: %s" % (self.file2.parm('file').eval()))
+
+        outputs = []
+        for filename in inputs:
+            self.file1.parm("file").set(filename)
+            name = self.file1.parm('file').eval()
+            outName = os.path.join(outputDir, os.path.basename(filename))
+            self.filecache.parm("file").set(outName)
+            self.filecache.cook(force=True)
+            self.filecache.parm("execute").pressButton()
+            outputs.append(outName)
+            print(name)
+        return outputs
+
+class FakeBackend:
+    """Stand-in for tests: every input is copied to the output folder unchanged."""
+    name = "fake"
+
+    def __init__(self, delay = 0.0):
+        self.delay = delay
+
+    def carve(self, objFile, inputs, outputDir):
+        if not os.path.exists(objFile):
+            raise FileNotFoundError(objFile)
+        outputs = []
+        for filename in inputs:
+            time.sleep(self.delay)
+            outName = os.path.join(outputDir, os.path.basename(filename))
+            shutil.copyfile(filename, outName)
+            outputs.append(outName)
+        return outputs
+
+def handle(backend, request):
+    cmd = request.get("cmd")
+    if cmd == "ping" or cmd == "shutdown":
+        return {"ok": True, "backend": backend.name}
+    if cmd != "carve":
+        raise ValueError("unknown command: %r" % (cmd,))
+
+    inputs = request["inputs"]
+    if len(inputs) == 0:
+        print("Alert: No files found in the input folder.")
+    os.makedirs(request["output_dir"], exist_ok=True)
+    t1 = time.time()
+    outputs = backend.carve(request["obj"], inputs, request["output_dir"])
+    t2 = time.time()
+    if request.get("log"):
+        with open(request["log"], "w") as log_file:
+            log_file.write("boolean time: %f" % ((t2 - t1)*1000))
+    return {"ok": True, "outputs": outputs, "seconds": t2 - t1}
+
+def serve(backend, port = 0):
+    server = socket.create_server(("127.0.0.1", port))
+    print("LISTENING %d" % (server.getsockname()[1]), flush=True)
+    with server:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("r", encoding="utf-8") as reader, conn.makefile("w", encoding="utf-8") as writer:
+                for line in reader:
+                    request = None
+                    try:
+                        request = json.loads(line)
+                        response = handle(backend, request)
+                    except Exception as e:
+                        response = {"ok": False, "error": "%s: %s" % (type(e).__name__, e)}
+                    writer.write(json.dumps(response) + "\n")
+                    writer.flush()
+                    sys.stdout.flush()
+                    if isinstance(request, dict) and request.get("cmd") == "shutdown":
+                        return
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent Houdini boolean worker")
+    parser.add_argument("--backend", default="houdini", choices=["houdini", "fake"])
+    parser.add_argument("--libs", default=HOUDINI_LIBS, help="Houdini python libs folder")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = HoudiniBackend(args.libs) if args.backend == "houdini" else FakeBackend()
+    serve(backend, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,25 @@ import igl
 import trimesh
 import os
 import vedo
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import multiprocessing as mp
 import random
+import atexit
+import threading
+from multiprocessing import shared_memory
+from manifold3d import Manifold, Mesh as ManifoldMesh
+
+# "trimesh": Trimesh.intersection per part, which rebuilds B's Manifold every time
+# "manifold": manifold3d directly, B converted to a Manifold once for all parts
+BOOLEAN_ENGINES = ("trimesh", "manifold")
 
 def process_mesh_boolean(trimesh_a_part, trimesh_b, part_id):
     """
     Perform boolean operations between a part of mesh A and mesh B
     Returns the intersection edges and the resulting mesh
     """
+    start = time.time()
     try:
         # Check if meshes are valid volumes
         if not trimesh_a_part.is_volume:
@@ -69,7 +79,8 @@ def process_mesh_boolean(trimesh_a_part, trimesh_b, part_id):
             'part_id': part_id,
             'intersection_edges': intersection_edges,
             'result_mesh': result_mesh,
-            'success': True
+            'success': True,
+            'seconds': time.time() - start
         }
         
     except Exception as e:
@@ -82,6 +93,121 @@ def process_mesh_boolean(trimesh_a_part, trimesh_b, part_id):
             'error': str(e)
         }
 
+def vedo_faces(mesh):
+    """Triangle indices of a vedo mesh, read straight from its VTK polys (mesh.cells loops in Python)"""
+    from vtkmodules.util.numpy_support import vtk_to_numpy
+    polys = mesh.dataset.GetPolys()
+    if mesh.dataset.GetNumberOfCells() == polys.GetNumberOfCells():
+        offsets = vtk_to_numpy(polys.GetOffsetsArray())
+        if np.all(np.diff(offsets) == 3):
+            return vtk_to_numpy(polys.GetConnectivityArray()).reshape(-1, 3)
+    return np.array(mesh.cells)
+
+def to_manifold(mesh):
+    """trimesh -> manifold3d.Manifold, converted the way trimesh's manifold engine does"""
+    return Manifold(mesh=ManifoldMesh(
+        vert_properties=np.array(mesh.vertices, dtype=np.float32),
+        tri_verts=np.array(mesh.faces, dtype=np.uint32)))
+
+def from_manifold(manifold):
+    result = manifold.to_mesh()
+    return trimesh.Trimesh(vertices=result.vert_properties, faces=result.tri_verts, process=False)
+
+def boolean_result(part_id, intersection, seconds):
+    """Result dict of one part, as process_mesh_boolean returns it"""
+    if len(intersection.vertices) == 0:
+        print(f"Part {part_id}: Intersection has no vertices - meshes may not overlap")
+    else:
+        print(f"Part {part_id}: Intersection successful with {len(intersection.vertices)} vertices")
+    intersection_edges = intersection.edges_unique.tolist() if len(intersection.vertices) > 0 else []
+    return {
+        'part_id': part_id,
+        'intersection_edges': intersection_edges,
+        'result_mesh': intersection,
+        'success': True,
+        'seconds': seconds
+    }
+
+def failed_result(part_id, error):
+    return {
+        'part_id': part_id,
+        'intersection_edges': [],
+        'result_mesh': None,
+        'success': False,
+        'error': error
+    }
+
+def prepare_part(part_id, part):
+    """The part as a valid volume (made watertight if needed), or None"""
+    if not part.is_volume:
+        print(f"Part {part_id} is not a volume, attempting to make it watertight...")
+        part = make_watertight(part)
+        if part is None or not part.is_volume:
+            print(f"Part {part_id} could not be made into a valid volume, skipping...")
+            return None
+    return part
+
+def process_part_manifold(part_id, part, manifold_b):
+    """Intersect one part with B's Manifold; result dict like process_mesh_boolean"""
+    start = time.time()
+    try:
+        part = prepare_part(part_id, part)
+        if part is None:
+            return failed_result(part_id, 'Mesh is not a valid volume')
+        intersection = from_manifold(to_manifold(part) ^ manifold_b)
+        return boolean_result(part_id, intersection, time.time() - start)
+    except Exception as e:
+        print(f"Error in part {part_id}: {e}")
+        return failed_result(part_id, str(e))
+
+def process_parts_manifold(valid_parts, trimesh_b, batch = False):
+    """
+    Intersect every (part_id, part) with mesh B through manifold3d.
+    B is converted once. With batch=True all parts are composed into one
+    Manifold and cut by B in a single boolean, then split back per part by
+    their original ids; parts must then be disjoint, as split() pieces of one
+    segmentation surface are.
+    Returns result dicts like process_mesh_boolean, with per-part 'seconds'.
+    """
+    manifold_b = to_manifold(trimesh_b)
+    if not batch:
+        return [process_part_manifold(part_id, part, manifold_b) for part_id, part in valid_parts]
+
+    results = []
+    pending = []
+    for part_id, part in valid_parts:
+        start = time.time()
+        part = prepare_part(part_id, part)
+        if part is None:
+            results.append(failed_result(part_id, 'Mesh is not a valid volume'))
+            continue
+        pending.append((part_id, to_manifold(part).as_original(), time.time() - start))
+
+    if pending:
+        start = time.time()
+        owner = {manifold.original_id(): part_id for part_id, manifold, _ in pending}
+        pieces = {}
+        for piece in (Manifold.compose([manifold for _, manifold, _ in pending]) ^ manifold_b).decompose():
+            mesh = piece.to_mesh()
+            # every piece keeps the original id of the part it was cut from
+            ids = [owner[i] for i in mesh.run_original_id if i in owner]
+            if ids:
+                pieces.setdefault(ids[0], []).append(trimesh.Trimesh(
+                    vertices=mesh.vert_properties, faces=mesh.tri_verts, process=False))
+        shared = (time.time() - start) / len(pending)
+        print(f"Batched intersection of {len(pending)} parts: {time.time() - start:.2f} seconds")
+        for part_id, _, seconds in pending:
+            start = time.time()
+            part_pieces = pieces.get(part_id, [])
+            if len(part_pieces) == 1:
+                intersection = part_pieces[0]
+            elif part_pieces:
+                intersection = trimesh.util.concatenate(part_pieces)
+            else:
+                intersection = trimesh.Trimesh()
+            results.append(boolean_result(part_id, intersection, seconds + shared + time.time() - start))
+    return results
+
 def make_watertight(mesh):
     """Make mesh watertight"""
     if mesh is None:
@@ -110,20 +236,277 @@ def make_watertight(mesh):
         print(f"Error making mesh watertight: {e}")
         return mesh
 
-def process_mesh_split_boolean(input_obj_path_a, input_obj_path_b, output_dir, min_meshes = 1, use_parallel = False):
+#region Inside / outside prefilter
+# every n-th part vertex is measured first in PartPrefilter.classify
+SAMPLE_STRIDE = 16
+
+class PartPrefilter:
+    """
+    Sorts parts into fully inside B, fully outside B, or straddling B's surface,
+    so only straddling parts pay for a CSG boolean (inside: the part itself,
+    outside: empty).
+    A closed part whose vertices all lie further from B's surface than its
+    longest edge cannot cross that surface, so one winding-number query
+    decides its side; only B triangles near the part's box are measured. A
+    piece of B enclosed by the part is caught by testing B's vertices within
+    the part's box against the part. Anything not provably inside or outside
+    is left to the boolean.
+    """
+    def __init__(self, trimesh_b):
+        self.vertices = np.ascontiguousarray(trimesh_b.vertices, dtype=np.float64)
+        self.faces = np.ascontiguousarray(trimesh_b.faces, dtype=np.int64)
+        corners = self.vertices[self.faces]
+        self.tri_min = corners.min(axis=1)
+        self.tri_max = corners.max(axis=1)
+        self.bounds = trimesh_b.bounds
+        # the winding number only means inside / outside for a closed B
+        self.enabled = bool(trimesh_b.is_watertight)
+
+    def classify(self, part):
+        if not self.enabled:
+            return "straddle"
+        low, high = part.bounds
+        if np.any(high < self.bounds[0]) or np.any(low > self.bounds[1]):
+            return "outside"
+
+        vertices = np.ascontiguousarray(part.vertices, dtype=np.float64)
+        margin = float(part.edges_unique_length.max())
+        near = np.all((self.tri_max >= low - margin) & (self.tri_min <= high + margin), axis=1)
+        if near.any():
+            near_faces = self.faces[near]
+            # part vertices away from every near triangle's box are further than margin
+            near_low = self.tri_min[near].min(axis=0) - margin
+            near_high = self.tri_max[near].max(axis=0) + margin
+            close = np.all((vertices >= near_low) & (vertices <= near_high), axis=1)
+            close = vertices[close]
+            # a sparse sample settles most straddling parts before the full query
+            for query in (close[::SAMPLE_STRIDE], close):
+                if len(query) == 0:
+                    continue
+                squared, _, _ = igl.point_mesh_squared_distance(
+                    np.ascontiguousarray(query), self.vertices, near_faces)
+                if squared.min() <= margin * margin:
+                    return "straddle"
+        if not part.is_volume:
+            return "straddle"
+
+        enclosed = np.all((self.vertices >= low) & (self.vertices <= high), axis=1)
+        if enclosed.any():
+            faces = np.ascontiguousarray(part.faces, dtype=np.int64)
+            winding = igl.fast_winding_number(vertices, faces, np.ascontiguousarray(self.vertices[enclosed]))
+            if np.any(np.abs(winding) > 0.5):
+                return "straddle"
+        inside = abs(igl.winding_number(self.vertices, self.faces, vertices[0])) > 0.5
+        return "inside" if inside else "outside"
+
+def prefilter_parts(valid_parts, trimesh_b):
+    """
+    Resolve parts fully inside or outside B without a boolean.
+    Returns (result dicts of the resolved parts, parts that straddle B's surface).
+    """
+    prefilter = PartPrefilter(trimesh_b)
+    results = []
+    straddling = []
+    for part_id, part in valid_parts:
+        start = time.time()
+        side = prefilter.classify(part)
+        if side == "straddle":
+            straddling.append((part_id, part))
+            continue
+        print(f"Part {part_id}: fully {side} mesh B, no boolean needed")
+        intersection = part.copy() if side == "inside" else trimesh.Trimesh()
+        results.append(boolean_result(part_id, intersection, time.time() - start))
+    print(f"Prefilter: {len(straddling)} of {len(valid_parts)} parts straddle mesh B")
+    return results, straddling
+#endregion
+
+#region Mesh B and fragment export
+# mesh B (the object being broken) parsed once per file, keyed by (path, mtime)
+_meshes_b = {}
+
+def load_mesh_b(input_obj_path_b):
+    """Mesh B as a trimesh volume (repaired once), and its (path, mtime) key"""
+    key_b = (os.path.abspath(input_obj_path_b), os.path.getmtime(input_obj_path_b))
+    if key_b not in _meshes_b:
+        mesh_b = vedo.load(input_obj_path_b)
+        trimesh_b = trimesh.Trimesh(vertices=np.array(mesh_b.points), faces=vedo_faces(mesh_b))
+        print(f"Converted mesh B to trimesh ({len(trimesh_b.faces)} faces)")
+        # repair B once here rather than for every part
+        if not trimesh_b.is_volume:
+            print(f"Mesh B is not a volume, attempting to make it watertight...")
+            trimesh_b = make_watertight(trimesh_b)
+        _meshes_b.clear()
+        _meshes_b[key_b] = trimesh_b
+    return _meshes_b[key_b], key_b
+
+# one background writer, so exports keep their order and never compete with the boolean
+_export_executor = None
+
+def submit_export(fn, *args):
+    """Run fn(*args) on the export thread; returns its Future"""
+    global _export_executor
+    if _export_executor is None:
+        _export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+    return _export_executor.submit(fn, *args)
+
+def wait_exports():
+    """Block until every submitted export has been written"""
+    if _export_executor is not None:
+        _export_executor.submit(lambda: None).result()
+
+def write_fragments(output_dir, meshes, all_intersection_edges = None):
+    """Write meshes as output_dir/vol_<i>.obj (and intersection_edges.txt)"""
+    for i, mesh in enumerate(meshes):
+        output_path = os.path.join(output_dir, f"vol_{i}.obj")
+        mesh.export(output_path)
+        print(f"Saved boolean result {i:03d} to {output_path}")
+    if all_intersection_edges is None:
+        return
+    edges_file = os.path.join(output_dir, "intersection_edges.txt")
+    with open(edges_file, 'w') as f:
+        f.write(f"Total intersection edges: {len(all_intersection_edges)}\n")
+        for i, edge in enumerate(all_intersection_edges):
+            f.write(f"Edge {i}: {edge}\n")
+    print(f"Saved intersection edges to {edges_file}")
+#endregion
+
+#region Persistent boolean worker pool
+# Worker side: mesh B of the current shared block, keyed by the block's name.
+# B is rebuilt from shared memory once per worker, and its Manifold converted
+# once, instead of pickling trimesh_b with every part.
+_shared_b = {}
+
+def attach_mesh_b(name, n_vertices, n_faces, engine):
+    if name not in _shared_b:
+        for shm, _, _ in _shared_b.values():
+            shm.close()
+        _shared_b.clear()
+        shm = shared_memory.SharedMemory(name=name)
+        vertices = np.ndarray((n_vertices, 3), dtype=np.float64, buffer=shm.buf)
+        faces = np.ndarray((n_faces, 3), dtype=np.int64, buffer=shm.buf, offset=vertices.nbytes)
+        # B is a surface, so one copy per worker is cheap and lets the block close cleanly
+        _shared_b[name] = [shm, trimesh.Trimesh(vertices=vertices.copy(), faces=faces.copy(), process=False), None]
+    entry = _shared_b[name]
+    if engine == "manifold" and entry[2] is None:
+        entry[2] = to_manifold(entry[1])
+    return entry[1], entry[2]
+
+def boolean_job(name, n_vertices, n_faces, engine, part_id, vertices, faces):
+    trimesh_b, manifold_b = attach_mesh_b(name, n_vertices, n_faces, engine)
+    part = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+    if engine == "manifold":
+        result = process_part_manifold(part_id, part, manifold_b)
+    else:
+        result = process_mesh_boolean(part, trimesh_b, part_id)
+    # send arrays back, not a Trimesh with its caches or lists of edges
+    mesh = result['result_mesh']
+    if mesh is not None:
+        result['result_mesh'] = (np.asarray(mesh.vertices), np.asarray(mesh.faces))
+    result['intersection_edges'] = np.asarray(result['intersection_edges'], dtype=np.int64).reshape(-1, 2)
+    return result
+
+class BooleanWorkerPool:
+    """
+    Persistent process pool for part booleans.
+    Mesh B is copied once into a shared memory block that every worker maps;
+    the block (and the workers' converted B) is reused while the same B comes
+    back, so repeated fractures of one object only stream part jobs.
+    """
+    def __init__(self, workers = None):
+        self.workers = max(int(workers or min(mp.cpu_count(), 8)), 1)
+        self.executor = None
+        self.shm = None
+        self.key_b = None
+        self.shape_b = None
+        self.lock = threading.Lock()
+
+    def set_mesh_b(self, trimesh_b, key = None):
+        if self.shm is not None and key is not None and key == self.key_b:
+            return
+        vertices = np.ascontiguousarray(trimesh_b.vertices, dtype=np.float64)
+        faces = np.ascontiguousarray(trimesh_b.faces, dtype=np.int64)
+        shm = shared_memory.SharedMemory(create=True, size=max(vertices.nbytes + faces.nbytes, 1))
+        np.ndarray(vertices.shape, dtype=np.float64, buffer=shm.buf)[...] = vertices
+        np.ndarray(faces.shape, dtype=np.int64, buffer=shm.buf, offset=vertices.nbytes)[...] = faces
+        self.release_mesh_b()
+        self.shm, self.key_b, self.shape_b = shm, key, (len(vertices), len(faces))
+
+    def release_mesh_b(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+            self.key_b = None
+
+    def run(self, valid_parts, trimesh_b, engine = "manifold", key_b = None):
+        """Yield result dicts of process_mesh_boolean as parts complete"""
+        with self.lock:
+            self.set_mesh_b(trimesh_b, key_b)
+            if self.executor is None:
+                # spawn: by now the parent runs the JVM (ImageJService) and torch's thread pools,
+                # which a forked child would inherit in an inconsistent state
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+            futures = [
+                self.executor.submit(boolean_job, self.shm.name, *self.shape_b, engine, part_id,
+                                     np.asarray(part.vertices), np.asarray(part.faces))
+                for part_id, part in valid_parts
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                result['intersection_edges'] = result['intersection_edges'].tolist()
+                if result['result_mesh'] is not None:
+                    vertices, faces = result['result_mesh']
+                    result['result_mesh'] = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+                yield result
+            if key_b is None:
+                self.release_mesh_b()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.release_mesh_b()
+
+_boolean_pool = None
+
+def get_boolean_pool(workers = None):
+    """The process-wide BooleanWorkerPool, recreated if the worker count changes"""
+    global _boolean_pool
+    workers = max(int(workers or min(mp.cpu_count(), 8)), 1)
+    if _boolean_pool is None or _boolean_pool.workers != workers:
+        if _boolean_pool is not None:
+            _boolean_pool.close()
+        _boolean_pool = BooleanWorkerPool(workers)
+        atexit.register(_boolean_pool.close)
+    return _boolean_pool
+#endregion
+
+def process_mesh_split_boolean(input_obj_path_a, input_obj_path_b, output_dir, min_meshes = 1, use_parallel = False, engine = "manifold", batch = False, workers = None, prefilter = True, export = "sync"):
     """
     Main function to split mesh A into n parts and perform boolean operations with mesh B
+    input_obj_path_a: .obj path, or the split surface as a vedo.Mesh already in memory
+    export: "sync" writes vol_<i>.obj before returning, "async" on the export thread
+    (see wait_exports), None not at all
+    Returns (final shapes as watertight trimesh objects, intersection edges)
+    engine: "manifold" (default) or "trimesh", see BOOLEAN_ENGINES; batch: see process_parts_manifold
+    use_parallel: run parts on the persistent BooleanWorkerPool of `workers` processes
+    (default min(cpu_count, 8)); a batched manifold boolean stays in this process
+    prefilter: skip the boolean for parts fully inside / outside B (PartPrefilter)
     """
+    if engine not in BOOLEAN_ENGINES:
+        raise ValueError(f"engine must be one of {BOOLEAN_ENGINES}, got {engine!r}")
+
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Load mesh A and B using vedo
-    mesh_a = vedo.load(input_obj_path_a)
-    mesh_b = vedo.load(input_obj_path_b)
-    
-    print(f"Loaded mesh A: {input_obj_path_a}")
+    # Load mesh A using vedo (unless it is handed over in memory), B from its cache
+    if isinstance(input_obj_path_a, vedo.Mesh):
+        mesh_a = input_obj_path_a
+    else:
+        mesh_a = vedo.load(input_obj_path_a)
+        print(f"Loaded mesh A: {input_obj_path_a}")
+    trimesh_b, key_b = load_mesh_b(input_obj_path_b)
     print(f"Loaded mesh B: {input_obj_path_b}")
-    import time
 
     start_time = time.time()
 
@@ -140,7 +523,7 @@ def process_mesh_split_boolean(input_obj_path_a, input_obj_path_b, output_dir, m
     for i, part in enumerate(mesh_a_parts):
         try:
             vertices_a = np.array(part.vertices)
-            faces_a = np.array(part.cells)
+            faces_a = vedo_faces(part)
             trimesh_part = trimesh.Trimesh(vertices=vertices_a, faces=faces_a)
             
             # Check if the part is valid
@@ -154,12 +537,7 @@ def process_mesh_split_boolean(input_obj_path_a, input_obj_path_b, output_dir, m
             print(f"Error converting part {i}: {e}")
             # Skip this part instead of adding empty trimesh
     
-    # Convert mesh B to trimesh
-    vertices_b = np.array(mesh_b.points)
-    faces_b = np.array(mesh_b.cells)
-    trimesh_b = trimesh.Trimesh(vertices=vertices_b, faces=faces_b)
-    print(f"Converted mesh B to trimesh ({len(trimesh_b.faces)} faces)")
-    
+
     # Filter out invalid parts
     valid_parts = []
     for i, part in enumerate(trimesh_a_parts):
@@ -182,26 +560,30 @@ def process_mesh_split_boolean(input_obj_path_a, input_obj_path_b, output_dir, m
     # Perform parallel boolean operations
     print("Performing parallel boolean operations...")
     results = []
-    
-    if use_parallel:
-        # Use ProcessPoolExecutor for parallel processing
-        max_workers = min(len(valid_parts), mp.cpu_count(), 8)  # Limit max workers to avoid memory issues
-        print(f"Using {max_workers} parallel workers")
-        
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            future_to_part = {
-                executor.submit(process_mesh_boolean, part, trimesh_b, part_id): part_id 
-                for part_id, part in valid_parts
-            }
-            
-            # Collect results as they complete
-            completed = 0
-            for future in as_completed(future_to_part):
-                result = future.result()
-                results.append(result)
-                completed += 1
-                print(f"Completed part {result['part_id']} ({completed}/{len(valid_parts)})")
+
+    if prefilter:
+        start_prefilter = time.time()
+        n_parts = len(valid_parts)
+        results, valid_parts = prefilter_parts(valid_parts, trimesh_b)
+        with open(os.path.join(output_dir, "log-mb-py.txt"), "a") as log_file:
+            log_file.write(f"prefilter: {len(valid_parts)} of {n_parts} parts need a boolean, "
+                           f"{time.time() - start_prefilter:.2f} seconds\n")
+
+    if not valid_parts:
+        print("No part straddles mesh B, nothing to intersect")
+    elif use_parallel and not (engine == "manifold" and batch):
+        pool = get_boolean_pool(workers)
+        print(f"Using {pool.workers} persistent boolean workers ({engine})")
+        # B is shared once per object file; the workers keep it across fractures
+        # Collect results as they complete
+        completed = 0
+        for result in pool.run(valid_parts, trimesh_b, engine, key_b):
+            results.append(result)
+            completed += 1
+            print(f"Completed part {result['part_id']} ({completed}/{len(valid_parts)})")
+    elif engine == "manifold":
+        print(f"Using manifold3d ({'batched' if batch else 'per part'})")
+        results += process_parts_manifold(valid_parts, trimesh_b, batch)
     else:
         for part_id, part in valid_parts:
             result = process_mesh_boolean(part, trimesh_b, part_id)
@@ -225,6 +607,12 @@ def process_mesh_split_boolean(input_obj_path_a, input_obj_path_b, output_dir, m
     print(f"Collected {len(all_intersection_edges)} intersection edges")
     print(f"Successfully processed {len(successful_results)} parts")
 
+    timed = [result for result in successful_results if 'seconds' in result]
+    if timed:
+        with open(os.path.join(output_dir, "log-mb-py.txt"), "a") as log_file:
+            for result in timed:
+                log_file.write(f"part {result['part_id']} boolean time: {result['seconds']:.3f} seconds\n")
+
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(f"intersection edges python execution time: {elapsed_time:.2f} seconds")
@@ -241,29 +629,24 @@ def process_mesh_split_boolean(input_obj_path_a, input_obj_path_b, output_dir, m
             watertight_mesh = make_watertight(result['result_mesh'])
             
             if watertight_mesh is not None and len(watertight_mesh.faces) >= min_meshes:
-                # Save the final shape
-                output_path = os.path.join(output_dir, f"vol_{i}.obj")
-                watertight_mesh.export(output_path)
                 final_shapes.append(watertight_mesh)
-                print(f"Saved boolean result {i:03d} to {output_path}")
             else:
                 print(f"Boolean result {i} could not be made watertight or has too few faces, skipping...")
         else:
             print(f"Boolean result {i} is None, skipping...")
     
 
+    # Save the final shapes and intersection edges information
+    if export == "sync":
+        write_fragments(output_dir, final_shapes, all_intersection_edges)
+    elif export == "async":
+        submit_export(write_fragments, output_dir, final_shapes, all_intersection_edges)
+
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(f"saving objs python execution time: {elapsed_time:.2f} seconds")
     with open(os.path.join(output_dir, "log-mb-py.txt"), "a") as log_file:
         log_file.write(f"saving objs python execution time: {elapsed_time:.2f} seconds\n")
 
-    # Save intersection edges information
-    edges_file = os.path.join(output_dir, "intersection_edges.txt")
-    with open(edges_file, 'w') as f:
-        f.write(f"Total intersection edges: {len(all_intersection_edges)}\n")
-        for i, edge in enumerate(all_intersection_edges):
-            f.write(f"Edge {i}: {edge}\n")
-    
-    print(f"Saved intersection edges to {edges_file}")
+    return final_shapes, all_intersection_edges
     
\ No newline at end of file
@@ -40,6 +40,15 @@ class Quaternion:
         """Get quaternion in [w,x,y,z] order"""
         return self.q.tolist()
 
+    def to_matrix(self):
+        """3x3 rotation matrix; v @ to_matrix().T rotates every row of v at once"""
+        w, x, y, z = self.q / np.linalg.norm(self.q)
+        return np.array([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+            [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+            [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+        ])
+
     def rotate(self, v):
         """Rotate vector v (3D) by quaternion"""
         w, x, y, z = self.q
@@ -51,12 +60,27 @@ class Quaternion:
         w, x, y, z = self.q
         return Quaternion([w, -x, -y, -z], is_xyzw_order=False)
 
-def form_mesh(vertices, faces):
-    return trimesh.Trimesh(vertices=vertices, faces=faces)
+def form_mesh(vertices, faces, process=True):
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=process)
 
 def merge_meshes(mesh_list):
     # Merge a list of trimesh.Mesh objects
     return trimesh.util.concatenate(mesh_list)
 
+def merge_arrays(parts):
+    # Merge a list of (vertices, faces) into preallocated arrays, faces re-indexed
+    n_vertices = sum(len(v) for v, _ in parts)
+    n_faces = sum(len(f) for _, f in parts)
+    vertices = np.empty((n_vertices, 3), dtype=np.float64)
+    faces = np.empty((n_faces, 3), dtype=np.int64)
+    v_start = f_start = 0
+    for v, f in parts:
+        vertices[v_start:v_start + len(v)] = v
+        faces[f_start:f_start + len(f)] = f
+        faces[f_start:f_start + len(f)] += v_start
+        v_start += len(v)
+        f_start += len(f)
+    return vertices, faces
+
 def save_mesh(filepath, mesh):
     mesh.export(filepath) 
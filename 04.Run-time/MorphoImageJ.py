@@ -1,7 +1,9 @@
-import os
+import os, sys
 import numpy as np
 import nibabel as nib
 import shutil
+import utils_config  # puts 05.Colab-Runtime on sys.path for the runtime package
+from runtime.segmentation import relabel_fragments, watershed_relief
 
 def get_from_nib(file_name):
     img = nib.load(file_name)
@@ -30,8 +32,47 @@ def getNormForSdf(data):
     return sdf
 #endregion
 
+#region Segmentation backends
+# Each backend maps the 0-255 relief (getNormForSdf) and the interior mask to
+# watershed labels with dams = 0. "imagej" runs MorphoLibJ in the shared Fiji
+# JVM; "skimage" is the h-minima + watershed of 05.Colab-Runtime and needs no
+# Java. Pick one with segmentation_backend in config.yaml; "skimage" is the
+# default until the queued ImageJ service has been run against a Fiji install.
+def watershedImageJ(discrete, mask):
+    from ImageJService import getImageJService
+    return getImageJService().watershed(discrete)
+
+def watershedSkimage(discrete, mask):
+    return watershed_relief(discrete, mask > 0)
+
+SegmentationBackends = {
+    "imagej": watershedImageJ,
+    "skimage": watershedSkimage,
+}
+
+def segmentLabels(discrete, mask, filtNoisy, backend = "imagej"):
+    if backend not in SegmentationBackends:
+        error_msg = f"Unknown segmentation backend: {backend} (expected one of {list(SegmentationBackends)})"
+        print(f"ERROR: {error_msg}")
+        raise ValueError(error_msg)
+
+    xr = SegmentationBackends[backend](discrete, mask)
+    xr[mask == 0] = -1
+
+    # one bincount pass; ids are kept (not compacted) so the isosurface below is unchanged.
+    # Labels keep the backend's dtype (pyimagej's conversion returns them as floats)
+    return relabel_fragments(xr.astype(np.int32, copy=False), filtNoisy, fill=-1, compact=False, first_label=0).astype(xr.dtype, copy=False)
+#endregion
+
 #region Prepare segmentation
-def processCagedSDFSeg(data_ori, work_path, obj_path, isBig = True, maxValue = 1.0):
+def processCagedSDFSeg(data_ori, work_path, obj_path, isBig = True, maxValue = 1.0, backend = None):
+    """
+    Segment the volume and carve obj_path into fragments under work_path/objs.
+    With in_memory_pipeline the isosurface goes straight to the boolean and the
+    fragments are returned as trimesh objects (their OBJ files, imj.nii and
+    seg/vol_1.obj written on the export thread if export_fragments is set);
+    otherwise returns None once the OBJ files are on disk.
+    """
     import yaml
     
     # Read config.yaml
@@ -41,29 +82,9 @@ def processCagedSDFSeg(data_ori, work_path, obj_path, isBig = True, maxValue = 1
     from utils_config import load_config
 
     config = load_config()
-    sourcePath = config["fiji_path"]
-    
-    # Check if Fiji path exists
-    if not os.path.exists(sourcePath):
-        error_msg = f"Fiji path does not exist: {sourcePath}"
-        print(f"ERROR: {error_msg}")
-        raise FileNotFoundError(error_msg)
-    
-    #region Import section
-    try:
-        import imagej
-    except ImportError as e:
-        error_msg = f"ImageJ Python module not found. Please install it with: pip install imagej\nError: {str(e)}"
-        print(f"ERROR: {error_msg}")
-        raise ImportError(error_msg)
-    
-    try:
-        ij = imagej.init(sourcePath, mode="headless")
-        print(f"ImageJ initialized successfully. Version: {ij.getVersion()}")
-    except Exception as e:
-        error_msg = f"Failed to initialize ImageJ with path: {sourcePath}\nError: {str(e)}"
-        print(f"ERROR: {error_msg}")
-        raise RuntimeError(error_msg)
+    backend = backend or config.get('segmentation_backend', 'skimage')
+    inMemory = config.get('in_memory_pipeline', False) and not config['use_houdini']
+    exportFragments = config.get('export_fragments', True)
 
     if isBig == 2:
         isolevel = 0.03 / maxValue
@@ -93,74 +114,34 @@ def processCagedSDFSeg(data_ori, work_path, obj_path, isBig = True, maxValue = 1
     mask = getMaskForSdf(data)
     discrete = getNormForSdf(data)
 
-    dataset = ij.py.to_java(discrete)
-    #endregion
-
     #region Perform segmentation
-    print("Start SegmentationProcess")
-    script = """
-    // @ImagePlus(label="Input image", description="Image to segment") imp
-    // @OUTPUT ImagePlus resultImage
-
-    import ij.IJ;
-    import ij.ImagePlus;
-    import ij.ImageStack;
-    import inra.ijpb.binary.BinaryImages;
-    import inra.ijpb.morphology.MinimaAndMaxima3D;
-    import inra.ijpb.morphology.Morphology;
-    import inra.ijpb.morphology.Strel3D;
-    import inra.ijpb.watershed.Watershed;
-
-    print("heeeeeeee");
-
-    radius = 2;
-    tolerance = 3;
-    strConn = "6";
-    dams = true;
-
-    conn = Integer.parseInt( strConn );
-
-
-    image = imp.getImageStack().duplicate();
-    regionalMinima = MinimaAndMaxima3D.extendedMinima( image, tolerance, conn );
-    imposedMinima = MinimaAndMaxima3D.imposeMinima( image, regionalMinima, conn );
-    labeledMinima = BinaryImages.componentsLabeling( regionalMinima, conn, 32 );
-    resultStack = Watershed.computeWatershed( imposedMinima, labeledMinima, conn, dams );
-    
-    resultImage = new ImagePlus( "watershed", resultStack );
-    resultImage.setCalibration( imp.getCalibration() );
-    """
-    imp = ij.py.to_imageplus(dataset)
-    args = {"imp": imp}
+    print("Start SegmentationProcess (%s)" % (backend))
     import time
     time_start = time.time()
-    result = ij.py.run_script("BeanShell", script, args)
-    resultImp = result.getOutput("resultImage")
+    xr = segmentLabels(discrete, mask, filtNoisy, backend)
     time_end = time.time()
     with open(os.path.join(work_path, "log-FloodSeg.txt"), "a") as log_file:
-        log_file.write(f"Segmentation Process time: {time_end - time_start:.2f} seconds\n")
-
-
-    xr = ij.py.from_java(resultImp)
+        log_file.write(f"Segmentation Process time ({backend}): {time_end - time_start:.2f} seconds\n")
+    #endregion
 
     import vedo as vd
+    from MeshBoolean.pyMeshBool import submit_export
 
-    xr = np.array(xr)
-    xr[mask == 0] = -1
-
-
-    unique, counts = np.unique(xr, return_counts=True)
-    for value in unique[counts < filtNoisy]:
-        xr[xr == int(value)] = -1
-
-    save_as_nib(os.path.join(work_path, "imj.nii"), xr)
+    if not inMemory:
+        save_as_nib(os.path.join(work_path, "imj.nii"), xr)
+    elif exportFragments:
+        submit_export(save_as_nib, os.path.join(work_path, "imj.nii"), xr)
 
     vol_1 = vd.Volume(xr).isosurface(isolevel).smooth()
     scale = 1/resolution*2
     vol_1 = vol_1.scale(scale).shift(-1, -1, -1).rotate_x(180).rotate_y(-90).rotate_z(90)
 
     os.makedirs(os.path.join(work_path, "seg"), exist_ok=True)
-    vol_1.write(os.path.join(work_path, "seg/vol_1.obj"))
+    if not inMemory:
+        vol_1.write(os.path.join(work_path, "seg/vol_1.obj"))
+    elif exportFragments:
+        # a copy, the boolean below splits vol_1 meanwhile
+        submit_export(vol_1.clone().write, os.path.join(work_path, "seg/vol_1.obj"))
 
     # !!! Perform separate segmentation
     # vols_1 = vol_1.split()
@@ -187,81 +168,109 @@ def processCagedSDFSeg(data_ori, work_path, obj_path, isBig = True, maxValue = 1
         #region python
         from MeshBoolean.pyMeshBool import process_mesh_split_boolean
         import glob
-        inputFolder = os.path.join(work_path, "seg/*.obj")
-        files = glob.glob(inputFolder)
-        if len(files) == 0:
-            raise FileNotFoundError("Error: No files found in the seg folder.")
-        input_obj_a = files[0]
+        if inMemory:
+            # the isosurface itself, no seg/vol_1.obj round trip
+            input_obj_a = vol_1
+        else:
+            inputFolder = os.path.join(work_path, "seg/*.obj")
+            files = glob.glob(inputFolder)
+            if len(files) == 0:
+                raise FileNotFoundError("Error: No files found in the seg folder.")
+            input_obj_a = files[0]
         input_obj_b = obj_path
         output_dir = os.path.join(work_path, "objs")
-        process_mesh_split_boolean(
-            input_obj_a, input_obj_b, output_dir, min_meshes, use_parallel = False
+        # boolean_workers: 1 = serial, 0 = min(cpu_count, 8); the worker pool persists across fractures.
+        # Serial by default: on one core the pool's overhead outweighs the whole manifold pass
+        import multiprocessing as mp
+        booleanWorkers = int(config.get('boolean_workers', 1)) or min(mp.cpu_count(), 8)
+        fragments, _ = process_mesh_split_boolean(
+            input_obj_a, input_obj_b, output_dir, min_meshes, use_parallel = booleanWorkers > 1,
+            engine = config.get('boolean_engine', 'manifold'), batch = config.get('boolean_batch', False),
+            workers = booleanWorkers, prefilter = config.get('boolean_prefilter', True),
+            export = ("async" if exportFragments else None) if inMemory else "sync"
         )
+        if inMemory:
+            return fragments
         
         #endregion
     else:
         #region houdini
         import subprocess
         
-        houdini_path = config['houdini_path']
+        if config.get('houdini_persistent', False):
+            # one long-running houdini_server.py keeps Houdini and its hrpyc connection
+            # instead of starting houdini_process.py for every fracture
+            from HoudiniSession import getHoudiniSession
+
+            # Check if input obj file exists
+            if not os.path.exists(obj_path):
+                error_msg = f"Input obj file does not exist: {obj_path}"
+                print(f"ERROR: {error_msg}")
+                raise FileNotFoundError(error_msg)
+
+            print("Start Houdini session batch: ", work_path, obj_path)
+            getHoudiniSession().carve(work_path, obj_path)
+            print("Houdini process completed successfully")
+        else:
+            houdini_path = config['houdini_path']
         
-        # Check if Houdini path exists
-        if not os.path.exists(houdini_path):
-            error_msg = f"Houdini path does not exist: {houdini_path}"
-            print(f"ERROR: {error_msg}")
-            raise FileNotFoundError(error_msg)
+            # Check if Houdini path exists
+            if not os.path.exists(houdini_path):
+                error_msg = f"Houdini path does not exist: {houdini_path}"
+                print(f"ERROR: {error_msg}")
+                raise FileNotFoundError(error_msg)
         
-        # Check if Houdini Python executable is actually executable
-        if not os.access(houdini_path, os.X_OK):
-            error_msg = f"Houdini path is not executable: {houdini_path}"
-            print(f"ERROR: {error_msg}")
-            raise PermissionError(error_msg)
+            # Check if Houdini Python executable is actually executable
+            if not os.access(houdini_path, os.X_OK):
+                error_msg = f"Houdini path is not executable: {houdini_path}"
+                print(f"ERROR: {error_msg}")
+                raise PermissionError(error_msg)
         
-        file_path = os.path.join(source_runtime_path, "MeshBoolean/houdini_process.py")
-        python_path = houdini_path
+            file_path = os.path.join(source_runtime_path, "MeshBoolean/houdini_process.py")
+            python_path = houdini_path
 
-        # Check if Houdini process file exists
-        if not os.path.exists(file_path):
-            error_msg = f"Houdini process file does not exist: {file_path}"
-            print(f"ERROR: {error_msg}")
-            raise FileNotFoundError(error_msg)
+            # Check if Houdini process file exists
+            if not os.path.exists(file_path):
+                error_msg = f"Houdini process file does not exist: {file_path}"
+                print(f"ERROR: {error_msg}")
+                raise FileNotFoundError(error_msg)
 
-        # Check if input obj file exists
-        if not os.path.exists(obj_path):
-            error_msg = f"Input obj file does not exist: {obj_path}"
-            print(f"ERROR: {error_msg}")
-            raise FileNotFoundError(error_msg)
+            # Check if input obj file exists
+            if not os.path.exists(obj_path):
+                error_msg = f"Input obj file does not exist: {obj_path}"
+                print(f"ERROR: {error_msg}")
+                raise FileNotFoundError(error_msg)
 
-        print("Start Houdini process: ", python_path, file_path, work_path, obj_path)
-        args = (python_path, file_path, work_path, obj_path)
+            print("Start Houdini process: ", python_path, file_path, work_path, obj_path)
+            args = (python_path, file_path, work_path, obj_path)
         
-        try:
-            # Run Houdini process with timeout and capture output
-            result = subprocess.run(args, 
-                                stdout=subprocess.PIPE, 
-                                stderr=subprocess.PIPE, 
-                                text=True, 
-                                timeout=300)  # 5 minute timeout
+            try:
+                # Run Houdini process with timeout and capture output
+                result = subprocess.run(args, 
+                                    stdout=subprocess.PIPE, 
+                                    stderr=subprocess.PIPE, 
+                                    text=True, 
+                                    timeout=300)  # 5 minute timeout
             
-            if result.returncode != 0:
-                error_msg = f"Houdini process failed with return code {result.returncode}\n"
-                error_msg += f"STDOUT: {result.stdout}\n"
-                error_msg += f"STDERR: {result.stderr}"
+                if result.returncode != 0:
+                    error_msg = f"Houdini process failed with return code {result.returncode}\n"
+                    error_msg += f"STDOUT: {result.stdout}\n"
+                    error_msg += f"STDERR: {result.stderr}"
+                    print(f"ERROR: {error_msg}")
+                    raise RuntimeError(error_msg)
+                else:
+                    print("Houdini process completed successfully")
+                    if result.stdout:
+                        print("Houdini output:", result.stdout)
+                
+            except subprocess.TimeoutExpired:
+                error_msg = "Houdini process timed out after 5 minutes"
+                print(f"ERROR: {error_msg}")
+                raise RuntimeError(error_msg)
+            except Exception as e:
+                error_msg = f"Houdini process failed: {str(e)}"
                 print(f"ERROR: {error_msg}")
                 raise RuntimeError(error_msg)
-            else:
-                print("Houdini process completed successfully")
-                if result.stdout:
-                    print("Houdini output:", result.stdout)
-                
-        except subprocess.TimeoutExpired:
-            error_msg = "Houdini process timed out after 5 minutes"
-            print(f"ERROR: {error_msg}")
-            raise RuntimeError(error_msg)
-        except Exception as e:
-            error_msg = f"Houdini process failed: {str(e)}"
-            print(f"ERROR: {error_msg}")
-            raise RuntimeError(error_msg)
         #endregion
 
         import glob
@@ -274,18 +283,29 @@ def processCagedSDFSeg(data_ori, work_path, obj_path, isBig = True, maxValue = 1
             raise RuntimeError(error_msg)
         
         print(f"Found {len(files)} output files to process")
-        vols = []
-        count = 1
-        for file in files:
-            vol = vd.Mesh(file).split()
-            print(len(vol))
-            vols.append(vol)
-            for v in vol:
-                if len(v.cells) >= min_meshes:
-                    path = os.path.join(work_path, "objs/vol_%d.obj" % (count))
-                    print(path)
-                    v.write(path)
-                    count += 1
+        # split and write on meshing_workers threads (VTK releases the GIL);
+        # pieces are numbered up front so vol_%d.obj matches the sequential run
+        from concurrent.futures import ThreadPoolExecutor
+        meshingWorkers = max(int(config.get('meshing_workers', 1)), 1)
+
+        def splitMesh(file):
+            return vd.Mesh(file).split()
+
+        def writePiece(piece):
+            v, path = piece
+            v.write(path)
+            return path
+
+        with ThreadPoolExecutor(meshingWorkers) as executor:
+            vols = list(executor.map(splitMesh, files))
+            pieces = []
+            for vol in vols:
+                print(len(vol))
+                for v in vol:
+                    if len(v.cells) >= min_meshes:
+                        pieces.append((v, os.path.join(work_path, "objs/vol_%d.obj" % (len(pieces) + 1))))
+            for path in executor.map(writePiece, pieces):
+                print(path)
 
 def main():
     data_ori = get_from_nib('/Users/path/to/test_case/test_epoch_800_ind_453-vq-poc-351-big.nii')
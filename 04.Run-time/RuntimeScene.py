@@ -0,0 +1,204 @@
+import os
+import pybullet as p
+from huggingface_hub import hf_hub_download
+from utils_config import load_config
+from predictshapes import preloadModels, printModelMetrics
+from ImageJService import getImageJService
+from HoudiniSession import getHoudiniSession
+
+#region Scene setup shared by predict-runtime.py and batch-runtime.py
+# A scene is one shape hit by the sphere described in csv/<shape>-<csvNum>.csv,
+# run under cgf/<csv name>-<csvNum>[-s<seed>] in the workspace.
+
+size256 = 2
+size128 = 1
+size64 = 0
+sizeAuto = -1
+resolutionSizes = {"64": size64, "128": size128, "256": size256, "auto": sizeAuto}
+
+collisionNum = 1
+impulseMax = 10000
+
+maxValues = {"squirrel": 1.0, "bunny": 1.0, "base": 1.0, "lion": 1.0, "pot": 1.0, "sphere": 1.0}
+
+modelName = "cgf/"
+
+def get_local_file_path(filename, file_type="file"):
+    """Get local file path from data/run-time directory"""
+    local_path = os.path.join("data", "run-time", filename)
+
+    if os.path.exists(local_path):
+        print(f"✓ Found local {file_type}: {local_path}")
+        return local_path
+    else:
+        print(f"✗ Local {file_type} not found: {local_path}")
+        print(f"  Please ensure the file exists in data/run-time/")
+        return None
+
+def download_from_huggingface(filename, file_type="file"):
+    """Generic function to download files from Hugging Face (fallback)"""
+    try:
+        # First try to get from local directory
+        local_path = get_local_file_path(filename, file_type)
+        if local_path:
+            return local_path
+
+        # Fallback: Download from Hugging Face
+        print(f"Downloading {file_type} from Hugging Face: {filename}")
+        local_path = hf_hub_download(
+            repo_id="nikoloside/deepfracture",
+            filename=filename,
+            cache_dir="data/run-time"
+        )
+
+        return local_path
+    except Exception as e:
+        print(f"Error downloading {file_type} {filename}: {e}")
+        return None
+
+def get_model_path_from_huggingface(model_shape):
+    """Get model file path from Hugging Face"""
+    # Define the model file patterns with folder structure
+    # For encoder, return base path without .pt extension
+    # This allows predictshapes.py to append "encoder.pt" and "decoder.pt"
+    filename = f"{model_shape}/{model_shape}-"
+    local_path = os.path.join("data", "run-time", filename)
+    encoder_file = local_path + "encoder.pt"
+    decoder_file = local_path + "decoder.pt"
+
+    # Check if both encoder and decoder files exist
+    if os.path.exists(encoder_file) and os.path.exists(decoder_file):
+        print(f"✓ Found local encoder model: {encoder_file}")
+        print(f"✓ Found local decoder model: {decoder_file}")
+        return local_path
+    else:
+        if not os.path.exists(encoder_file):
+            print(f"✗ Local encoder model not found: {encoder_file}")
+        if not os.path.exists(decoder_file):
+            print(f"✗ Local decoder model not found: {decoder_file}")
+        return None
+
+def get_csv_path_from_huggingface(shape, csv_num):
+    """Get CSV file path from Hugging Face"""
+    filename = f"csv/{shape}-{csv_num}.csv"
+
+    return download_from_huggingface(filename, f"CSV for {shape}-{csv_num}")
+
+def get_obj_path_from_huggingface(obj_name):
+    """Get OBJ file path from Hugging Face"""
+    filename = f"objs/{obj_name}.obj"
+
+    return download_from_huggingface(filename, f"OBJ {obj_name}")
+
+def requirePath(path, error_msg):
+    if path is None:
+        print(error_msg)
+        raise FileNotFoundError(error_msg)
+    return path
+
+def resolveScene(shape, csvNum, seed = None, ws_workspace = None):
+    """CSV, OBJ and model paths and the workspace folders of one scene."""
+    if ws_workspace is None:
+        ws_workspace = load_config()["data_runtime_workspace_path"]
+
+    # Get CSV path from Hugging Face
+    print(f"Loading CSV for shape: {shape}, csv_num: {csvNum}")
+    csvPath = requirePath(get_csv_path_from_huggingface(shape, csvNum), f"Failed to load CSV for {shape}-{csvNum}")
+
+    run_name = os.path.basename(csvPath).split(".")[0] + f"-{csvNum}"
+    if seed is not None:
+        # seeded runs of the same CSV must not share (and clear) one garage
+        run_name += f"-s{seed}"
+    run_path = os.path.join(modelName, run_name)
+    print(run_name, csvPath, run_path)
+
+    targetNameA = shape
+    targetNameB = "sphere"
+
+    # Get OBJ paths from Hugging Face
+    print(f"Loading OBJ files for: {targetNameA}, {targetNameB}")
+    objAPath = requirePath(get_obj_path_from_huggingface(targetNameA), f"Failed to load OBJ for {targetNameA}")
+    objBPath = requirePath(get_obj_path_from_huggingface(targetNameB), f"Failed to load OBJ for {targetNameB}")
+
+    # Get model paths from Hugging Face
+    print(f"Loading models for shape: {shape}")
+    modelNameA = requirePath(get_model_path_from_huggingface(shape), f"Failed to load encoder model for {shape}")
+
+    return {
+        "shape": shape,
+        "csvNum": csvNum,
+        "seed": seed,
+        "runName": run_name,
+        "csvPath": csvPath,
+        "targetName": [targetNameA, targetNameB],
+        "paths": [objAPath, objBPath],
+        "model": modelNameA,
+        "garagePath": os.path.join(ws_workspace, run_path, targetNameA),
+        "resultPath": os.path.join(ws_workspace, run_path, "obj_animation"),
+        "workspace": ws_workspace,
+    }
+
+def startServices(models, config = None):
+    """Load the weights and start the segmentation / boolean workers before the first impact."""
+    config = config or load_config()
+    preloadModels(models)
+    # start the JVM / Fiji segmentation workers before the first impact too
+    if config.get('segmentation_backend', 'skimage') == 'imagej':
+        getImageJService().start()
+    # and the Houdini boolean worker, which keeps running across impacts
+    if config['use_houdini'] and config.get('houdini_persistent', False):
+        getHoudiniSession().start()
+
+def printServiceMetrics(config = None):
+    config = config or load_config()
+    printModelMetrics()
+    if config.get('segmentation_backend', 'skimage') == 'imagej':
+        getImageJService().printMetrics()
+    if config['use_houdini'] and config.get('houdini_persistent', False):
+        getHoudiniSession().printMetrics()
+
+def populateWorld(world, scene, resolution = "128", isFracturing = True):
+    """Create the CSV's objects in world; predicted fractures go to the scene's garage."""
+    world.resultPath = scene["resultPath"]
+
+    garagePathA = scene["garagePath"]
+    fracturePathA = os.path.join(garagePathA, "objs", "*.obj")
+    if isFracturing:
+        fracturePathA = ""  # Clear fracture path when using neural network prediction
+    else:
+        # Use existing pre-computed fracture patterns from files
+        pass
+
+    targetName = scene["targetName"]
+    shapeName = targetName
+    paths = scene["paths"]
+    colors = [[0,1,0,1], [1,0,0,1]]
+    garagePaths = [garagePathA, ""]
+    fracturePaths = [fracturePathA, ""]
+    models = [scene["model"], ""]  # the model path prefix found in data/run-time
+    staticsMass = [1, 1]
+    isBig = [resolutionSizes[resolution], size128]
+    frictions = [-1, -1]
+    restitutions = [-1, -1]
+
+    os.makedirs(os.path.join(garagePathA), exist_ok=True)
+    os.makedirs(world.resultPath, exist_ok=True)
+
+    with open(scene["csvPath"], 'r') as csv:
+        Lines = csv.readlines()
+
+    print("total object %d." % (len(Lines)))
+
+    # Create all objects first
+    for i in range(len(Lines)):
+        strs = Lines[i].split(';')
+        objName = targetName[i] # strs[1]
+
+        print("Start loading: %s, %f, %f, %f" % (objName,float(strs[2]), float(strs[3]), float(strs[4])))
+        pos = [float(strs[2]), float(strs[3]), float(strs[4])]
+        rot = p.getQuaternionFromEuler([float(strs[5]), float(strs[6]), float(strs[7])])
+        lVel = [float(strs[8]), float(strs[9]), float(strs[10])]
+        aVel = [float(strs[11]), float(strs[12]), float(strs[13])]
+
+        world.CreateBreakableObj(objName, pos, rot, lVel, aVel, paths[i], colors[i], staticsMass[i], frictions[i], restitutions[i], fracturePaths[i], garagePaths[i], models[i], isBig[i], maxValues[shapeName[i]], False, scene["workspace"])
+#endregion
@@ -0,0 +1,232 @@
+import os, sys
+import json
+import time
+import argparse
+import traceback
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import torch
+import pybullet as p
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils_config import load_config
+from BreakableWorld import BreakableWorld
+# the released checkpoints pickle these as __main__ classes; spawned workers import this file as __main__
+from predict.Model.load_VQfinal2resolutionv2 import MultiLatentEncoder, AutoDecoder
+from RuntimeScene import get_model_path_from_huggingface, resolveScene, startServices, populateWorld, collisionNum, impulseMax
+
+# predict-runtime.py runs one scene per process. This runs a list of
+# (shape, CSV preset, seed) scenarios on a process pool instead: every worker
+# preloads the models of the batch once, owns one DIRECT PyBullet client that
+# each of its scenarios resets and reuses, and steps without real-time pacing.
+# Each scenario's output goes to <log-dir>/<shape>-<csv>-s<seed>.log; results
+# and timings are collected into one JSON report:
+#
+#   python 04.Run-time/batch-runtime.py bunny:260 squirrel:260 base:261 pot:79
+#   python 04.Run-time/batch-runtime.py --file scenarios.txt --seeds 0 1 2 --workers 8
+#
+# A scenario is "shape:csvNum[:seed]"; scenario files hold one per line (or
+# "shape csvNum [seed]"), "#" starts a comment. --seeds expands scenarios that
+# have no seed of their own; a scenario given more than once runs once.
+
+_worker = {}
+
+def parseScenario(text):
+    fields = text.replace(":", " ").split()
+    if len(fields) not in (2, 3):
+        raise ValueError("scenario must be shape:csvNum[:seed], got %r" % (text,))
+    return (fields[0], int(fields[1]), int(fields[2]) if len(fields) == 3 else None)
+
+def readScenarios(path):
+    scenarios = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if line:
+                scenarios.append(parseScenario(line))
+    return scenarios
+
+def scenarioName(scenario):
+    shape, csvNum, seed = scenario
+    return "%s-%d" % (shape, csvNum) + ("" if seed is None else "-s%d" % (seed))
+
+def initWorker(models, options):
+    # N workers share the cores instead of each running torch on all of them
+    torch.set_num_threads(options["torchThreads"])
+    _worker["cwd"] = os.getcwd()
+    _worker["options"] = options
+    _worker["client"] = p.connect(p.DIRECT)
+    if options["isFracturing"]:
+        logPath = os.path.join(options["logDir"], "worker-%d.log" % (os.getpid()))
+        with open(logPath, "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            startServices(models)
+
+def runScenario(scenario):
+    options = _worker["options"]
+    shape, csvNum, seed = scenario
+    result = {"scenario": scenarioName(scenario), "shape": shape, "csvNum": csvNum, "seed": seed,
+              "pid": os.getpid(), "log": os.path.join(options["logDir"], scenarioName(scenario) + ".log")}
+    start = time.time()
+    with open(result["log"], "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            if seed is not None:
+                # the fracture latent is drawn from torch's generator
+                torch.manual_seed(seed)
+                np.random.seed(seed)
+            scene = resolveScene(shape, csvNum, seed, options["workspace"])
+            world = BreakableWorld(isDirect = True, bulletFile = "", needOutput = options["isSaving"], allowAutoFracture = options["isFracturing"], timeRange = options["timeRange"], hasGravity = False, collisionNum = collisionNum, impulseMax = impulseMax, realtime = False, animationFormat = options["animationFormat"], physicsClient = _worker["client"])
+            populateWorld(world, scene, options["resolution"], options["isFracturing"])
+            setupEnd = time.time()
+            world.StartRun()
+            runEnd = time.time()
+            world.printStepTimes()
+            world.StopRun()
+            result.update({
+                "status": "ok",
+                "setupTime": setupEnd - start,
+                "runTime": runEnd - setupEnd,
+                "steps": world.steps,
+                "stepTimes": dict(world.stepTimes),
+                "fractured": [b.name for b in world.BreakableList if b.hasFractured],
+                "fragments": sum(len(b.fracList) for b in world.BreakableList),
+            })
+        except Exception as e:
+            traceback.print_exc()
+            result.update({"status": "error", "error": "%s: %s" % (type(e).__name__, e)})
+        finally:
+            # a fracture chdirs into the workspace; the next scenario resolves data/run-time again
+            os.chdir(_worker["cwd"])
+    result["wallTime"] = time.time() - start
+    return result
+
+def summarize(results, wallTime, workers):
+    ok = [r for r in results if r["status"] == "ok"]
+    stepTimes = {}
+    for r in ok:
+        for stage, seconds in r["stepTimes"].items():
+            stepTimes[stage] = stepTimes.get(stage, 0.0) + seconds
+    runTimes = sorted(r["runTime"] for r in ok)
+    return {
+        "scenarios": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "fractured": sum(1 for r in ok if r["fractured"]),
+        "workers": workers,
+        "wallTime": wallTime,
+        "scenarioTime": sum(r["wallTime"] for r in results),
+        "scenariosPerHour": 3600.0 * len(results) / wallTime if wallTime else 0.0,
+        "meanRunTime": sum(runTimes) / len(runTimes) if runTimes else 0.0,
+        "medianRunTime": runTimes[len(runTimes) // 2] if runTimes else 0.0,
+        "stepTimes": stepTimes,
+    }
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="DeepFracture batch runtime evaluation")
+    parser.add_argument("scenarios", nargs="*", help="shape:csvNum[:seed]")
+    parser.add_argument("--file", type=str, default=None, help="scenario file, one shape:csvNum[:seed] per line")
+    parser.add_argument("--seeds", type=int, nargs="*", default=None, help="run every unseeded scenario once per seed")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: one per core, at most one per scenario)")
+    parser.add_argument("--report", type=str, default="batch-report.json", help="JSON report path (default: batch-report.json)")
+    parser.add_argument("--log-dir", type=str, default="batch-logs", help="per-scenario output folder (default: batch-logs)")
+    parser.add_argument("--resolution", type=str, default="128", choices=["64", "128", "256", "auto"])
+    parser.add_argument("--time-range", type=int, default=20, help="simulation steps per scenario (default: 20)")
+    parser.add_argument("--use_fractured_pattern", action="store_true",
+                        help="Use existing pre-computed fracture patterns (don't predict)")
+    parser.add_argument("--save-animation", action="store_true")
+    parser.add_argument("--animation-format", type=str, default="cache", choices=["obj", "cache"])
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    config = load_config()
+
+    scenarios = [parseScenario(s) for s in args.scenarios]
+    if args.file:
+        scenarios += readScenarios(args.file)
+    if args.seeds:
+        seeded = []
+        for shape, csvNum, seed in scenarios:
+            seeded += [(shape, csvNum, seed)] if seed is not None else [(shape, csvNum, s) for s in args.seeds]
+        scenarios = seeded
+    # a repeated scenario would share its log and garage folder with the first one
+    # (and its result); repeat runs are --seeds
+    unique = list(dict.fromkeys(scenarios))
+    if len(unique) < len(scenarios):
+        print("Skipping %d duplicate scenario(s): %s" % (len(scenarios) - len(unique),
+              ", ".join(sorted(set(scenarioName(s) for s in scenarios if scenarios.count(s) > 1)))))
+        scenarios = unique
+    if len(scenarios) == 0:
+        print("No scenarios given")
+        sys.exit(1)
+
+    isFracturing = not args.use_fractured_pattern
+    models = []
+    if isFracturing:
+        for shape in sorted(set(s[0] for s in scenarios)):
+            model = get_model_path_from_huggingface(shape)
+            if model is None:
+                print(f"Failed to load encoder model for {shape}")
+                sys.exit(1)
+            models.append(model)
+
+    workers = args.workers or os.cpu_count() or 1
+    if isFracturing and config['use_houdini'] and config.get('houdini_backend', 'houdini') == 'houdini':
+        # every worker would drive the same /obj/geo1 network of the one running Houdini
+        print("use_houdini: running the batch on 1 worker")
+        workers = 1
+    workers = max(min(workers, len(scenarios)), 1)
+
+    os.makedirs(args.log_dir, exist_ok=True)
+    options = {
+        "workspace": config["data_runtime_workspace_path"],
+        "logDir": os.path.abspath(args.log_dir),
+        "resolution": args.resolution,
+        "timeRange": args.time_range,
+        "isFracturing": isFracturing,
+        "isSaving": args.save_animation,
+        "animationFormat": args.animation_format,
+        "torchThreads": max((os.cpu_count() or 1) // workers, 1),
+    }
+
+    print("Running %d scenario(s) on %d worker(s)" % (len(scenarios), workers))
+    start = time.time()
+    results = {}
+    # spawn: workers must not inherit the parent's torch / PyBullet state
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=initWorker, initargs=(models, options)) as pool:
+        futures = {pool.submit(runScenario, scenario): scenario for scenario in scenarios}
+        for future in as_completed(futures):
+            scenario = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker itself died (or failed to start)
+                result = {"scenario": scenarioName(scenario), "shape": scenario[0], "csvNum": scenario[1],
+                          "seed": scenario[2], "status": "error", "error": "%s: %s" % (type(e).__name__, e), "wallTime": 0.0}
+            results[scenario] = result
+            if result["status"] == "ok":
+                print("%-24s ok     %7.2f s  %3d fragment(s)  [%d/%d]" % (
+                    result["scenario"], result["wallTime"], result["fragments"], len(results), len(scenarios)))
+            else:
+                print("%-24s error  %s  [%d/%d]" % (result["scenario"], result["error"], len(results), len(scenarios)))
+    wallTime = time.time() - start
+
+    ordered = [results[s] for s in scenarios]
+    report = {"summary": summarize(ordered, wallTime, workers), "options": options, "results": ordered}
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    summary = report["summary"]
+    print("%d scenario(s): %d ok, %d error(s), %d fractured" % (
+        summary["scenarios"], summary["ok"], summary["errors"], summary["fractured"]))
+    print("wall %.2f s on %d worker(s) (%.2f s of scenario time), %.1f scenarios/hour" % (
+        wallTime, workers, summary["scenarioTime"], summary["scenariosPerHour"]))
+    for stage, seconds in summary["stepTimes"].items():
+        print("  %-9s %8.3f s" % (stage, seconds))
+    print("Report: " + args.report)
+    if summary["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
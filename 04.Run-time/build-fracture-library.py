@@ -0,0 +1,47 @@
+import os, sys
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils_config import load_config
+# the released checkpoints pickle these as __main__ classes
+from predict.Model.load_VQfinal2resolutionv2 import MultiLatentEncoder, AutoDecoder
+from predictshapes import buildFractureLibrary
+from RuntimeScene import get_model_path_from_huggingface, get_obj_path_from_huggingface, requirePath, resolutionSizes, maxValues
+
+# Precompute the fracture of every codebook entry of a shape for 04.Run-time:
+# each entry is decoded and carved out of the shape's OBJ by processCagedSDFSeg,
+# with the segmentation / boolean settings of config.yaml, exactly as an impact
+# without a library would be. Impacts then read their fragments from
+# <fracture_library_path>/<shape>-<resolution>.npz instead:
+#
+#   python 04.Run-time/build-fracture-library.py bunny --resolution 128
+#
+# Libraries from 05.Colab-Runtime (python -m runtime.library) hold uncarved
+# fragments and are not used here.
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="DeepFracture run-time fracture library")
+    parser.add_argument("shape", type=str)
+    parser.add_argument("--resolution", type=str, default="128", choices=["64", "128", "256"])
+    parser.add_argument("--codes", type=int, nargs="*", default=None, help="codebook entries (default: all)")
+    parser.add_argument("--out", type=str, default=None,
+                        help="archive path (default: <fracture_library_path>/<shape>-<resolution>.npz)")
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    config = load_config()
+
+    out = args.out
+    if out is None:
+        if not config.get('fracture_library_path'):
+            print("Set fracture_library_path in config.yaml or pass --out")
+            sys.exit(1)
+        out = os.path.join(config['fracture_library_path'], "%s-%s.npz" % (args.shape, args.resolution))
+
+    model = requirePath(get_model_path_from_huggingface(args.shape), f"Failed to load encoder model for {args.shape}")
+    objPath = requirePath(get_obj_path_from_huggingface(args.shape), f"Failed to load OBJ for {args.shape}")
+    buildFractureLibrary(model, args.shape, objPath, resolutionSizes[args.resolution], maxValues.get(args.shape, 1.0), out, args.codes)
+    print("Wrote " + out)
+
+if __name__ == "__main__":
+    main()
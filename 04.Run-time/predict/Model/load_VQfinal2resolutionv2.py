@@ -92,20 +92,36 @@ class AutoDecoder(nn.Module):
         else:
             return self.forwardBig(input_x)
 
-    def forwardMiddle(self, input_x):
-        feature = self.fc(input_x).reshape(1, self.ndf*8, int(self.data_shape/16), int(self.data_shape/16), int(self.data_shape/16))
+    def forwardTrunk(self, input_x):
+        feature = self.fc(input_x).reshape(-1, self.ndf*8, int(self.data_shape/16), int(self.data_shape/16), int(self.data_shape/16))
         output = self.decoder(feature)
-        output = self.toVoxelMd(output)
-        output = output.view(1,1,self.data_shape,self.data_shape,self.data_shape)
 
         return output
-    def forwardBig(self, input_x):
-        feature = self.fc(input_x).reshape(1, self.ndf*8, int(self.data_shape/16), int(self.data_shape/16), int(self.data_shape/16))
-        output = self.decoder(feature)
-        output = self.toVoxelBig(output)
-        output = output.view(1,1,self.data_shape*2,self.data_shape*2,self.data_shape*2)
+    def headSmall(self, trunk):
+        # Even-index polyphase of toVoxelMd (out[2m] = in[m]*w[1] + in[m-1]*w[3] per axis):
+        # the 64^3 samples the old Upsample picked, without computing 128^3
+        weight = self.toVoxelMd[0].weight[:, :, [3, 1]][:, :, :, [3, 1]][:, :, :, :, [3, 1]]
+        output = F.conv3d(F.pad(trunk, (1, 0, 1, 0, 1, 0)), weight.transpose(0, 1).to(trunk.dtype))
+        output = torch.tanh(output).view(-1,1,int(self.data_shape/2),int(self.data_shape/2),int(self.data_shape/2))
+
+        return output
+    def headMiddle(self, trunk):
+        output = self.toVoxelMd(trunk)
+        output = output.view(-1,1,self.data_shape,self.data_shape,self.data_shape)
 
         return output
+    def headBig(self, trunk):
+        output = self.toVoxelBig(trunk)
+        output = output.view(-1,1,self.data_shape*2,self.data_shape*2,self.data_shape*2)
+
+        return output
+
+    def forwardSmall(self, input_x):
+        return self.headSmall(self.forwardTrunk(input_x))
+    def forwardMiddle(self, input_x):
+        return self.headMiddle(self.forwardTrunk(input_x))
+    def forwardBig(self, input_x):
+        return self.headBig(self.forwardTrunk(input_x))
 
     def codes(self):
         return self.latent_vectors
@@ -2,8 +2,13 @@ import torch
 import json
 import numpy as np
 import torch.nn.init as init
-import os, time, yaml
+import os, sys, time, yaml
 from utils_config import get_training_config
+from runtime.export import load_torchscript
+from runtime.library import open_library
+from runtime.registry import ModelRegistry
+from runtime.segmentation import needs_detail, segment_volume
+from runtime.volume_cache import VolumeCache
 
 
 import torch._utils
@@ -55,20 +60,24 @@ import shutil
 
 
 Shape3Lists = {"squirrel":0, "bunny":1, "lion": 2}
+# is_Big: 2 = 256^3, 1 = 128^3, 0 = 64^3, -1 = adaptive (64^3 probe, then 128^3 or 256^3)
+Resolutions = {2: 256, 1: 128, 0: 64, -1: 128}
 
-def judge(impList, posList, dirList, collisionNum):
-    mps_device = torch.device("cpu")
-    encoderPath = sourcePath + model + "encoder.pt"
-    decoderPath = sourcePath + model + "decoder.pt"
-    print(decoderPath)
-    encoder = torch.load(encoderPath, map_location=mps_device, weights_only=False)
-    decoder = torch.load(decoderPath, map_location=mps_device, weights_only=False)
+_volumeCache = None
 
-    encoder.to(mps_device)
-    decoder.to(mps_device)
+def getVolumeCache():
+    """Decoded volumes only depend on (model, codebook index, resolution)."""
+    global _volumeCache
+    if _volumeCache is None:
+        config = get_training_config()
+        _volumeCache = VolumeCache(
+            max_bytes=int(config.get('volume_cache_mb', 512)) * 1024 ** 2,
+            cache_dir=config.get('volume_cache_path') or None)
+    return _volumeCache
 
-    encoder.eval()
-    decoder.eval()
+def judge(impList, posList, dirList, collisionNum):
+    mps_device = torch.device("cpu")
+    encoder, decoder = loadModels(sourcePath + model)
 
     impVec = []
     posVec = []
@@ -107,7 +116,13 @@ def judge(impList, posList, dirList, collisionNum):
     return output[0][1] > output[0][0]
 
 
-def predict(work_path, objName, model, impList, posList, dirList, is_Big, maxValue, isMulShapes, name, collisionNum):
+def loadModelFiles(model):
+    # Frozen artifacts from `python -m runtime.export --prefix <model>`
+    models = load_torchscript(model)
+    if models is not None:
+        print("Loaded TorchScript models: " + model)
+        return models
+
     mps_device = torch.device("cpu")
     encoderPath = model + "encoder.pt"
     decoderPath = model + "decoder.pt"
@@ -120,6 +135,36 @@ def predict(work_path, objName, model, impList, posList, dirList, is_Big, maxVal
 
     encoder.eval()
     decoder.eval()
+    return encoder, decoder
+
+
+_modelRegistry = None
+
+def getModelRegistry():
+    """Encoder/decoder pairs stay loaded across fracture events."""
+    global _modelRegistry
+    if _modelRegistry is None:
+        budget = int(get_training_config().get('model_memory_budget_mb', 0))
+        _modelRegistry = ModelRegistry(loadModelFiles, budget_bytes=budget * 1024 ** 2 or None)
+    return _modelRegistry
+
+def loadModels(model):
+    return getModelRegistry().get(model)
+
+def preloadModels(models):
+    start = time.time()
+    getModelRegistry().preload(models)
+    print("Preloaded %d model(s) in %.3f s" % (len(models), time.time() - start))
+
+def printModelMetrics():
+    metrics = getModelRegistry().metrics()
+    print("Model registry: %d hits, %d misses (hit rate %.2f), %d loads in %.3f s, %d evictions, %.1f MB resident" % (
+        metrics["hits"], metrics["misses"], metrics["hit_rate"], metrics["loads"],
+        metrics["load_seconds"], metrics["evictions"], metrics["resident_bytes"] / 1024 ** 2))
+
+
+def cookCollision(encoder, decoder, impList, posList, dirList, isMulShapes, name, collisionNum):
+    mps_device = torch.device("cpu")
 
     impVec = []
     posVec = []
@@ -157,29 +202,19 @@ def predict(work_path, objName, model, impList, posList, dirList, is_Big, maxVal
     latent_z = torch.FloatTensor(1, 8, device="cpu").to(mps_device)
     init.xavier_normal_(latent_z)
 
-    start = time.time()
-
     # Cook
     if not isMulShapes:
         input_x, min_index, dist = decoder.Cook(feature, latent_z)
     else:
         input_x, min_index, dist = decoder.Cook(decoder.shapes()[Shape3Lists[name]].unsqueeze(0), feature, latent_z)
 
-    # Small
-    if is_Big == 2:
-        output = decoder.forwardBig(input_x).squeeze().squeeze()
-    elif is_Big == 1:
-        output = decoder.forwardMiddle(input_x).squeeze().squeeze()
-    else: # is_Big == 0:
-        output = decoder.forwardMiddle(input_x)
-        downsample = torch.nn.Upsample(size=(64, 64, 64))
-        output = downsample(output).squeeze().squeeze()
-
-    print(output.shape)
+    return input_x, int(min_index.item())
 
-    end = time.time()
-    print("Pred. Time: ", (end - start))
 
+def resetObjsFolder(work_path):
+    # background OBJ exports of an earlier fracture may still be writing here
+    from MeshBoolean.pyMeshBool import wait_exports
+    wait_exports()
     os.makedirs(work_path, exist_ok=True) 
 
     clean_folder = os.path.join(work_path, "objs")
@@ -188,4 +223,152 @@ def predict(work_path, objName, model, impList, posList, dirList, is_Big, maxVal
         shutil.rmtree(os.path.join(work_path, "objs")) 
     os.makedirs(os.path.join(work_path, "objs"), exist_ok=True) 
 
-    processCagedSDFSeg(output.to('cpu').detach().numpy(), work_path, objName, is_Big, maxValue)
+
+# runtime.library tag of archives meshed by processCagedSDFSeg (see buildFractureLibrary)
+LibraryPipeline = "run-time"
+
+def getFractureLibrary(name, is_Big):
+    """Precomputed fragments <name>-<resolution>.npz (runtime.library) if configured."""
+    libraryFolder = get_training_config().get('fracture_library_path')
+    if not libraryFolder:
+        return None
+    resolution = Resolutions.get(is_Big, 64)
+    libraryPath = os.path.join(libraryFolder, "%s-%d.npz" % (name, resolution))
+    if not os.path.exists(libraryPath):
+        return None
+    library = open_library(libraryPath)
+    if library.pipeline != LibraryPipeline:
+        # e.g. a Colab library: uncarved skimage fragments, not what a miss would produce
+        print("Ignoring fracture library %s: built by the %s pipeline, not %s" % (libraryPath, library.pipeline, LibraryPipeline))
+        return None
+    return library
+
+
+def buildFractureLibrary(model, name, objPath, is_Big, maxValue, outPath, codes = None):
+    """
+    Write the fracture library of one shape: every codebook entry decoded at is_Big's
+    resolution and carved out of objPath by processCagedSDFSeg, as predict would.
+    """
+    from runtime.library import write_library
+    import tempfile
+
+    if is_Big not in (0, 1, 2):
+        raise ValueError("a fracture library needs a fixed resolution (is_Big 0, 1 or 2)")
+    encoder, decoder = loadModels(model)
+    if hasattr(decoder, "shapes"):
+        # multi-shape decoders Cook with a shape latent, not a plain cookbook row
+        raise ValueError("fracture libraries need a single-shape decoder")
+    nCodes = int(decoder.cookbook.shape[0])
+    codes = range(nCodes) if codes is None else codes
+    objPath = os.path.abspath(objPath)
+    work_path = tempfile.mkdtemp(prefix="fracture-library-")
+
+    def fragmentsOf(codeIdx):
+        with torch.no_grad():
+            trunk = decoder.forwardTrunk(decoder.cookbook[codeIdx:codeIdx + 1])
+            if is_Big == 2:
+                output = decoder.headBig(trunk)
+            elif is_Big == 1:
+                output = decoder.headMiddle(trunk)
+            else:
+                output = decoder.headSmall(trunk)
+        resetObjsFolder(work_path)
+        fragments = processCagedSDFSeg(output.squeeze().squeeze().to('cpu').detach().numpy(), work_path, objPath, is_Big, maxValue)
+        if fragments is None:
+            import trimesh
+            files = glob.glob(os.path.join(work_path, "objs", "*.obj"))
+            fragments = [trimesh.load(f, force="mesh") for f in sorted(files)]
+        return fragments
+
+    try:
+        return write_library(outPath, name, Resolutions[is_Big], nCodes, codes, fragmentsOf, pipeline = LibraryPipeline, status_cb = print)
+    finally:
+        from MeshBoolean.pyMeshBool import wait_exports
+        wait_exports()
+        shutil.rmtree(work_path, ignore_errors = True)
+
+
+def predictFromLibrary(work_path, model, impList, posList, dirList, is_Big, isMulShapes, name, collisionNum):
+    """
+    (fragments, cooked): fragments straight from the fracture library, False on a miss.
+    Like predict: the fragments with in_memory_pipeline, else None once objs/vol_*.obj are written.
+    cooked is cookCollision's (input_x, codeIdx), None without a library; pass it on to
+    predict so a miss decodes the codebook entry that was looked up.
+    """
+    library = getFractureLibrary(name, is_Big)
+    if library is None:
+        return False, None
+
+    start = time.time()
+    encoder, decoder = loadModels(model)
+    cooked = cookCollision(encoder, decoder, impList, posList, dirList, isMulShapes, name, collisionNum)
+    codeIdx = cooked[1]
+    fragments = library.fragments(codeIdx)
+    if fragments is None:
+        print("Fracture library miss: codebook #%d" % (codeIdx))
+        return False, cooked
+
+    resetObjsFolder(work_path)
+    from MeshBoolean.pyMeshBool import submit_export, write_fragments
+    config = get_training_config()
+    inMemory = config.get('in_memory_pipeline', False)
+    if not inMemory:
+        write_fragments(os.path.join(work_path, "objs"), fragments)
+    elif config.get('export_fragments', True):
+        submit_export(write_fragments, os.path.join(work_path, "objs"), fragments)
+
+    end = time.time()
+    print("Fracture library hit: codebook #%d, %d fragments, %.3f s" % (codeIdx, len(fragments), end - start))
+    return (fragments if inMemory else None), cooked
+
+
+def predict(work_path, objName, model, impList, posList, dirList, is_Big, maxValue, isMulShapes, name, collisionNum, cooked = None):
+    """
+    The fragments with in_memory_pipeline (see processCagedSDFSeg), else None once objs/vol_*.obj are written.
+    cooked: (input_x, codeIdx) already returned by cookCollision for this impact (e.g. by predictFromLibrary).
+    """
+    encoder, decoder = loadModels(model)
+
+    start = time.time()
+
+    if cooked is None:
+        cooked = cookCollision(encoder, decoder, impList, posList, dirList, isMulShapes, name, collisionNum)
+    input_x, codeIdx = cooked
+    cacheName = model + (name if isMulShapes else "")
+
+    # fc + shared transposed convs, computed at most once for all heads
+    trunk = None
+
+    if is_Big == -1:
+        coarse = getVolumeCache().get((cacheName, codeIdx, 64))
+        if coarse is None:
+            trunk = decoder.forwardTrunk(input_x)
+            coarse = getVolumeCache().put((cacheName, codeIdx, 64), decoder.headSmall(trunk).squeeze().squeeze().to('cpu').detach().numpy())
+        is_Big = 2 if needs_detail(segment_volume(coarse, maxValue), posList[:collisionNum]) else 1
+        print("Adaptive resolution: %d" % (Resolutions[is_Big]))
+
+    resolution = Resolutions.get(is_Big, 64)
+    cacheKey = (cacheName, codeIdx, resolution)
+    output = getVolumeCache().get(cacheKey)
+
+    if output is not None:
+        print("Volume cache hit: codebook #%d" % (codeIdx))
+    else:
+        if trunk is None:
+            trunk = decoder.forwardTrunk(input_x)
+        if is_Big == 2:
+            output = decoder.headBig(trunk).squeeze().squeeze()
+        elif is_Big == 1:
+            output = decoder.headMiddle(trunk).squeeze().squeeze()
+        else: # is_Big == 0: true 64^3 head, no 128^3 decode + downsample
+            output = decoder.headSmall(trunk).squeeze().squeeze()
+        output = getVolumeCache().put(cacheKey, output.to('cpu').detach().numpy())
+
+    print(output.shape)
+
+    end = time.time()
+    print("Pred. Time: ", (end - start))
+
+    resetObjsFolder(work_path)
+
+    return processCagedSDFSeg(output, work_path, objName, is_Big, maxValue)
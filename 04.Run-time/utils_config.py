@@ -3,6 +3,10 @@ import os
 # Import the parent directory's utils_config directly
 parent_dir = os.path.join(os.path.dirname(__file__), '..')
 sys.path.insert(0, parent_dir)
+# and the Colab runtime package (05.Colab-Runtime/runtime) shared with the run-time
+colab_runtime_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '05.Colab-Runtime')
+if colab_runtime_dir not in sys.path:
+    sys.path.append(colab_runtime_dir)
 import utils_config as root_utils_config
 
 def load_config(config_path="config.yaml"):
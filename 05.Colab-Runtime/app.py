@@ -7,13 +7,14 @@ pure-Python watershed segments it into fragments, and the fragments fall
 back into the simulation.
 """
 
+import os
 import queue
 import threading
 
 import gradio as gr
 
 from runtime.pipeline import run_demo
-from runtime.predictor import SHAPES, download_asset, load_models
+from runtime.predictor import SHAPES, download_asset, preload_models
 from runtime.scene import click_to_shot, render_preview
 
 HEADER = """
@@ -41,7 +42,7 @@ def scene_image(shape):
 
 def warmup():
     try:
-        load_models("squirrel")
+        preload_models(os.environ.get("DF_PRELOAD_SHAPES", "squirrel").split(","))
         scene_image("squirrel")
     except Exception as e:  # noqa: BLE001 — warmup is best-effort
         print("warmup failed:", e)
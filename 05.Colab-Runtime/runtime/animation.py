@@ -0,0 +1,186 @@
+"""Compact animation cache: rigid-body poses per frame instead of OBJs.
+
+A fractured scene only moves rigid bodies, so a recording stores every
+body's local mesh once (`topology.npz`) and then one fixed-size record per
+active body per frame (`transforms.bin`: frame, body, position, rotation as
+an [x, y, z, w] quaternion), appended as the simulation runs and read back
+through a memory map. Recording costs O(bodies) per frame; OBJ or GLB files
+are baked on demand, named like 04.Run-time's `<object>_<frame>.obj`:
+
+    python -m runtime.animation <result>/animation --out frames --format obj
+    python -m runtime.animation <result>/animation --frames 0:200:10 --format glb
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+RECORD = np.dtype([("frame", "<i4"), ("body", "<i4"),
+                   ("position", "<f8", 3), ("rotation", "<f8", 4)])
+
+
+def quaternion_matrices(rotations):
+    """[x, y, z, w] quaternions (..., 4) -> rotation matrices (..., 3, 3)."""
+    q = np.asarray(rotations, dtype=np.float64)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    x, y, z, w = np.moveaxis(q, -1, 0)
+    return np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], -1),
+        np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], -1),
+        np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], -1),
+    ], -2)
+
+
+class AnimationRecorder:
+    """Append-only writer of an animation cache directory."""
+
+    def __init__(self, path, timestep=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.timestep = timestep
+        self.objects = []          # object names, in order of first appearance
+        self.bodies = []           # (object index, vertices, faces)
+        self._keys = {}
+        self._saved = 0            # bodies already in topology.npz
+        self._file = open(os.path.join(path, "transforms.bin"), "wb")
+
+    def add_body(self, key, obj_name, vertices, faces):
+        """Index of the body registered under key; its mesh is stored on first sight."""
+        if key not in self._keys:
+            if obj_name not in self.objects:
+                self.objects.append(obj_name)
+            self._keys[key] = len(self.bodies)
+            self.bodies.append((self.objects.index(obj_name),
+                                np.asarray(vertices, dtype=np.float64),
+                                np.asarray(faces, dtype=np.int32)))
+        return self._keys[key]
+
+    def record(self, frame, poses):
+        """Append one frame; poses is a list of (body index, position, rotation xyzw)."""
+        if self._saved < len(self.bodies):
+            self._save_topology()
+        records = np.empty(len(poses), dtype=RECORD)
+        if len(poses):
+            bodies, positions, rotations = zip(*poses)
+            records["frame"] = frame
+            records["body"] = bodies
+            records["position"] = positions
+            records["rotation"] = rotations
+        self._file.write(records.tobytes())
+
+    def _save_topology(self):
+        counts = np.array([[len(v), len(f)] for _, v, f in self.bodies], dtype=np.int64)
+        tmp_path = os.path.join(self.path, "topology.tmp.npz")
+        np.savez(tmp_path,
+                 meta=np.array([FORMAT_VERSION]),
+                 header=np.array(json.dumps({"objects": self.objects, "timestep": self.timestep})),
+                 owners=np.array([owner for owner, _, _ in self.bodies], dtype=np.int32),
+                 counts=counts.reshape(-1, 2),
+                 vertices=np.concatenate([v for _, v, _ in self.bodies]),
+                 faces=np.concatenate([f for _, _, f in self.bodies]))
+        os.replace(tmp_path, os.path.join(self.path, "topology.npz"))
+        self._saved = len(self.bodies)
+
+    def flush(self):
+        if self._saved < len(self.bodies):
+            self._save_topology()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class AnimationCache:
+    """Read side: memory-mapped transforms plus the stored topology."""
+
+    def __init__(self, path):
+        with np.load(os.path.join(path, "topology.npz")) as topology:
+            if int(topology["meta"][0]) != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported animation format {topology['meta'][0]}")
+            header = json.loads(str(topology["header"]))
+            owners, counts = topology["owners"], topology["counts"]
+            vertices, faces = topology["vertices"], topology["faces"]
+        self.objects = header["objects"]
+        self.timestep = header["timestep"]
+        self.owners = owners
+        offsets = np.zeros((len(counts) + 1, 2), dtype=np.int64)
+        np.cumsum(counts, axis=0, out=offsets[1:])
+        self.meshes = [(vertices[v0:v1], faces[f0:f1])
+                       for (v0, f0), (v1, f1) in zip(offsets[:-1], offsets[1:])]
+
+        transforms = os.path.join(path, "transforms.bin")
+        if os.path.getsize(transforms) >= RECORD.itemsize:
+            self.records = np.memmap(transforms, dtype=RECORD, mode="r",
+                                     shape=(os.path.getsize(transforms) // RECORD.itemsize,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD)
+        self.frames = np.unique(self.records["frame"])
+
+    def poses(self, frame):
+        """The records of one frame (frames are appended in order)."""
+        start, end = np.searchsorted(self.records["frame"], [frame, frame + 1])
+        return self.records[start:end]
+
+    def mesh(self, frame, obj_name):
+        """World-space (vertices, faces) of an object's active bodies at a frame, merged."""
+        owner = self.objects.index(obj_name)
+        poses = self.poses(frame)
+        poses = poses[self.owners[poses["body"]] == owner]
+        matrices = quaternion_matrices(poses["rotation"]) if len(poses) else ()
+        parts = [self.meshes[body] for body in poses["body"]]
+        vertices = np.empty((sum(len(v) for v, _ in parts), 3), dtype=np.float64)
+        faces = np.empty((sum(len(f) for _, f in parts), 3), dtype=np.int64)
+        v0 = f0 = 0
+        for (v, f), matrix, position in zip(parts, matrices, poses["position"]):
+            np.matmul(v, matrix.T, out=vertices[v0:v0 + len(v)])
+            vertices[v0:v0 + len(v)] += position
+            faces[f0:f0 + len(f)] = f
+            faces[f0:f0 + len(f)] += v0
+            v0 += len(v)
+            f0 += len(f)
+        return vertices, faces
+
+    def bake(self, out_dir, file_type="obj", frames=None, objects=None):
+        """Write <object>_<frame>.<file_type> for the chosen frames; the written paths."""
+        import trimesh
+
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for frame in (self.frames if frames is None else frames):
+            for obj_name in (self.objects if objects is None else objects):
+                vertices, faces = self.mesh(int(frame), obj_name)
+                path = os.path.join(out_dir, f"{obj_name}_{int(frame)}.{file_type}")
+                trimesh.Trimesh(vertices=vertices, faces=faces, process=False).export(path)
+                paths.append(path)
+        return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or bake an animation cache")
+    parser.add_argument("path", help="animation cache directory")
+    parser.add_argument("--out", default=None, help="bake into this folder (default: only print a summary)")
+    parser.add_argument("--format", default="obj", choices=["obj", "glb"])
+    parser.add_argument("--frames", default=None, help="start:stop[:step] of recorded frame numbers")
+    parser.add_argument("--objects", nargs="*", default=None)
+    args = parser.parse_args()
+
+    cache = AnimationCache(args.path)
+    frames = cache.frames
+    if args.frames:
+        bounds = [int(x) if x else None for x in args.frames.split(":")]
+        frames = np.arange(*slice(*bounds).indices(int(frames.max()) + 1 if len(frames) else 0))
+        frames = frames[np.isin(frames, cache.frames)]
+    print(f"{args.path}: {len(cache.frames)} frames, {len(cache.meshes)} bodies, "
+          f"objects {cache.objects}, {len(cache.records) * RECORD.itemsize / 1e6:.2f} MB of transforms")
+    if args.out:
+        paths = cache.bake(args.out, args.format, frames, args.objects)
+        print(f"wrote {len(paths)} files to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
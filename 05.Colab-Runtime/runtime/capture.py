@@ -0,0 +1,114 @@
+"""Streaming frame capture: encode the runtime video while the sim runs.
+
+run_fracture_sim hands every rendered frame to a sink instead of keeping
+them all; a FrameEncoder is such a sink. Frames go through a bounded queue
+to an imageio/ffmpeg writer on a background thread, so at most `max_queue`
+frames are held in memory (a full queue blocks the simulation until the
+encoder catches up) and encoding overlaps the physics instead of following
+it. progressive=True writes a fragmented mp4 (moov atom first, one fragment
+per keyframe) that can be played while it is still growing:
+
+    with FrameEncoder("runtime.mp4", fps=25) as encoder:
+        _, info = run_fracture_sim(..., frame_sink=encoder.push)
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+_STOP = object()
+
+
+class FrameEncoder:
+    """Background mp4 writer fed one HxWx3 uint8 frame at a time."""
+
+    def __init__(self, path, fps=25, max_queue=32, progressive=False,
+                 codec="libx264", quality=7):
+        self.path = path
+        self.fps = fps
+        self.frames = 0            # frames written by the encoder thread
+        self.blocked = 0.0         # seconds push() waited on a full queue
+        self.error = None
+        self._closed = False
+        self._options = dict(fps=fps, codec=codec, quality=quality,
+                             pixelformat="yuv420p", macro_block_size=8)
+        if progressive:
+            self._options["ffmpeg_params"] = [
+                "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+                "-g", str(max(int(fps), 1))]
+        self._queue = queue.Queue(maxsize=max(int(max_queue), 1))
+        self._thread = threading.Thread(target=self._run, name="frame-encoder", daemon=True)
+        self._thread.start()
+
+    def push(self, frame):
+        """Queue one frame; blocks while the queue is full."""
+        if self._closed:
+            raise ValueError("FrameEncoder is closed")
+        if self.error is not None:
+            raise RuntimeError(f"video encoding failed: {self.error}") from self.error
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            start = time.perf_counter()
+            self._queue.put(frame)
+            self.blocked += time.perf_counter() - start
+
+    def _run(self):
+        import imageio.v2 as imageio
+
+        writer = None
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is _STOP:
+                    return
+                if writer is None:
+                    writer = imageio.get_writer(self.path, **self._options)
+                writer.append_data(frame)
+                self.frames += 1
+        except BaseException as e:
+            self.error = e
+            # keep taking frames so a producer blocked in push() wakes up
+            while self._queue.get() is not _STOP:
+                pass
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def close(self):
+        """Flush the queue and finish the file; the video path (None if no frames)."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"video encoding failed: {self.error}") from self.error
+        return self.path if self.frames else None
+
+    def discard(self):
+        """Stop encoding and delete whatever was written."""
+        if not self._closed:
+            self._closed = True
+            # drop frames still waiting, they would only be encoded to be deleted
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put(_STOP)
+            self._thread.join()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
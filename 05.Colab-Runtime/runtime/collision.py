@@ -9,6 +9,8 @@ import tempfile
 
 import numpy as np
 
+from .shapes import release, shape_cache
+
 TIMESTEP = 1.0 / 250.0
 IMPULSE_THRESHOLD = 2000.0   # BreakableWorld.threshold
 IMPULSE_MAX = 10000.0        # predict-runtime.py impulseMax
@@ -30,10 +32,11 @@ def _camera(p, width=480, height=360, yaw=50.0, pitch=-25.0, distance=3.2):
     return view, proj
 
 
-def _snapshot(p, width=480, height=360):
+def _snapshot(p, width=480, height=360, cid=0):
     view, proj = _camera(p, width, height)
     _, _, rgb, _, _ = p.getCameraImage(width, height, view, proj,
-                                       renderer=p.ER_TINY_RENDERER)
+                                       renderer=p.ER_TINY_RENDERER,
+                                       physicsClientId=cid)
     frame = np.reshape(np.asarray(rgb, dtype=np.uint8), (height, width, 4))[:, :, :3]
     return frame
 
@@ -42,57 +45,72 @@ def run_fracture_sim(target_obj, fragment_builder,
                      sphere_pos, sphere_vel,
                      gravity=-5.0, seconds_after=3.0,
                      frame_stride=10, width=480, height=360,
-                     max_impact_steps=2500):
+                     max_impact_steps=2500, frame_sink=None):
     """Full runtime loop.
 
     fragment_builder(pos_local, dir_local, imp_norm, imp_raw) is called at
-    impact time and must return a list of fragment mesh files (.obj) in the
-    target's local frame.
-
-    Returns (frames, info) where frames is a list of HxWx3 uint8 arrays and
-    info a dict with the collision embedding; info is None if nothing hit.
+    impact time and must return a list of fragments in the target's local
+    frame: mesh files (.obj) or meshes in memory (trimesh or (vertices,
+    faces)). target_obj may be either too; shapes come from the client's
+    runtime.shapes cache, so duplicate fragments are built once.
+
+    frame_sink(frame), when given, receives each HxWx3 uint8 frame as soon
+    as it is rendered (e.g. runtime.capture.FrameEncoder.push) and frames
+    are not kept.
+
+    Returns (frames, info) where frames is a list of HxWx3 uint8 arrays
+    (empty with a frame_sink) and info a dict with the collision embedding;
+    info is None if nothing hit.
     """
     import pybullet as p
 
+    # every call names cid: other clients (scene.SceneClient) may be connected
     cid = p.connect(p.DIRECT)
     try:
         p.setTimeStep(TIMESTEP, physicsClientId=cid)
         p.setGravity(0, 0, 0, physicsClientId=cid)
 
-        col_t = p.createCollisionShape(p.GEOM_MESH, fileName=target_obj)
-        vis_t = p.createVisualShape(p.GEOM_MESH, fileName=target_obj,
-                                    rgbaColor=[0.35, 0.75, 0.35, 1])
+        shapes = shape_cache(cid)
+        col_t, vis_t = shapes.shapes(target_obj, rgba=[0.35, 0.75, 0.35, 1])
         body_t = p.createMultiBody(baseMass=1.0,
                                    baseCollisionShapeIndex=col_t,
                                    baseVisualShapeIndex=vis_t,
-                                   basePosition=[0, 0, 0])
+                                   basePosition=[0, 0, 0], physicsClientId=cid)
 
-        col_s = p.createCollisionShape(p.GEOM_SPHERE, radius=SPHERE_RADIUS)
+        col_s = p.createCollisionShape(p.GEOM_SPHERE, radius=SPHERE_RADIUS,
+                                       physicsClientId=cid)
         vis_s = p.createVisualShape(p.GEOM_SPHERE, radius=SPHERE_RADIUS,
-                                    rgbaColor=[0.85, 0.2, 0.2, 1])
+                                    rgbaColor=[0.85, 0.2, 0.2, 1],
+                                    physicsClientId=cid)
         body_s = p.createMultiBody(baseMass=SPHERE_MASS,
                                    baseCollisionShapeIndex=col_s,
                                    baseVisualShapeIndex=vis_s,
-                                   basePosition=list(sphere_pos))
-        p.resetBaseVelocity(body_s, list(sphere_vel), [0, 0, 0])
+                                   basePosition=list(sphere_pos), physicsClientId=cid)
+        p.resetBaseVelocity(body_s, list(sphere_vel), [0, 0, 0], physicsClientId=cid)
 
-        frames = [_snapshot(p, width, height)]
+        frames = []
+        emit = frame_sink or frames.append
+        emit(_snapshot(p, width, height, cid))
         info = None
         last_lvel, last_avel = (0, 0, 0), (0, 0, 0)
 
         # --- phase A: fly until impact -----------------------------------
         for step in range(max_impact_steps):
-            last_lvel, last_avel = p.getBaseVelocity(body_t)
-            p.stepSimulation()
+            last_lvel, last_avel = p.getBaseVelocity(body_t, physicsClientId=cid)
+            p.stepSimulation(physicsClientId=cid)
             if step % frame_stride == 0:
-                frames.append(_snapshot(p, width, height))
-
-            contacts = [c for c in p.getContactPoints()
-                        if {c[1], c[2]} == {body_t, body_s}]
-            total_impulse = sum(c[9] for c in contacts)
+                emit(_snapshot(p, width, height, cid))
+
+            # only the target/sphere pair, not every contact in the world
+            contacts = p.getContactPoints(bodyA=body_t, bodyB=body_s, physicsClientId=cid)
+            if not contacts:
+                continue
+            impulses = np.fromiter((c[9] for c in contacts), dtype=np.float64,
+                                   count=len(contacts))
+            total_impulse = impulses.sum()
             if total_impulse > IMPULSE_THRESHOLD:
-                impact = max(contacts, key=lambda c: c[9])
-                tar_pos, tar_orn = p.getBasePositionAndOrientation(body_t)
+                impact = contacts[int(impulses.argmax())]
+                tar_pos, tar_orn = p.getBasePositionAndOrientation(body_t, physicsClientId=cid)
 
                 # DynamicObject.startFracturing: to target-local frame
                 rel = np.asarray(impact[5]) - np.asarray(tar_pos)
@@ -120,36 +138,38 @@ def run_fracture_sim(target_obj, fragment_builder,
             return frames, None
 
         # --- neural fracture prediction ----------------------------------
-        fragment_files = fragment_builder(info["pos_local"], info["dir_local"],
-                                          info["impulse_norm"], info["impulse_raw"])
-        info["n_fragments"] = len(fragment_files)
+        fragments = fragment_builder(info["pos_local"], info["dir_local"],
+                                     info["impulse_norm"], info["impulse_raw"])
+        info["n_fragments"] = len(fragments)
 
         # --- phase B: swap target for fragments, keep simulating ---------
-        p.removeBody(body_t)
-        n = max(len(fragment_files), 1)
-        for frag_file in fragment_files:
-            col_f = p.createCollisionShape(p.GEOM_MESH, fileName=frag_file)
-            vis_f = p.createVisualShape(p.GEOM_MESH, fileName=frag_file)
+        p.removeBody(body_t, physicsClientId=cid)
+        n = max(len(fragments), 1)
+        for fragment in fragments:
+            col_f, vis_f = shapes.shapes(fragment)
             body_f = p.createMultiBody(baseMass=1.0 / n,
                                        baseCollisionShapeIndex=col_f,
                                        baseVisualShapeIndex=vis_f,
                                        basePosition=info["target_pos"],
-                                       baseOrientation=info["target_orn"])
-            p.resetBaseVelocity(body_f, list(last_lvel), [0, 0, 0])
+                                       baseOrientation=info["target_orn"],
+                                       physicsClientId=cid)
+            p.resetBaseVelocity(body_f, list(last_lvel), [0, 0, 0], physicsClientId=cid)
 
         if gravity:
-            p.setGravity(0, gravity, 0)
-            plane_col = p.createCollisionShape(p.GEOM_BOX, halfExtents=[8, 0.05, 8])
+            p.setGravity(0, gravity, 0, physicsClientId=cid)
+            plane_col = p.createCollisionShape(p.GEOM_BOX, halfExtents=[8, 0.05, 8],
+                                               physicsClientId=cid)
             p.createMultiBody(baseMass=0, baseCollisionShapeIndex=plane_col,
-                              basePosition=[0, -1.15, 0])
+                              basePosition=[0, -1.15, 0], physicsClientId=cid)
 
         for step in range(int(seconds_after / TIMESTEP)):
-            p.stepSimulation()
+            p.stepSimulation(physicsClientId=cid)
             if step % frame_stride == 0:
-                frames.append(_snapshot(p, width, height))
+                emit(_snapshot(p, width, height, cid))
 
         return frames, info
     finally:
+        release(cid)
         p.disconnect(cid)
 
 
@@ -0,0 +1,210 @@
+"""Export encoder/decoder checkpoints as frozen TorchScript.
+
+The released checkpoints are pickled training modules: loading them needs
+`register_for_unpickle()` and they run eagerly with BatchNorm and the unused
+`latent_vectors`. `export_models` writes inference-only artifacts instead:
+
+    <prefix>encoder.torchscript.pt   traced MultiLatentEncoder.predict
+    <prefix>decoder.torchscript.pt   frozen AutoDecoder with BatchNorm folded
+                                     into ConvTranspose3d; exposes Cook,
+                                     forwardTrunk, the head* and forward*
+                                     methods and cookbook
+
+`load_torchscript(prefix)` returns the pair, or None when not exported.
+Only single-shape decoders are exported: a multi-shape decoder Cooks with a
+per-shape latent from `shapes()`, which the frozen decoder does not have, so
+those checkpoints keep running eagerly. The artifacts carry a
+`deepfracture.json` record saying so; artifacts without it (written before
+the check existed) are not loaded.
+
+    python -m runtime.export squirrel bunny --out torchscript
+    python -m runtime.export --prefix <data>/cgf/squirrel/squirrel-
+"""
+
+import argparse
+import json
+import os
+import warnings
+from typing import Tuple
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.nn.utils.fusion import fuse_conv_bn_weights
+
+ENCODER_SUFFIX = "encoder.torchscript.pt"
+DECODER_SUFFIX = "decoder.torchscript.pt"
+_META = "deepfracture.json"
+_META_RECORD = {"single_shape": True}
+_METHODS = ["Cook", "forwardTrunk", "headSmall", "headMiddle", "headBig",
+            "forwardSmall", "forwardMiddle", "forwardBig"]
+
+
+def _fold(layers):
+    """Fold every ConvTranspose3d + BatchNorm3d pair of a Sequential."""
+    folded = []
+    layers = list(layers)
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        if isinstance(layer, nn.ConvTranspose3d) and i + 1 < len(layers) \
+                and isinstance(layers[i + 1], nn.BatchNorm3d):
+            bn = layers[i + 1]
+            conv = nn.ConvTranspose3d(layer.in_channels, layer.out_channels,
+                                      layer.kernel_size, layer.stride, layer.padding,
+                                      bias=True)
+            conv.weight, conv.bias = fuse_conv_bn_weights(
+                layer.weight, layer.bias, bn.running_mean, bn.running_var, bn.eps,
+                bn.weight, bn.bias, transpose=True)
+            folded.append(conv)
+            i += 2
+        else:
+            if isinstance(layer, nn.LeakyReLU):
+                layer = nn.LeakyReLU(layer.negative_slope)
+            folded.append(layer)
+            i += 1
+    return nn.Sequential(*folded)
+
+
+class InferenceDecoder(nn.Module):
+    """AutoDecoder without training state, in a scriptable form."""
+
+    def __init__(self, decoder):
+        super(InferenceDecoder, self).__init__()
+        self.ndf = int(decoder.ndf)
+        self.data_shape = int(decoder.data_shape)
+        self.fc = _fold(decoder.fc)
+        self.decoder = _fold(decoder.decoder)
+        self.toVoxelMd = _fold(decoder.toVoxelMd)
+        self.toVoxelBig = _fold(decoder.toVoxelBig)
+        self.cookbook = nn.Parameter(decoder.cookbook.detach().clone(), requires_grad=False)
+        # AutoDecoder.headSmall's 2x2x2 polyphase of toVoxelMd, precomputed
+        weight = decoder.toVoxelMd[0].weight.detach()
+        self.register_buffer("smallWeight", weight[:, :, [3, 1]][:, :, :, [3, 1]][:, :, :, :, [3, 1]]
+                             .transpose(0, 1).contiguous())
+
+    @torch.jit.export
+    def forwardTrunk(self, input_x):
+        side = self.data_shape // 16
+        feature = self.fc(input_x).reshape(-1, self.ndf * 8, side, side, side)
+        return self.decoder(feature)
+
+    @torch.jit.export
+    def headSmall(self, trunk):
+        output = F.conv3d(F.pad(trunk, (1, 0, 1, 0, 1, 0)), self.smallWeight)
+        size = self.data_shape // 2
+        return torch.tanh(output).view(-1, 1, size, size, size)
+
+    @torch.jit.export
+    def headMiddle(self, trunk):
+        output = self.toVoxelMd(trunk)
+        return output.view(-1, 1, self.data_shape, self.data_shape, self.data_shape)
+
+    @torch.jit.export
+    def headBig(self, trunk):
+        output = self.toVoxelBig(trunk)
+        size = self.data_shape * 2
+        return output.view(-1, 1, size, size, size)
+
+    def forward(self, x, y, t: str = "Middle"):
+        input_x = torch.concat((x, y), -1)
+        if t == "Middle":
+            return self.forwardMiddle(input_x)
+        return self.forwardBig(input_x)
+
+    @torch.jit.export
+    def Cook(self, x, y) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        input_x = torch.concat((x, y), -1)
+        distances = (
+            (input_x ** 2).sum(1, keepdim=True)
+            - 2 * input_x @ self.cookbook.transpose(0, 1)
+            + (self.cookbook.transpose(0, 1) ** 2).sum(0, keepdim=True)
+        )
+        encoding_indices = distances.argmin(1)
+        output = F.embedding(encoding_indices.view(input_x.shape[0]), self.cookbook)
+        distance = ((input_x - output) ** 2).mean()
+        return output, encoding_indices, distance
+
+    @torch.jit.export
+    def forwardSmall(self, input_x):
+        return self.headSmall(self.forwardTrunk(input_x))
+
+    @torch.jit.export
+    def forwardMiddle(self, input_x):
+        return self.headMiddle(self.forwardTrunk(input_x))
+
+    @torch.jit.export
+    def forwardBig(self, input_x):
+        return self.headBig(self.forwardTrunk(input_x))
+
+
+@torch.no_grad()
+def export_models(encoder, decoder, prefix):
+    """Write the TorchScript pair for a loaded encoder/decoder; returns the paths."""
+    if hasattr(decoder, "shapes"):
+        raise ValueError("multi-shape decoders cannot be exported; they run eagerly")
+    encoder.eval()
+    decoder.eval()
+
+    example = (torch.zeros(2, 3), torch.zeros(2, 3), torch.zeros(2, 1))
+    traced = torch.jit.trace_module(encoder, {"forward": example, "predict": example})
+    traced = torch.jit.freeze(traced, preserved_attrs=["predict"])
+
+    scripted = torch.jit.script(InferenceDecoder(decoder).eval())
+    frozen = torch.jit.freeze(scripted, preserved_attrs=_METHODS + ["cookbook"])
+
+    os.makedirs(os.path.dirname(os.path.abspath(prefix + ENCODER_SUFFIX)), exist_ok=True)
+    paths = prefix + ENCODER_SUFFIX, prefix + DECODER_SUFFIX
+    extra = {_META: json.dumps(_META_RECORD)}
+    torch.jit.save(traced, paths[0], _extra_files=extra)
+    torch.jit.save(frozen, paths[1], _extra_files=extra)
+    return paths
+
+
+def load_torchscript(prefix):
+    """(encoder, decoder) exported under prefix, or None if missing or unchecked."""
+    paths = prefix + ENCODER_SUFFIX, prefix + DECODER_SUFFIX
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    device = torch.device("cpu")
+    models = []
+    for path in paths:
+        extra = {_META: ""}
+        model = torch.jit.load(path, map_location=device, _extra_files=extra)
+        if not extra[_META] or json.loads(extra[_META]) != _META_RECORD:
+            warnings.warn(f"{path} was exported without the single-shape check; "
+                          "re-export it with python -m runtime.export")
+            return None
+        models.append(model.eval())
+    return tuple(models)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export frozen TorchScript models")
+    parser.add_argument("shapes", nargs="*", help="shapes to fetch from the HF Hub")
+    parser.add_argument("--out", default="torchscript",
+                        help="output folder for shapes (default: torchscript)")
+    parser.add_argument("--prefix", action="append", default=[],
+                        help="local checkpoint prefix, e.g. .../squirrel/squirrel- "
+                             "(writes next to <prefix>encoder.pt)")
+    args = parser.parse_args()
+
+    from .networks import register_for_unpickle
+    from .predictor import download_asset
+    register_for_unpickle()
+
+    jobs = [([download_asset(f"{shape}/{shape}-{part}.pt") for part in ("encoder", "decoder")],
+             os.path.join(args.out, f"{shape}-")) for shape in args.shapes]
+    jobs += [([prefix + "encoder.pt", prefix + "decoder.pt"], prefix) for prefix in args.prefix]
+    for sources, target in jobs:
+        encoder, decoder = (torch.load(path, map_location="cpu", weights_only=False)
+                            for path in sources)
+        if hasattr(decoder, "shapes"):
+            print("skipped", target, "(multi-shape decoder, runs eagerly)")
+            continue
+        for path in export_models(encoder, decoder, target):
+            print("wrote", path)
+
+
+if __name__ == "__main__":
+    main()
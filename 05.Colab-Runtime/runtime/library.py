@@ -0,0 +1,195 @@
+"""Offline fracture library: codebook index -> precomputed fragment meshes.
+
+The cookbook of every per-shape AutoDecoder is finite, so all fractures the
+network can produce for a shape are enumerable. `build_library` runs
+decode -> segment_volume -> extract_fragments once per cookbook entry and
+streams the fragments into one indexed .npz archive; at runtime
+`FractureLibrary.fragments(code_idx)` replaces the network and the watershed
+with a single archive read.
+
+    python -m runtime.library squirrel --resolution 128 --out libs/squirrel-128.npz
+
+Every archive records the pipeline that meshed it: "colab" for the
+skimage watershed + marching cubes here, "run-time" for 04.Run-time's
+carved and filtered fragments (04.Run-time/build-fracture-library.py).
+A runtime only serves libraries of its own pipeline, so a hit yields the
+fragments a miss would have produced.
+"""
+
+import argparse
+import os
+import threading
+import time
+import zipfile
+
+import numpy as np
+import trimesh
+
+FORMAT_VERSION = 1
+PIPELINE = "colab"
+_ARRAYS = ("vertices", "normals", "faces", "counts", "colors")
+
+_lock = threading.Lock()
+_libraries = {}
+
+
+def _entry(code_idx, name):
+    return f"e{int(code_idx):05d}_{name}"
+
+
+def _write_array(archive, name, array):
+    with archive.open(name + ".npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asanyarray(array), allow_pickle=False)
+
+
+def pack_fragments(fragments):
+    """Flatten trimesh fragments into (vertices, normals, faces, counts, colors)."""
+    vertices = [np.asarray(m.vertices, dtype=np.float32) for m in fragments]
+    normals = [np.asarray(m.vertex_normals, dtype=np.float32) for m in fragments]
+    faces = [np.asarray(m.faces, dtype=np.int32) for m in fragments]
+    counts = np.array([[len(v), len(f)] for v, f in zip(vertices, faces)],
+                      dtype=np.int64).reshape(-1, 2)
+    colors = np.array([m.visual.vertex_colors[0] if len(m.vertices) else [0, 0, 0, 255]
+                       for m in fragments], dtype=np.uint8).reshape(-1, 4)
+    if not fragments:
+        vertices = normals = np.zeros((0, 3), np.float32)
+        faces = np.zeros((0, 3), np.int32)
+    else:
+        vertices, normals, faces = (np.concatenate(vertices), np.concatenate(normals),
+                                    np.concatenate(faces))
+    return vertices, normals, faces, counts, colors
+
+
+def unpack_fragments(vertices, normals, faces, counts, colors):
+    """Inverse of pack_fragments; returns a list of trimesh.Trimesh."""
+    fragments = []
+    v0 = f0 = 0
+    for (nv, nf), color in zip(counts, colors):
+        mesh = trimesh.Trimesh(vertices=vertices[v0:v0 + nv],
+                               faces=faces[f0:f0 + nf],
+                               vertex_normals=normals[v0:v0 + nv], process=False)
+        mesh.visual.vertex_colors = color
+        fragments.append(mesh)
+        v0 += nv
+        f0 += nf
+    return fragments
+
+
+class FractureLibrary:
+    """Read-only view of a library archive written by build_library."""
+
+    def __init__(self, path):
+        self.path = path
+        self._archive = np.load(path, allow_pickle=False)
+        meta = self._archive["meta"]
+        self.version, self.resolution, self.n_codes = (int(v) for v in meta)
+        self.shape = str(self._archive["shape"])
+        # archives written before the tag existed all came from build_library
+        self.pipeline = (str(self._archive["pipeline"]) if "pipeline" in self._archive.files
+                         else PIPELINE)
+        self.codes = set(int(c) for c in self._archive["codes"])
+        self._read_lock = threading.Lock()
+
+    def __contains__(self, code_idx):
+        return int(code_idx) in self.codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def fragments(self, code_idx):
+        """Fragment meshes of one cookbook entry, or None if it is missing."""
+        if code_idx not in self:
+            return None
+        with self._read_lock:
+            arrays = [self._archive[_entry(code_idx, name)] for name in _ARRAYS]
+        return unpack_fragments(*arrays)
+
+    def close(self):
+        self._archive.close()
+
+
+def open_library(path):
+    """Open (and memoize) a library archive."""
+    with _lock:
+        if path not in _libraries:
+            _libraries[path] = FractureLibrary(path)
+        return _libraries[path]
+
+
+def library_for(shape, resolution=128):
+    """The library of a shape found in $DF_LIBRARY_DIR, or None."""
+    root = os.environ.get("DF_LIBRARY_DIR")
+    if not root:
+        return None
+    path = os.path.join(root, f"{shape}-{resolution}.npz")
+    if not os.path.exists(path):
+        return None
+    library = open_library(path)
+    return library if library.pipeline == PIPELINE else None
+
+
+def write_library(out_path, shape, resolution, n_codes, codes, fragments_of,
+                  pipeline=PIPELINE, status_cb=None):
+    """Stream fragments_of(code_idx) of every code into a library archive.
+
+    pipeline: tag of the meshing that produced the fragments (see above).
+    Returns out_path.
+    """
+    say = status_cb or (lambda msg: None)
+    codes = [int(c) for c in codes]
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for n, code_idx in enumerate(codes):
+            start = time.time()
+            fragments = fragments_of(code_idx)
+            for name, array in zip(_ARRAYS, pack_fragments(fragments)):
+                _write_array(archive, _entry(code_idx, name), array)
+            say(f"[{n + 1}/{len(codes)}] codebook #{code_idx}: "
+                f"{len(fragments)} fragments ({time.time() - start:.1f}s)")
+        _write_array(archive, "meta", np.array([FORMAT_VERSION, resolution, n_codes]))
+        _write_array(archive, "shape", np.array(shape))
+        _write_array(archive, "pipeline", np.array(pipeline))
+        _write_array(archive, "codes", np.array(codes, dtype=np.int64))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def build_library(shape, out_path, resolution=128, codes=None, status_cb=None):
+    """Decode, segment and mesh every cookbook entry of a shape.
+
+    codes: optional iterable of codebook indices (default: all of them).
+    status_cb(str), when given, receives one progress line per entry.
+    Returns out_path.
+    """
+    from .predictor import decode_code, load_models
+    from .segmentation import extract_fragments, segment_volume
+
+    # libraries are the fp32 reference, whatever $DF_PRECISION says
+    _encoder, decoder = load_models(shape, "fp32")
+    n_codes = int(decoder.cookbook.shape[0])
+    codes = range(n_codes) if codes is None else codes
+
+    def fragments_of(code_idx):
+        volume = decode_code(shape, code_idx, resolution=resolution,
+                             use_cache=False, precision="fp32")
+        return extract_fragments(segment_volume(volume))
+
+    return write_library(out_path, shape, resolution, n_codes, codes, fragments_of,
+                         status_cb=status_cb)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a per-shape fracture library")
+    parser.add_argument("shape")
+    parser.add_argument("--resolution", type=int, default=128, choices=[128, 256])
+    parser.add_argument("--out", default=None,
+                        help="archive path (default: libs/<shape>-<resolution>.npz)")
+    args = parser.parse_args()
+    out = args.out or os.path.join("libs", f"{args.shape}-{args.resolution}.npz")
+    build_library(args.shape, out, resolution=args.resolution, status_cb=print)
+    print("wrote", out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Parallel fragment meshing for segmentation.extract_fragments.
+
+Each fragment is meshed independently (box crop -> Gaussian -> marching
+cubes -> trimesh processing), so the labels are split across a persistent
+worker pool:
+
+    kind="process"  labels are copied once into a SharedMemory block that
+                    every worker maps by name, so no worker gets its own copy
+                    of the volume; only boxes go out and vertex/face arrays
+                    come back
+    kind="thread"   workers read the labels array directly; cheaper to start,
+                    but trimesh's Python-level processing holds the GIL
+
+Results are returned in label order, so fragment order and colours do not
+depend on the worker count. Set DF_MESH_WORKERS to use a pool by default.
+"""
+
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .segmentation import mesh_fragment
+
+KINDS = ("process", "thread")
+
+# worker side: the labels block of the current call, keyed by its name
+_attached = {}
+
+
+def _attach(name, shape, dtype):
+    if name not in _attached:
+        for shm, _ in _attached.values():
+            shm.close()
+        _attached.clear()
+        # track=False needs 3.13; the parent owns (and unlinks) the block
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    return _attached[name][1]
+
+
+def _mesh_shared(name, shape, dtype, frag_id, box, smooth_sigma):
+    return mesh_fragment(_attach(name, shape, dtype), frag_id, box, smooth_sigma)
+
+
+class MeshingPool:
+    """Persistent pool meshing the fragments of one labels volume at a time.
+
+    workers: pool size (default os.cpu_count()). The executor is created on
+    first use and kept until close(), so repeated fracture events do not pay
+    for process start-up.
+    """
+
+    def __init__(self, workers=None, kind="process"):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+        self.workers = max(int(workers or os.cpu_count() or 1), 1)
+        self.kind = kind
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            executor = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = executor(max_workers=self.workers)
+        return self._executor
+
+    def map(self, labels, jobs, smooth_sigma=1.0):
+        """mesh_fragment for every (fragment id, box) in jobs, in jobs order."""
+        if len(jobs) < 2:
+            return [mesh_fragment(labels, frag_id, box, smooth_sigma) for frag_id, box in jobs]
+        # largest boxes first so one big fragment does not finish last
+        order = sorted(range(len(jobs)), reverse=True,
+                       key=lambda i: np.prod([s.stop - s.start for s in jobs[i][1]]))
+        # one volume per call: the shared block is rewritten for every event
+        with self._lock:
+            if self.kind == "thread":
+                futures = {i: self._pool().submit(mesh_fragment, labels, *jobs[i], smooth_sigma)
+                           for i in order}
+                return [futures[i].result() for i in range(len(jobs))]
+
+            labels = np.ascontiguousarray(labels)
+            shm = shared_memory.SharedMemory(create=True, size=max(labels.nbytes, 1))
+            futures = {}
+            try:
+                np.ndarray(labels.shape, dtype=labels.dtype, buffer=shm.buf)[...] = labels
+                for i in order:
+                    futures[i] = self._pool().submit(_mesh_shared, shm.name, labels.shape,
+                                                     labels.dtype.str, *jobs[i], smooth_sigma)
+                return [futures[i].result() for i in range(len(jobs))]
+            finally:
+                # on error, let running workers finish before the block goes away
+                wait(futures.values())
+                shm.close()
+                shm.unlink()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_pool():
+    """The shared pool sized by $DF_MESH_WORKERS, or None (sequential) when unset or <= 1."""
+    global _default
+    workers = int(os.environ.get("DF_MESH_WORKERS", 0) or 0)
+    if workers <= 1:
+        return None
+    with _default_lock:
+        if _default is None or _default.workers != workers:
+            if _default is not None:
+                _default.close()
+            _default = MeshingPool(workers)
+            atexit.register(_default.close)
+    return _default
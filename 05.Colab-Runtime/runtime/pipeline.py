@@ -6,8 +6,10 @@ import tempfile
 import numpy as np
 import trimesh
 
-from .collision import export_fragments_for_sim, run_fracture_sim
-from .predictor import download_asset, predict_gssdf
+from .capture import FrameEncoder
+from .collision import run_fracture_sim
+from .library import library_for, open_library
+from .predictor import decode_adaptive, decode_code, download_asset, predict_code_index
 from .segmentation import extract_fragments, segment_volume
 
 PRESETS = {
@@ -31,14 +33,26 @@ def parse_csv_preset(csv_file):
 
 
 def run_demo(shape, sphere_pos, sphere_vel, seed=42, resolution=128,
-             gravity=-5.0, seconds_after=3.0, fps=25, status_cb=None):
+             gravity=-5.0, seconds_after=3.0, fps=25, status_cb=None,
+             library=None, progressive_video=False):
     """Run the full breakable-object runtime once.
 
+    resolution: 64, 128, 256 or "auto" (coarse-to-fine, see
+    predictor.decode_adaptive).
     status_cb(str), when given, receives live stage updates.
+    library: FractureLibrary or archive path with precomputed fragments
+    (default: runtime.library.library_for(shape, resolution)).
+    progressive_video: write a fragmented mp4 that plays while it is being
+    encoded (frames are always encoded during the simulation, see
+    runtime.capture).
     Returns dict with keys: video (mp4 path), glb (fragments path),
     info (collision embedding + stats) — or an "error" message.
     """
     say = status_cb or (lambda msg: None)
+    if library is None:
+        library = library_for(shape, 128 if resolution == "auto" else resolution)
+    elif isinstance(library, str):
+        library = open_library(library)
     target_obj = download_asset(f"objs/{shape}.obj")
     workdir = tempfile.mkdtemp(prefix="deepfracture-")
     result = {}
@@ -46,12 +60,22 @@ def run_demo(shape, sphere_pos, sphere_vel, seed=42, resolution=128,
     say("🎬 Rigid-body simulation: projectile in flight…")
 
     def fragment_builder(pos_local, dir_local, imp_norm, imp_raw):
-        say(f"💥 Impact! impulse {imp_raw:.0f} → 🧠 VQ-VAE predicting fracture field…")
-        volume, code_idx = predict_gssdf(shape, pos_local, dir_local, imp_norm,
-                                         resolution=resolution, seed=seed)
-        say(f"🧩 Watershed segmentation of the predicted field… (codebook #{code_idx})")
-        labels = segment_volume(volume)
-        fragments = extract_fragments(labels)
+        # encode once: a library miss decodes the entry that was looked up
+        code_idx = predict_code_index(shape, pos_local, dir_local, imp_norm,
+                                      seed=seed)
+        fragments = library.fragments(code_idx) if library is not None else None
+        if fragments is not None:
+            say(f"💥 Impact! impulse {imp_raw:.0f} → 📚 fracture library "
+                f"(codebook #{code_idx})")
+        else:
+            say(f"💥 Impact! impulse {imp_raw:.0f} → 🧠 VQ-VAE decoding fracture field…")
+            if resolution == "auto":
+                volume = decode_adaptive(shape, code_idx, pos_local)
+            else:
+                volume = decode_code(shape, code_idx, resolution=resolution)
+            say(f"🧩 Watershed segmentation of the predicted field… (codebook #{code_idx})")
+            labels = segment_volume(volume)
+            fragments = extract_fragments(labels)
         if not fragments:
             # fall back to the unbroken shell so the sim can continue
             fragments = [trimesh.load(target_obj, force="mesh")]
@@ -62,23 +86,23 @@ def run_demo(shape, sphere_pos, sphere_vel, seed=42, resolution=128,
         scene.export(glb_path)
         result["glb"] = glb_path
         say(f"🪨 {len(fragments)} fragments meshed → re-entering the simulation…")
-        return export_fragments_for_sim(fragments, os.path.join(workdir, "objs"))
+        # handed to the sim as meshes: no OBJ round trip before PyBullet
+        return fragments
 
-    frames, info = run_fracture_sim(
-        target_obj, fragment_builder, sphere_pos, sphere_vel,
-        gravity=gravity, seconds_after=seconds_after)
+    video_path = os.path.join(workdir, "runtime.mp4")
+    with FrameEncoder(video_path, fps=fps, progressive=progressive_video) as encoder:
+        _, info = run_fracture_sim(
+            target_obj, fragment_builder, sphere_pos, sphere_vel,
+            gravity=gravity, seconds_after=seconds_after,
+            frame_sink=encoder.push)
 
-    if info is None:
-        return {"error": "The projectile missed the target (or the impact was "
-                         "below the fracture threshold). Aim closer to the origin "
-                         "or increase the speed."}
+        if info is None:
+            encoder.discard()
+            return {"error": "The projectile missed the target (or the impact was "
+                             "below the fracture threshold). Aim closer to the origin "
+                             "or increase the speed."}
 
-    say("🎞 Encoding the runtime video…")
-    import imageio.v2 as imageio
-    video_path = os.path.join(workdir, "runtime.mp4")
-    imageio.mimwrite(video_path, frames, fps=fps,
-                     codec="libx264", quality=7,
-                     pixelformat="yuv420p", macro_block_size=8)
+        say("🎞 Finishing the runtime video…")
 
     info["codebook_index"] = result.get("code_idx")
     return {"video": video_path, "glb": result.get("glb"), "info": info}
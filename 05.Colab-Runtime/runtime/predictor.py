@@ -4,20 +4,26 @@ Follows TEBP-DeepFracture 04.Run-time/predictshapes.py.
 """
 
 import os
-import threading
 
 import numpy as np
 import torch
 import torch.nn.init as init
 from huggingface_hub import hf_hub_download
 
+from .export import load_torchscript
 from .networks import register_for_unpickle
+from .quantize import PRECISIONS, quantize_decoder
+from .registry import ModelRegistry
+from .segmentation import needs_detail, segment_volume
+from .volume_cache import VolumeCache
 
 HF_REPO = "nikoloside/deepfracture"
 SHAPES = ["squirrel", "bunny", "pot", "base", "lion"]
+_HEADS = {64: "headSmall", 128: "headMiddle", 256: "headBig"}
 
-_lock = threading.Lock()
-_models = {}
+_volumes = VolumeCache(
+    max_bytes=int(os.environ.get("DF_VOLUME_CACHE_MB", 512)) * 1024 ** 2,
+    cache_dir=os.environ.get("DF_VOLUME_CACHE_DIR") or None)
 
 
 def download_asset(filename):
@@ -25,52 +31,227 @@ def download_asset(filename):
                            cache_dir=os.environ.get("DF_CACHE", "hf-cache"))
 
 
-def load_models(shape):
-    """Load (and memoize) the encoder/decoder pair for a shape."""
-    with _lock:
-        if shape in _models:
-            return _models[shape]
-        register_for_unpickle()
-        device = torch.device("cpu")
-        encoder = torch.load(download_asset(f"{shape}/{shape}-encoder.pt"),
-                             map_location=device, weights_only=False)
-        decoder = torch.load(download_asset(f"{shape}/{shape}-decoder.pt"),
-                             map_location=device, weights_only=False)
-        encoder.eval()
-        decoder.eval()
-        _models[shape] = (encoder, decoder)
-        return encoder, decoder
+def _precision(precision):
+    precision = precision or os.environ.get("DF_PRECISION", "fp32")
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+    return precision
+
+
+def _load_checkpoints(key):
+    shape, precision = key
+    # prefer frozen TorchScript written by `python -m runtime.export`
+    ts_dir = os.environ.get("DF_TORCHSCRIPT_DIR")
+    if ts_dir and precision == "fp32":
+        models = load_torchscript(os.path.join(ts_dir, f"{shape}-"))
+        if models is not None:
+            return models
+    register_for_unpickle()
+    device = torch.device("cpu")
+    encoder = torch.load(download_asset(f"{shape}/{shape}-encoder.pt"),
+                         map_location=device, weights_only=False)
+    decoder = torch.load(download_asset(f"{shape}/{shape}-decoder.pt"),
+                         map_location=device, weights_only=False)
+    encoder.eval()
+    decoder.eval()
+    return encoder, quantize_decoder(decoder, precision)
+
+
+# keyed by (shape, precision); DF_MODEL_BUDGET_MB=0 keeps every entry resident
+_registry = ModelRegistry(
+    _load_checkpoints,
+    budget_bytes=int(os.environ.get("DF_MODEL_BUDGET_MB", 0)) * 1024 ** 2 or None)
+
+
+def load_models(shape, precision=None):
+    """The encoder/decoder pair for a shape, served from the model registry.
+
+    precision: "fp32", "bf16" or "int8" (see runtime.quantize); defaults to
+    $DF_PRECISION, else fp32.
+    """
+    return _registry.get((shape, _precision(precision)))
+
+
+def preload_models(shapes=None, precision=None):
+    """Load the given shapes (default: all of SHAPES) before the first request."""
+    precision = _precision(precision)
+    _registry.preload([(shape, precision) for shape in (SHAPES if shapes is None else shapes)])
+
+
+def model_metrics():
+    """Load time / hit rate counters of the model registry."""
+    return _registry.metrics()
 
 
 @torch.no_grad()
-def predict_gssdf(shape, pos, direction, impulse, resolution=128, seed=None):
-    """Predict the geometrically-segmented SDF voxel grid for one collision.
+def predict_codes_batch(shape, positions, directions, impulses, seed=None,
+                        precision=None):
+    """Encode N collisions and snap them to the cookbook in one pass.
 
-    pos:       impact point in the target's local frame (3,)
-    direction: impact direction in the target's local frame (3,)
-    impulse:   scalar already normalized to [-1, 1]
-    resolution: 128 (Middle) or 256 (Big)
-    Returns (volume ndarray [res,res,res], codebook index int)
+    positions, directions: (N, 3) in the target's local frame
+    impulses: (N,) already normalized to [-1, 1]
+    seed: as in predict_gssdf; every row then gets the latent z a single
+    seeded call would draw, so row i matches predict_code_index(..., seed).
+    precision only selects which registry entry serves the encoder; Cook
+    runs in fp32 for every precision.
+    Returns codebook indices as an int64 ndarray (N,).
     """
-    encoder, decoder = load_models(shape)
+    encoder, decoder = load_models(shape, precision)
 
-    pos = torch.tensor(np.asarray(pos, dtype=np.float32))
-    direction = torch.tensor(np.asarray(direction, dtype=np.float32))
-    imp = torch.tensor(np.asarray([impulse], dtype=np.float32))
+    pos = torch.tensor(np.asarray(positions, dtype=np.float32).reshape(-1, 3))
+    direction = torch.tensor(np.asarray(directions, dtype=np.float32).reshape(-1, 3))
+    imp = torch.tensor(np.asarray(impulses, dtype=np.float32).reshape(-1, 1))
+    n = pos.shape[0]
 
-    feature = encoder.predict(pos, direction, imp).unsqueeze(0)
+    feature = encoder.predict(pos, direction, imp)
 
     if seed is not None:
         torch.manual_seed(int(seed))
-    latent_z = torch.FloatTensor(1, 8)
-    init.xavier_normal_(latent_z)
+        latent_z = torch.FloatTensor(1, 8)
+        init.xavier_normal_(latent_z)
+        latent_z = latent_z.expand(n, 8)
+    else:
+        # one independent (1, 8) xavier draw per row
+        latent_z = torch.empty(n, 8).normal_(0.0, (2.0 / (1 + 8)) ** 0.5)
 
-    input_x, min_index, _dist = decoder.Cook(feature, latent_z)
+    _input_x, min_index, _dist = decoder.Cook(feature, latent_z)
+    return min_index.view(n).cpu().numpy().astype(np.int64)
 
-    if resolution >= 256:
-        output = decoder.forwardBig(input_x)
-    else:
-        output = decoder.forwardMiddle(input_x)
 
-    volume = output.squeeze().squeeze().cpu().numpy()
-    return volume, int(min_index.item())
+@torch.no_grad()
+def decode_codes(shape, codes, resolution=128, use_cache=True, max_batch=8,
+                 precision=None):
+    """Decode the GS-SDF volumes of several cookbook entries.
+
+    Duplicate indices are decoded once and cache misses go through the
+    decoder max_batch at a time. precision as in load_models.
+    resolution: 64 (Small), 128 (Middle) or 256 (Big).
+    Returns {codebook index: volume ndarray [res,res,res]}; cached volumes
+    are read-only.
+    """
+    res = 256 if resolution >= 256 else 128 if resolution > 64 else 64
+    precision = _precision(precision)
+    # fp32 keeps the key (and the .npy names) of earlier caches
+    tag = () if precision == "fp32" else (precision,)
+    volumes = {}
+    missing = []
+    for code_idx in dict.fromkeys(int(c) for c in codes):
+        volume = _volumes.get((shape, code_idx, res) + tag) if use_cache else None
+        if volume is None:
+            missing.append(code_idx)
+        else:
+            volumes[code_idx] = volume
+    if not missing:
+        return volumes
+
+    _encoder, decoder = load_models(shape, precision)
+    for start in range(0, len(missing), max_batch):
+        chunk = missing[start:start + max_batch]
+        input_x = decoder.cookbook[torch.tensor(chunk)]
+        if res == 256:
+            output = decoder.forwardBig(input_x)
+        elif res == 128:
+            output = decoder.forwardMiddle(input_x)
+        else:
+            output = decoder.forwardSmall(input_x)
+        output = output[:, 0].float().cpu().numpy()
+        for code_idx, volume in zip(chunk, output):
+            if use_cache:
+                volume = _volumes.put((shape, code_idx, res) + tag, volume)
+            volumes[code_idx] = volume
+    return volumes
+
+
+@torch.no_grad()
+def decode_adaptive(shape, code_idx, positions, use_cache=True, precision=None):
+    """Coarse-to-fine decode of one cookbook entry for impacts at positions.
+
+    Decodes the 64^3 Small head first and segments it; only when a small
+    fragment lies near an impact (segmentation.needs_detail) is the 256^3
+    Big head run, otherwise the 128^3 Middle head. All heads share one run
+    of the fc + transposed-conv trunk.
+    Returns volume ndarray [res,res,res] with res 128 or 256.
+    """
+    precision = _precision(precision)
+    tag = () if precision == "fp32" else (precision,)
+    code_idx = int(code_idx)
+    trunk = None
+
+    def head(res):
+        nonlocal trunk
+        key = (shape, code_idx, res) + tag
+        volume = _volumes.get(key) if use_cache else None
+        if volume is None:
+            _encoder, decoder = load_models(shape, precision)
+            if trunk is None:
+                trunk = decoder.forwardTrunk(decoder.cookbook[code_idx:code_idx + 1])
+            volume = getattr(decoder, _HEADS[res])(trunk)[0, 0].float().cpu().numpy()
+            if use_cache:
+                volume = _volumes.put(key, volume)
+        return volume
+
+    coarse = segment_volume(head(64))
+    return head(256 if needs_detail(coarse, positions) else 128)
+
+
+def predict_gssdf_batch(shape, positions, directions, impulses, resolution=128,
+                        seed=None, use_cache=True, max_batch=8, precision=None):
+    """Batched predict_gssdf for N candidate impacts.
+
+    Encoding and Cook run as one forward pass; every distinct codebook index
+    is decoded once, in batches of max_batch.
+    Returns (volumes, codes): volumes maps codebook index -> volume and
+    codes is the int64 ndarray (N,) of per-impact indices.
+    """
+    codes = predict_codes_batch(shape, positions, directions, impulses, seed=seed,
+                                precision=precision)
+    volumes = decode_codes(shape, codes, resolution=resolution,
+                           use_cache=use_cache, max_batch=max_batch,
+                           precision=precision)
+    return volumes, codes
+
+
+def predict_code_index(shape, pos, direction, impulse, seed=None, precision=None):
+    """Encode one collision and snap it to the decoder's cookbook.
+
+    Arguments as in predict_gssdf. Returns the codebook index (int); this is
+    all the network work needed when the fracture is looked up elsewhere.
+    """
+    return int(predict_codes_batch(shape, [pos], [direction], [impulse], seed=seed,
+                                   precision=precision)[0])
+
+
+def decode_code(shape, code_idx, resolution=128, use_cache=True, precision=None):
+    """Decode the GS-SDF volume of one cookbook entry.
+
+    Cook returns the cookbook row itself, so this is exactly the volume of
+    every collision that snaps to code_idx.
+    Returns volume ndarray [res,res,res]; cached volumes are read-only.
+    """
+    return decode_codes(shape, [code_idx], resolution=resolution,
+                        use_cache=use_cache, precision=precision)[int(code_idx)]
+
+
+def predict_gssdf(shape, pos, direction, impulse, resolution=128, seed=None,
+                  use_cache=True, precision=None):
+    """Predict the geometrically-segmented SDF voxel grid for one collision.
+
+    pos:       impact point in the target's local frame (3,)
+    direction: impact direction in the target's local frame (3,)
+    impulse:   scalar already normalized to [-1, 1]
+    resolution: 64 (Small), 128 (Middle), 256 (Big) or "auto"
+               (decode_adaptive picks 128 or 256 for this impact)
+    use_cache: reuse volumes already decoded for the same codebook index
+    precision: "fp32", "bf16" or "int8" decoder (default $DF_PRECISION / fp32)
+    Returns (volume ndarray [res,res,res], codebook index int); cached
+    volumes are read-only.
+    """
+    code_idx = predict_code_index(shape, pos, direction, impulse, seed=seed,
+                                  precision=precision)
+    if resolution == "auto":
+        volume = decode_adaptive(shape, code_idx, pos, use_cache=use_cache,
+                                 precision=precision)
+    else:
+        volume = decode_code(shape, code_idx, resolution=resolution,
+                             use_cache=use_cache, precision=precision)
+    return volume, code_idx
@@ -0,0 +1,63 @@
+"""Reduced-precision decoder variants for CPU serving.
+
+    fp32  the checkpoint as shipped
+    bf16  the ConvTranspose3d stacks run under bfloat16 autocast
+    int8  bf16 convs plus int8 dynamic quantization of the fc layer,
+          Linear(136, ndf*8*8^3), which holds most of the decoder weights
+
+Cook and the cookbook stay fp32, so every precision snaps a collision to the
+same codebook index; only the decoded volume changes. Check the effect on
+fragments with 05.Measure/Benchmarks/quantized_accuracy.py.
+"""
+
+import torch
+import torch.nn as nn
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+
+class Bf16Autocast(nn.Module):
+    """Run a conv stack under CPU bfloat16 autocast.
+
+    Intermediate stacks keep their bfloat16 output (output_fp32=False) so
+    the next stack does not cast it back and forth.
+    """
+
+    def __init__(self, module, output_fp32=True):
+        super(Bf16Autocast, self).__init__()
+        self.module = module
+        self.output_fp32 = output_fp32
+
+    def __getitem__(self, idx):
+        # AutoDecoder.headSmall reads toVoxelMd[0].weight
+        return self.module[idx]
+
+    def forward(self, x):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            output = self.module(x)
+        return output.float() if self.output_fp32 else output
+
+
+def quantize_decoder(decoder, precision):
+    """Convert an eager AutoDecoder to precision in place and return it.
+
+    Works in place so a freshly loaded fp32 decoder is never held twice.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+    if precision == "fp32":
+        return decoder
+    if isinstance(decoder, torch.jit.ScriptModule):
+        raise TypeError("quantize the eager checkpoint, not a TorchScript export")
+
+    decoder.eval()
+    # training-only per-sample latents
+    decoder.latent_vectors = nn.Parameter(torch.empty(0, decoder.latent_vectors.shape[1]),
+                                          requires_grad=False)
+    if precision == "int8":
+        decoder.fc = torch.ao.quantization.quantize_dynamic(
+            decoder.fc, {nn.Linear}, dtype=torch.qint8)
+    decoder.decoder = Bf16Autocast(decoder.decoder, output_fp32=False)
+    decoder.toVoxelMd = Bf16Autocast(decoder.toVoxelMd)
+    decoder.toVoxelBig = Bf16Autocast(decoder.toVoxelBig)
+    return decoder
@@ -0,0 +1,148 @@
+"""Shared model registry: load once, keep warm, evict under a RAM budget.
+
+Used by runtime.predictor and by 04.Run-time/predictshapes.py so a fracture
+event never pays for torch.load once its shape has been loaded.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+
+
+def module_nbytes(value):
+    """Approximate resident size of a module (or tuple of modules) in bytes."""
+    if isinstance(value, (tuple, list)):
+        return sum(module_nbytes(v) for v in value)
+    if not isinstance(value, torch.nn.Module):
+        return 0
+    total = 0
+    seen = set()
+    for tensor in list(value.parameters()) + list(value.buffers()):
+        if tensor.data_ptr() not in seen:
+            seen.add(tensor.data_ptr())
+            total += tensor.numel() * tensor.element_size()
+    # dynamically quantized layers keep their weights in packed params
+    for key, item in value.state_dict().items():
+        if "_packed_params" in key:
+            for tensor in item if isinstance(item, tuple) else (item,):
+                if isinstance(tensor, torch.Tensor):
+                    total += tensor.numel() * tensor.element_size()
+    # frozen TorchScript inlines its weights as graph constants
+    if isinstance(value, torch.jit.ScriptModule):
+        for name in value._c._method_names():
+            for node in getattr(value, name).graph.findAllNodes("prim::Constant"):
+                tensor = node.output().toIValue()
+                if isinstance(tensor, torch.Tensor) and tensor.data_ptr() not in seen:
+                    seen.add(tensor.data_ptr())
+                    total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """Thread-safe LRU of loaded models.
+
+    loader(key) returns the value to keep (e.g. an (encoder, decoder) pair);
+    sizeof(value) its size in bytes. When budget_bytes is set, least
+    recently used entries are evicted until the resident total fits; the
+    entry just requested is never evicted.
+    """
+
+    def __init__(self, loader, budget_bytes=None, sizeof=module_nbytes):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = OrderedDict()   # key -> (value, nbytes)
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _lookup(self, key, count):
+        # caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+        return None
+
+    def _evict(self, keep):
+        # caller holds self._lock
+        if not self.budget_bytes:
+            return
+        resident = sum(nbytes for _, nbytes in self._entries.values())
+        for key in list(self._entries):
+            if resident <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            resident -= self._entries.pop(key)[1]
+            self.evictions += 1
+
+    def get(self, key, _count=True):
+        """Return the model for key, loading it on first use."""
+        with self._lock:
+            value = self._lookup(key, _count)
+            if value is not None:
+                return value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # one loader per key; other threads asking for it wait here
+        with key_lock:
+            with self._lock:
+                value = self._lookup(key, _count)
+                if value is not None:
+                    return value
+            start = time.time()
+            value = self.loader(key)
+            elapsed = time.time() - start
+            nbytes = self.sizeof(value)
+            with self._lock:
+                if _count:
+                    self.misses += 1
+                self.loads += 1
+                self.load_seconds += elapsed
+                self._entries[key] = (value, nbytes)
+                self._evict(keep=key)
+        return value
+
+    def preload(self, keys):
+        """Warm the registry at startup; does not count towards the hit rate."""
+        for key in keys:
+            self.get(key, _count=False)
+
+    def evict(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def metrics(self):
+        """Load time, hit rate and residency counters as a plain dict."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": self.load_seconds,
+                "mean_load_seconds": self.load_seconds / self.loads if self.loads else 0.0,
+                "resident": {key: nbytes for key, (_, nbytes) in self._entries.items()},
+                "resident_bytes": sum(n for _, n in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+            }
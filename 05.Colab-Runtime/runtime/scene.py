@@ -1,13 +1,23 @@
-"""Scene preview + click-to-shoot ray casting for the game-style demo."""
+"""Scene preview + click-to-shoot ray casting for the game-style demo.
+
+Both run in one persistent DIRECT client (SceneClient) that keeps the target
+loaded, so a click does not reconnect and rebuild the target's shapes.
+"""
+
+import threading
 
 import numpy as np
 
 from .collision import SPHERE_RADIUS
+from .shapes import file_key, release, shape_cache
 
 WIDTH, HEIGHT = 640, 480
 YAW, PITCH, DISTANCE = 50.0, -25.0, 3.2
 FOV = 45.0
 SPAWN_DISTANCE = 2.6   # distance from the aim point back toward the camera
+TARGET_RGBA = (0.35, 0.75, 0.35, 1)
+AIM_RGBA = (1, 0.85, 0.1, 1)
+SPHERE_RGBA = (0.85, 0.2, 0.2, 1)
 
 
 def _matrices(p, width=WIDTH, height=HEIGHT):
@@ -37,40 +47,114 @@ def camera_ray(p, px, py, width=WIDTH, height=HEIGHT):
     return eye, world_dir
 
 
-def render_preview(target_obj, aim_world=None, sphere_pos=None,
-                   width=WIDTH, height=HEIGHT):
-    """Render the scene: target at origin, optional aim marker / sphere."""
-    import pybullet as p
+class SceneClient:
+    """One DIRECT client kept for preview renders and click ray casts.
 
-    cid = p.connect(p.DIRECT)
-    try:
-        vis_t = p.createVisualShape(p.GEOM_MESH, fileName=target_obj,
-                                    rgbaColor=[0.35, 0.75, 0.35, 1],
-                                    physicsClientId=cid)
-        p.createMultiBody(baseMass=0, baseVisualShapeIndex=vis_t,
-                          basePosition=[0, 0, 0], physicsClientId=cid)
-        if aim_world is not None:
-            vis_m = p.createVisualShape(p.GEOM_SPHERE, radius=0.05,
-                                        rgbaColor=[1, 0.85, 0.1, 1],
-                                        physicsClientId=cid)
-            p.createMultiBody(baseMass=0, baseVisualShapeIndex=vis_m,
-                              basePosition=list(aim_world), physicsClientId=cid)
-        if sphere_pos is not None:
-            vis_s = p.createVisualShape(p.GEOM_SPHERE, radius=SPHERE_RADIUS,
-                                        rgbaColor=[0.85, 0.2, 0.2, 1],
-                                        physicsClientId=cid)
-            p.createMultiBody(baseMass=0, baseVisualShapeIndex=vis_s,
-                              basePosition=list(sphere_pos), physicsClientId=cid)
-
-        view, proj = _matrices(p, width, height)
-        _, _, rgb, _, _ = p.getCameraImage(width, height, view, proj,
-                                           renderer=p.ER_TINY_RENDERER,
-                                           physicsClientId=cid)
+    The target stays loaded between calls (its shapes come from the
+    runtime.shapes cache and are rebuilt only when another mesh is shown);
+    markers are added for one render and removed again. Calls are serialized.
+    """
+
+    def __init__(self):
+        self.cid = None
+        self.target_key = None
+        self.target_body = None
+        self.marker_shapes = {}
+        self.lock = threading.Lock()
+
+    def _connect(self, p):
+        # caller holds self.lock
+        if self.cid is None or not p.isConnected(self.cid):
+            self.cid = p.connect(p.DIRECT)
+            release(self.cid)
+            self.target_key = None
+            self.target_body = None
+            self.marker_shapes = {}
+        return self.cid
+
+    def _load_target(self, p, target_obj):
+        # caller holds self.lock; one target at a time, at the origin
+        cid = self._connect(p)
+        key = file_key(target_obj)
+        if key != self.target_key:
+            if self.target_body is not None:
+                p.removeBody(self.target_body, physicsClientId=cid)
+            col_t, vis_t = shape_cache(cid).shapes(target_obj, rgba=TARGET_RGBA)
+            self.target_body = p.createMultiBody(baseMass=0, baseCollisionShapeIndex=col_t,
+                                                 baseVisualShapeIndex=vis_t,
+                                                 basePosition=[0, 0, 0], physicsClientId=cid)
+            self.target_key = key
+        return cid
+
+    def _marker(self, p, radius, rgba):
+        if (radius, rgba) not in self.marker_shapes:
+            self.marker_shapes[(radius, rgba)] = p.createVisualShape(
+                p.GEOM_SPHERE, radius=radius, rgbaColor=list(rgba), physicsClientId=self.cid)
+        return self.marker_shapes[(radius, rgba)]
+
+    def render(self, target_obj, aim_world=None, sphere_pos=None,
+               width=WIDTH, height=HEIGHT):
+        import pybullet as p
+
+        with self.lock:
+            cid = self._load_target(p, target_obj)
+            markers = []
+            try:
+                if aim_world is not None:
+                    markers.append(p.createMultiBody(
+                        baseMass=0, baseVisualShapeIndex=self._marker(p, 0.05, AIM_RGBA),
+                        basePosition=list(aim_world), physicsClientId=cid))
+                if sphere_pos is not None:
+                    markers.append(p.createMultiBody(
+                        baseMass=0, baseVisualShapeIndex=self._marker(p, SPHERE_RADIUS, SPHERE_RGBA),
+                        basePosition=list(sphere_pos), physicsClientId=cid))
+
+                view, proj = _matrices(p, width, height)
+                _, _, rgb, _, _ = p.getCameraImage(width, height, view, proj,
+                                                   renderer=p.ER_TINY_RENDERER,
+                                                   physicsClientId=cid)
+            finally:
+                for body in markers:
+                    p.removeBody(body, physicsClientId=cid)
         frame = np.reshape(np.asarray(rgb, dtype=np.uint8),
                            (height, width, 4))[:, :, :3]
         return frame
-    finally:
-        p.disconnect(cid)
+
+    def ray_test(self, target_obj, start, end):
+        """First hit of the segment start -> end on the target, or None."""
+        import pybullet as p
+
+        with self.lock:
+            cid = self._load_target(p, target_obj)
+            hits = p.rayTest(list(start), list(end), physicsClientId=cid)
+        if not hits or hits[0][0] < 0:
+            return None
+        return np.array(hits[0][3])
+
+    def close(self):
+        import pybullet as p
+
+        with self.lock:
+            if self.cid is not None and p.isConnected(self.cid):
+                release(self.cid)
+                p.disconnect(self.cid)
+            self.cid = None
+            self.target_key = None
+            self.target_body = None
+
+
+_scene_client = SceneClient()
+
+
+def scene_client():
+    """The process-wide SceneClient used by render_preview / click_to_shot."""
+    return _scene_client
+
+
+def render_preview(target_obj, aim_world=None, sphere_pos=None,
+                   width=WIDTH, height=HEIGHT):
+    """Render the scene: target at origin, optional aim marker / sphere."""
+    return scene_client().render(target_obj, aim_world, sphere_pos, width, height)
 
 
 def click_to_shot(target_obj, px, py, speed, width=WIDTH, height=HEIGHT):
@@ -80,21 +164,12 @@ def click_to_shot(target_obj, px, py, speed, width=WIDTH, height=HEIGHT):
     """
     import pybullet as p
 
-    cid = p.connect(p.DIRECT)
-    try:
-        col_t = p.createCollisionShape(p.GEOM_MESH, fileName=target_obj,
-                                       physicsClientId=cid)
-        p.createMultiBody(baseMass=0, baseCollisionShapeIndex=col_t,
-                          basePosition=[0, 0, 0], physicsClientId=cid)
-        eye, ray = camera_ray(p, px, py, width, height)
-        hits = p.rayTest(list(eye), list(eye + ray * 20.0), physicsClientId=cid)
-        if not hits or hits[0][0] < 0:
-            return None
-        hit_pos = np.array(hits[0][3])
-        spawn = hit_pos - ray * SPAWN_DISTANCE
-        vel = ray * float(speed)
-        return {"sphere_pos": spawn.tolist(),
-                "sphere_vel": vel.tolist(),
-                "hit_pos": hit_pos.tolist()}
-    finally:
-        p.disconnect(cid)
+    eye, ray = camera_ray(p, px, py, width, height)
+    hit_pos = scene_client().ray_test(target_obj, eye, eye + ray * 20.0)
+    if hit_pos is None:
+        return None
+    spawn = hit_pos - ray * SPAWN_DISTANCE
+    vel = ray * float(speed)
+    return {"sphere_pos": spawn.tolist(),
+            "sphere_vel": vel.tolist(),
+            "hit_pos": hit_pos.tolist()}
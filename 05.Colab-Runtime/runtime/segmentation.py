@@ -18,6 +18,13 @@ from skimage.segmentation import watershed
 ISOLEVEL = 0.03
 TOLERANCE = 3.0   # MorphoLibJ extended-minima tolerance (0..255 scale)
 MIN_VOXELS = {64: 50, 128: 50, 256: 500}
+GAUSSIAN_TRUNCATE = 4.0   # scipy's default
+
+# Adaptive resolution (predictor.decode_adaptive): a fragment of the 64^3
+# probe within DETAIL_RADIUS (object frame, which spans [-1, 1]) of an impact
+# and smaller than DETAIL_MIN_VOXELS needs the 256^3 head.
+DETAIL_RADIUS = 0.35
+DETAIL_MIN_VOXELS = 400
 
 
 def segment_volume(volume, max_value=1.0):
@@ -37,22 +44,50 @@ def segment_volume(volume, max_value=1.0):
     sdf = np.abs(data)
     relief = 255.0 - (sdf + 1.0) / 2.0 * 255.0
 
+    labels = watershed_relief(relief, interior)
+
+    # Drop noisy specks like the original (filtNoisy), ids compacted to 1..K
+    return relabel_fragments(labels, MIN_VOXELS.get(res, 50))
+
+
+def watershed_relief(relief, interior):
+    """Marker-controlled watershed of a 0-255 relief, with dams.
+
+    The scikit-image counterpart of the MorphoLibJ call chain
+    (extendedMinima -> imposeMinima -> componentsLabeling -> Watershed);
+    also the "skimage" backend of 04.Run-time/MorphoImageJ.py.
+    Returns int32 labels (0 = exterior / dams), specks not yet dropped.
+    """
     conn6 = ndi.generate_binary_structure(3, 1)
     minima = h_minima(relief, TOLERANCE, footprint=conn6)
     markers, n_markers = ndi.label(minima, structure=conn6)
     if n_markers == 0:
-        labels = interior.astype(np.int32)
-    else:
-        labels = watershed(relief, markers=markers, mask=interior,
-                           connectivity=conn6, watershed_line=True)
+        return interior.astype(np.int32)
+    return watershed(relief, markers=markers, mask=interior,
+                     connectivity=conn6, watershed_line=True).astype(np.int32, copy=False)
 
-    # Drop noisy specks like the original (filtNoisy)
-    min_voxels = MIN_VOXELS.get(res, 50)
-    ids, counts = np.unique(labels[labels > 0], return_counts=True)
-    for frag_id, count in zip(ids, counts):
-        if count < min_voxels:
-            labels[labels == frag_id] = 0
-    return labels
+
+def relabel_fragments(labels, min_voxels, fill=0, compact=True, first_label=1):
+    """Drop labels smaller than min_voxels in one bincount + lookup-table pass.
+
+    labels: integer array; values below first_label are background and
+    kept as they are.
+    fill: value given to the voxels of dropped labels.
+    compact: renumber the surviving labels to first_label.. in order.
+    Returns a new array of labels' dtype.
+    """
+    flat = labels.ravel()
+    lo = min(int(flat.min()), first_label) if flat.size else first_label
+    index = flat - lo if lo else flat
+    counts = np.bincount(index)
+    values = np.arange(lo, lo + len(counts))
+    fragment = values >= first_label
+    keep = ~fragment | (counts >= min_voxels)
+    lut = np.where(keep, values, fill).astype(labels.dtype)
+    if compact:
+        survivors = keep & fragment & (counts > 0)
+        lut[survivors] = np.arange(first_label, first_label + survivors.sum())
+    return lut[index].reshape(labels.shape)
 
 
 def _fragment_palette(n):
@@ -71,37 +106,136 @@ def _fragment_palette(n):
     return colors
 
 
-def extract_fragments(labels, smooth_sigma=1.0):
+def _to_grid(verts, values, origin, level):
+    """Crop-local marching-cubes vertices -> full-grid coordinates.
+
+    marching_cubes rounds vertices to float32 in crop coordinates; shifting
+    them afterwards would round a second time. Interpolated coordinates are
+    recomputed in float64 from the (identical) filtered values instead, so
+    they round exactly like a full-grid run.
+    """
+    origin = np.asarray(origin)
+    base = np.floor(verts).astype(np.intp)
+    out = (verts.astype(np.float64) + origin).astype(np.float32)
+    fractional = verts != base
+    # edge vertices; Lewiner's extra cell-centre vertices keep the plain shift
+    fractional[fractional.sum(1) != 1] = False
+    rows, axes = np.nonzero(fractional)
+    lower = base[rows]
+    upper = lower.copy()
+    upper[np.arange(len(rows)), axes] += 1
+    v0 = values[lower[:, 0], lower[:, 1], lower[:, 2]].astype(np.float64)
+    v1 = values[upper[:, 0], upper[:, 1], upper[:, 2]].astype(np.float64)
+    out[rows, axes] = base[rows, axes] + origin[axes] + (level - v0) / (v1 - v0)
+    return out
+
+
+def fragment_boxes(labels, smooth_sigma=1.0):
+    """(fragment id, bounding box) for every label > 0, in label order.
+
+    Boxes are padded past the Gaussian kernel radius: everything outside is
+    exactly 0 in the full-grid filter too, so meshing the box gives the same
+    smoothed values and marching-cubes vertices as meshing the whole grid.
+    """
+    ids = [int(i) for i in np.unique(labels) if i > 0]
+    boxes = ndi.find_objects(labels)
+    pad = (int(GAUSSIAN_TRUNCATE * smooth_sigma + 0.5) if smooth_sigma > 0 else 0) + 1
+    return [(frag_id,
+             tuple(slice(max(s.start - pad, 0), min(s.stop + pad, dim))
+                   for s, dim in zip(boxes[frag_id - 1], labels.shape)))
+            for frag_id in ids]
+
+
+def mesh_fragment(labels, frag_id, box, smooth_sigma=1.0):
+    """Mesh one fragment; the per-label work of extract_fragments.
+
+    Returns (vertices, faces, vertex_normals) of the processed, outward
+    facing mesh, or None when the fragment yields no usable surface. Plain
+    arrays so runtime.meshing workers can send them back cheaply.
+    """
+    res = labels.shape[0]
+    binary = (labels[box] == frag_id).astype(np.float32)
+    if smooth_sigma > 0:
+        binary = ndi.gaussian_filter(binary, sigma=smooth_sigma,
+                                     truncate=GAUSSIAN_TRUNCATE)
+    if binary.max() <= 0.5:
+        return None
+    try:
+        verts, faces, _, _ = marching_cubes(binary, level=0.5)
+    except (ValueError, RuntimeError):
+        return None
+    verts = _to_grid(verts, binary, [s.start for s in box], level=0.5)
+    verts = verts / res * 2.0 - 1.0
+    verts = verts[:, [1, 2, 0]]
+    mesh = trimesh.Trimesh(vertices=verts, faces=faces, process=True)
+    if mesh.is_empty or len(mesh.faces) < 8:
+        return None
+    if mesh.volume < 0:      # marching-cubes winding points inward here
+        mesh.invert()
+    return mesh.vertices, mesh.faces, mesh.vertex_normals
+
+
+def extract_fragments(labels, smooth_sigma=1.0, pool=None):
     """Marching-cubes one mesh per fragment label.
 
     Vertices are mapped to the same object frame as the runtime's vedo
     pipeline (scale to [-1,1] then rotate_x(180).rotate_y(-90).rotate_z(90),
     which reduces to the axis permutation (i,j,k) -> (j,k,i)).
+    pool: a runtime.meshing.MeshingPool to mesh fragments concurrently;
+    None uses the $DF_MESH_WORKERS pool if set, False forces sequential.
+    The result is the same either way.
     Returns list of trimesh.Trimesh with vertex colors.
     """
-    res = labels.shape[0]
-    ids = [i for i in np.unique(labels) if i > 0]
-    palette = _fragment_palette(max(len(ids), 1))
+    if pool is None:
+        from .meshing import default_pool
+        pool = default_pool()
+    jobs = fragment_boxes(labels, smooth_sigma)
+    palette = _fragment_palette(max(len(jobs), 1))
+
+    if not pool:
+        meshed = [mesh_fragment(labels, frag_id, box, smooth_sigma) for frag_id, box in jobs]
+    else:
+        meshed = pool.map(labels, jobs, smooth_sigma)
 
     fragments = []
-    for n, frag_id in enumerate(ids):
-        binary = (labels == frag_id).astype(np.float32)
-        if smooth_sigma > 0:
-            binary = ndi.gaussian_filter(binary, sigma=smooth_sigma)
-        if binary.max() <= 0.5:
-            continue
-        try:
-            verts, faces, _, _ = marching_cubes(binary, level=0.5)
-        except (ValueError, RuntimeError):
+    for n, result in enumerate(meshed):
+        if result is None:
             continue
-        verts = verts / res * 2.0 - 1.0
-        verts = verts[:, [1, 2, 0]]
-        mesh = trimesh.Trimesh(vertices=verts, faces=faces, process=True)
-        if mesh.is_empty or len(mesh.faces) < 8:
-            continue
-        if mesh.volume < 0:      # marching-cubes winding points inward here
-            mesh.invert()
-        mesh.vertex_normals      # cache so exporters write normals
+        vertices, faces, normals = result
+        # already merged and oriented by mesh_fragment
+        mesh = trimesh.Trimesh(vertices=vertices, faces=faces,
+                               vertex_normals=normals, process=False)
         mesh.visual.vertex_colors = palette[n % len(palette)]
         fragments.append(mesh)
     return fragments
+
+
+def object_to_voxel(points, res):
+    """Object-frame points -> voxel coordinates; inverse of extract_fragments' mapping."""
+    points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+    return (points[:, [2, 0, 1]] + 1.0) / 2.0 * res
+
+
+def needs_detail(labels, positions, radius=DETAIL_RADIUS, min_voxels=DETAIL_MIN_VOXELS):
+    """Whether a small fragment lies near any of the impact positions.
+
+    labels: segment_volume output of a coarse decode
+    positions: (3,) or (N, 3) impact points in the object frame
+    radius: in object-frame units; min_voxels: counted at labels' resolution
+    """
+    res = labels.shape[0]
+    sizes = np.bincount(labels.ravel())
+    r = radius / 2.0 * res
+    for center in object_to_voxel(positions, res):
+        lo = np.maximum(np.floor(center - r).astype(int), 0)
+        hi = np.minimum(np.ceil(center + r).astype(int) + 1, res)
+        if np.any(lo >= hi):
+            continue
+        window = labels[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]]
+        i, j, k = np.ogrid[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]]
+        ball = ((i - center[0]) ** 2 + (j - center[1]) ** 2
+                + (k - center[2]) ** 2) <= r * r
+        near = np.unique(window[ball & (window > 0)])
+        if near.size and (sizes[near] < min_voxels).any():
+            return True
+    return False
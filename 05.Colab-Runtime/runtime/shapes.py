@@ -0,0 +1,204 @@
+"""PyBullet mesh shapes built once per physics client, keyed by mesh hash.
+
+createCollisionShape / createVisualShape with fileName= re-parse the OBJ and
+rebuild the convex hull on every call. A ShapeCache creates the shapes of
+each distinct mesh once per client instead: identical meshes (the same
+target in every run, duplicate fragments) share one collision shape and, per
+colour, one visual shape.
+
+A mesh is a file path, a trimesh or a (vertices, faces) pair. Files are
+keyed by a hash of their bytes (memoized per path and mtime) and still
+handed to PyBullet by name, its own OBJ loader being the fastest way in;
+meshes in memory are keyed by a hash of their arrays and passed as arrays
+(the collision shape is the convex hull of the vertices, as PyBullet builds
+from an OBJ; the visual gets smooth vertex normals), so they never need an
+OBJ round trip.
+
+    cache = shape_cache(cid)
+    col, vis = cache.shapes(target_obj, rgba=[0.35, 0.75, 0.35, 1])
+
+Client ids are reused after p.disconnect: call release(cid) before
+disconnecting (or after p.resetSimulation) so a new client starts empty.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_FILES = 256   # memoized file hashes / parsed files
+
+_file_keys = OrderedDict()
+_file_arrays = OrderedDict()
+_files_lock = threading.Lock()
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _memo(table, path, build):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _files_lock:
+        if key in table:
+            table.move_to_end(key)
+            return table[key]
+    value = build(path)
+    with _files_lock:
+        table[key] = value
+        while len(table) > MAX_FILES:
+            table.popitem(last=False)
+    return value
+
+
+def _hash_file(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return "file:" + h.hexdigest()
+
+
+def _read_arrays(path):
+    import trimesh
+
+    mesh = trimesh.load(path, force="mesh", process=False)
+    return (np.asarray(mesh.vertices, dtype=np.float64),
+            np.asarray(mesh.faces, dtype=np.int32))
+
+
+def file_key(path):
+    """Content hash of a mesh file, computed once per (path, mtime)."""
+    return _memo(_file_keys, path, _hash_file)
+
+
+def load_arrays(path):
+    """(vertices, faces) of a mesh file, parsed once per (path, mtime)."""
+    return _memo(_file_arrays, path, _read_arrays)
+
+
+def mesh_key(vertices, faces):
+    """Content hash of a mesh's float64 vertices and int32 faces."""
+    h = hashlib.blake2b(digest_size=16)
+    for array, dtype in ((vertices, np.float64), (faces, np.int32)):
+        array = np.ascontiguousarray(array, dtype=dtype)
+        h.update(str(array.shape).encode())
+        h.update(array.tobytes())
+    return "mesh:" + h.hexdigest()
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def _arrays(source):
+    if hasattr(source, "vertices") and hasattr(source, "faces"):
+        vertices, faces = source.vertices, source.faces
+    else:
+        vertices, faces = source
+    return np.asarray(vertices, dtype=np.float64), np.asarray(faces, dtype=np.int32)
+
+
+def source_key(source):
+    """Cache key of a mesh file, trimesh or (vertices, faces) pair."""
+    if _is_path(source):
+        return file_key(source)
+    return mesh_key(*_arrays(source))
+
+
+def _vertex_normals(vertices, faces):
+    """Area-weighted vertex normals."""
+    corners = vertices[faces]
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    weights = np.repeat(face_normals, 3, axis=0)
+    normals = np.stack([np.bincount(faces.ravel(), weights[:, k], minlength=len(vertices))
+                        for k in range(3)], axis=1)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def _options(kwargs):
+    return tuple(sorted((k, str(v)) for k, v in kwargs.items()))
+
+
+class ShapeCache:
+    """Collision and visual shapes of one physics client, keyed by mesh hash."""
+
+    def __init__(self, client):
+        self.client = client
+        self._collision = {}
+        self._visual = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def collision(self, source, key=None, **kwargs):
+        """Collision shape (convex hull) of a mesh; kwargs as createCollisionShape."""
+        import pybullet as p
+
+        key = (key or source_key(source), _options(kwargs))
+        with self._lock:
+            if key in self._collision:
+                self.hits += 1
+                return self._collision[key]
+            self.misses += 1
+            if _is_path(source):
+                mesh = {"fileName": os.fspath(source)}
+            else:
+                mesh = {"vertices": _arrays(source)[0].tolist()}
+            shape = p.createCollisionShape(p.GEOM_MESH, physicsClientId=self.client,
+                                           **mesh, **kwargs)
+            self._collision[key] = shape
+            return shape
+
+    def visual(self, source, rgba=(1, 1, 1, 1), key=None, **kwargs):
+        """Visual shape of a mesh in one colour; kwargs as createVisualShape."""
+        import pybullet as p
+
+        key = (key or source_key(source), tuple(rgba), _options(kwargs))
+        with self._lock:
+            if key in self._visual:
+                self.hits += 1
+                return self._visual[key]
+            self.misses += 1
+            if _is_path(source):
+                mesh = {"fileName": os.fspath(source)}
+            else:
+                vertices, faces = _arrays(source)
+                mesh = {"vertices": vertices.tolist(), "indices": faces.ravel().tolist(),
+                        "normals": _vertex_normals(vertices, faces).tolist()}
+            shape = p.createVisualShape(p.GEOM_MESH, rgbaColor=list(rgba),
+                                        physicsClientId=self.client, **mesh, **kwargs)
+            self._visual[key] = shape
+            return shape
+
+    def shapes(self, source, rgba=(1, 1, 1, 1)):
+        """(collision, visual) shape ids of a mesh."""
+        key = source_key(source)
+        return self.collision(source, key), self.visual(source, rgba, key)
+
+    def clear(self):
+        """Forget every shape, e.g. after p.resetSimulation."""
+        with self._lock:
+            self._collision.clear()
+            self._visual.clear()
+
+    def metrics(self):
+        with self._lock:
+            return {"collision_shapes": len(self._collision), "visual_shapes": len(self._visual),
+                    "hits": self.hits, "misses": self.misses}
+
+
+def shape_cache(client):
+    """The ShapeCache of a physics client (created on first use)."""
+    with _caches_lock:
+        if client not in _caches:
+            _caches[client] = ShapeCache(client)
+        return _caches[client]
+
+
+def release(client):
+    """Drop a client's cache; call before disconnecting or after resetSimulation."""
+    with _caches_lock:
+        _caches.pop(client, None)
@@ -0,0 +1,100 @@
+"""Codebook-indexed cache of decoded GS-SDF volumes.
+
+AutoDecoder.Cook snaps every collision embedding to one row of the cookbook,
+so the volume returned by forwardMiddle / forwardBig only depends on
+(shape, codebook index, resolution). Impacts that land in an already decoded
+cell are served from here instead of re-running the transposed-conv stack.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+
+class VolumeCache:
+    """Bounded LRU of decoded volumes, optionally persisted as .npy files.
+
+    Keys are tuples such as (shape, codebook index, resolution). Cached
+    volumes are returned read-only and shared between callers.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, cache_dir=None):
+        self.max_bytes = int(max_bytes)
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._volumes = OrderedDict()
+        self._nbytes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        name = "-".join(re.sub(r"[^A-Za-z0-9_.]+", "_", str(k)) for k in key)
+        return os.path.join(self.cache_dir, name + ".npy")
+
+    def _remember(self, key, volume):
+        # caller holds the lock
+        if volume.nbytes > self.max_bytes:
+            return
+        if key in self._volumes:
+            self._nbytes -= self._volumes.pop(key).nbytes
+        self._volumes[key] = volume
+        self._nbytes += volume.nbytes
+        while self._nbytes > self.max_bytes:
+            _, old = self._volumes.popitem(last=False)
+            self._nbytes -= old.nbytes
+
+    def get(self, key):
+        """Return the cached volume for key, or None."""
+        with self._lock:
+            volume = self._volumes.get(key)
+            if volume is not None:
+                self._volumes.move_to_end(key)
+                self.hits += 1
+                return volume
+
+        if self.cache_dir:
+            path = self._path(key)
+            if os.path.exists(path):
+                volume = np.load(path)
+                volume.setflags(write=False)
+                with self._lock:
+                    self._remember(key, volume)
+                    self.hits += 1
+                return volume
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, volume):
+        """Store a decoded volume; returns the read-only cached array."""
+        volume = np.ascontiguousarray(volume)
+        volume.setflags(write=False)
+        with self._lock:
+            self._remember(key, volume)
+        if self.cache_dir:
+            path = self._path(key)
+            if not os.path.exists(path):
+                tmp = path + ".tmp.npy"
+                np.save(tmp, volume)
+                os.replace(tmp, path)
+        return volume
+
+    def clear(self):
+        with self._lock:
+            self._volumes.clear()
+            self._nbytes = 0
+
+    def __len__(self):
+        return len(self._volumes)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
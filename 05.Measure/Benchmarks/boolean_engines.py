@@ -0,0 +1,82 @@
+"""Fragment carving: pyMeshBool engines on one segmentation surface.
+
+Runs process_mesh_split_boolean on the same split surface and target mesh
+with the trimesh engine and with manifold3d (per part and batched), serially
+and on the persistent BooleanWorkerPool (`--workers`, steady state: the
+second pooled run, once the pool is up and holds B). Checks that every run
+writes the same fragments (face count and volume) and prints total and
+per-part boolean times from each run's log-mb-py.txt (parts the inside /
+outside prefilter resolves count as parts too; `--no-prefilter` measures
+every part's boolean).
+Use the seg/vol_1.obj and target .obj of a 04.Run-time run:
+
+    python 05.Measure/Benchmarks/boolean_engines.py <work_path>/seg/vol_1.obj squirrel.obj --workers 8
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import trimesh
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '04.Run-time', 'MeshBoolean'))
+from pyMeshBool import process_mesh_split_boolean
+
+
+def run(seg_path, obj_path, out_dir, min_meshes, engine, batch, workers, prefilter):
+    for _ in range(2 if workers else 1):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_mesh_split_boolean(seg_path, obj_path, out_dir, min_meshes,
+                                       use_parallel=bool(workers), engine=engine, batch=batch,
+                                       workers=workers, prefilter=prefilter)
+        elapsed = time.time() - start
+    files = sorted(glob.glob(os.path.join(out_dir, "vol_*.obj")),
+                   key=lambda f: int(re.findall(r"(\d+)\.obj$", f)[0]))
+    with open(os.path.join(out_dir, "log-mb-py.txt")) as log_file:
+        parts = [float(t) for t in re.findall(r"boolean time: ([\d.]+)", log_file.read())]
+    return elapsed, [trimesh.load(f, force="mesh") for f in files], parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("seg", help="split surface (seg/vol_1.obj)")
+    parser.add_argument("obj", help="target mesh B")
+    parser.add_argument("--min-meshes", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4, help="pool size (0: skip pooled runs)")
+    parser.add_argument("--no-prefilter", dest="prefilter", action="store_false",
+                        help="run the boolean on parts fully inside / outside B too")
+    args = parser.parse_args()
+
+    runs = [("trimesh", False, 0), ("manifold", False, 0), ("manifold", True, 0)]
+    if args.workers:
+        runs += [("trimesh", False, args.workers), ("manifold", False, args.workers)]
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for engine, batch, workers in runs:
+            out_dir = os.path.join(tmp, "%s-%d-%d" % (engine, batch, workers))
+            results[engine, batch, workers] = run(args.seg, args.obj, out_dir, args.min_meshes,
+                                                  engine, batch, workers, args.prefilter)
+
+    _, reference, _ = results["trimesh", False, 0]
+    print("%d cores" % os.cpu_count())
+    print("%-18s %9s %7s %12s %12s %6s" % ("engine", "total", "parts", "part mean", "part max", "same"))
+    for (engine, batch, workers), (elapsed, meshes, parts) in results.items():
+        same = len(meshes) == len(reference) and all(
+            len(a.faces) == len(b.faces) and abs(a.volume - b.volume) < 1e-9
+            for a, b in zip(reference, meshes))
+        print("%-18s %8.2fs %7d %11.3fs %11.3fs %6s" % (
+            engine + (" batch" if batch else "") + (" x%d" % workers if workers else ""), elapsed, len(parts),
+            sum(parts) / len(parts) if parts else 0.0, max(parts, default=0.0), same))
+
+
+if __name__ == "__main__":
+    main()
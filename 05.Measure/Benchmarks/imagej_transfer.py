@@ -0,0 +1,102 @@
+"""Watershed volume transfer: pyimagej conversion vs ImageJService slice arrays.
+
+Moves a synthetic 0-255 relief into the JVM and a label stack back out, once
+through the chain processCagedSDFSeg used before (ij.py.to_java ->
+to_imageplus, ij.py.from_java -> np.array) and once through
+ImageJService.toImageStack / fromImageStack, and reports latency, peak
+Python-side allocation (tracemalloc) and JVM heap growth of each. Checks that
+the float32 stacks hold the same pixels and that both label paths agree.
+Needs Fiji with MorphoLibJ (fiji_path in config.yaml, or --fiji). Until its
+numbers are recorded, imagej_transfer keeps the pyimagej chain by default.
+
+    python 05.Measure/Benchmarks/imagej_transfer.py --res 256
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import ndimage as ndi
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '04.Run-time'))
+from ImageJService import ImageJService
+from utils_config import load_config
+
+
+def synthetic_relief(res, seed=0):
+    rng = np.random.default_rng(seed)
+    field = ndi.gaussian_filter(rng.standard_normal((res, res, res)), res / 32)
+    field = (field - field.min()) / (field.max() - field.min())
+    return field * 255.0   # float64, like getNormForSdf
+
+
+def jvm_used(runtime, system):
+    system.gc()
+    return runtime.totalMemory() - runtime.freeMemory()
+
+
+def measure(fn, runtime, system):
+    base = jvm_used(runtime, system)
+    tracemalloc.start()
+    start = time.time()
+    result = fn()
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak, jvm_used(runtime, system) - base
+
+
+def stack_pixels(stack):
+    return np.stack([np.asarray(stack.getPixels(z + 1)).reshape(stack.getHeight(), stack.getWidth())
+                     for z in range(stack.getSize())])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--res", type=int, default=256)
+    parser.add_argument("--fiji", default=None, help="Fiji.app path (default: fiji_path in config.yaml)")
+    args = parser.parse_args()
+
+    service = ImageJService(args.fiji or load_config()["fiji_path"], transferType="float32").start()
+    ij = service.ij
+    import scyjava
+    runtime = scyjava.jimport('java.lang.Runtime').getRuntime()
+    system = scyjava.jimport('java.lang.System')
+    ImagePlus = scyjava.jimport('ij.ImagePlus')
+
+    relief = synthetic_relief(args.res)
+    labels = np.random.default_rng(1).integers(0, 600, size=relief.shape).astype(np.int32)
+    label_stack = service.toImageStack(labels.astype(np.float32))   # 32-bit labels, as Watershed returns
+    print("%d^3 relief, %.0f MB as float64" % (args.res, relief.nbytes / 1024 ** 2))
+
+    rows = []
+    legacy_in, t, py, jvm = measure(
+        lambda: ij.py.to_imageplus(ij.py.to_java(relief)).getImageStack(), runtime, system)
+    rows.append(("to_java + to_imageplus", t, py, jvm))
+    stack_in, t, py, jvm = measure(lambda: service.toImageStack(relief), runtime, system)
+    rows.append(("toImageStack float32", t, py, jvm))
+    service.transferType = "uint8"
+    _, t, py, jvm = measure(lambda: service.toImageStack(relief), runtime, system)
+    rows.append(("toImageStack uint8", t, py, jvm))
+    service.transferType = "float32"
+
+    legacy_out, t, py, jvm = measure(
+        lambda: np.array(ij.py.from_java(ImagePlus("labels", label_stack))), runtime, system)
+    rows.append(("from_java + np.array", t, py, jvm))
+    labels_out, t, py, jvm = measure(lambda: service.fromImageStack(label_stack), runtime, system)
+    rows.append(("fromImageStack", t, py, jvm))
+
+    assert np.array_equal(stack_pixels(legacy_in), stack_pixels(stack_in)), "input stacks differ"
+    assert np.array_equal(legacy_out.astype(np.int32), labels_out), "label volumes differ"
+    assert np.array_equal(labels_out, labels), "label round trip differs"
+
+    print("%-24s %9s %12s %12s" % ("path", "seconds", "python MB", "JVM MB"))
+    for name, t, py, jvm in rows:
+        print("%-24s %9.3f %12.1f %12.1f" % (name, t, py / 1024 ** 2, jvm / 1024 ** 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Fracture handoff: OBJ round trips versus the in-memory pipeline.
+
+Times the carving and physics-loading half of one 04.Run-time fracture for an
+isosurface (the seg/vol_1.obj of a run) and a target mesh, both ways:
+
+    files      vol_1.obj written, re-read by pyMeshBool, objs/vol_*.obj
+               written, globbed and parsed again by PyBullet
+    in memory  the vedo mesh handed to pyMeshBool, fragments handed to PyBullet
+               as arrays; OBJ export on the export thread (its drain time is
+               reported separately, it overlaps the simulation in a real run)
+
+    python 05.Measure/Benchmarks/in_memory_pipeline.py <work_path>/seg/vol_1.obj squirrel.obj
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pybullet as p
+import vedo
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '04.Run-time'))
+from DynamicObject import BreakableObject
+from MeshBoolean.pyMeshBool import process_mesh_split_boolean, wait_exports
+
+
+def breakable(obj_path, client):
+    return BreakableObject("target", [0, 0, 0], [0, 0, 0, 1], [0, 0, 0], [0, 0, 0], obj_path,
+                           [0, 1, 0, 1], 1, -1, -1, "", "", None, 1, 1.0, False, ".", client)
+
+
+def run_files(seg_path, obj_path, work, min_meshes, client):
+    start = time.time()
+    vedo.load(seg_path).write(os.path.join(work, "vol_1.obj"))
+    process_mesh_split_boolean(os.path.join(work, "vol_1.obj"), obj_path, os.path.join(work, "objs"),
+                               min_meshes, export="sync")
+    carved = time.time()
+    obj = breakable(obj_path, client)
+    obj.loadFragments(os.path.join(work, "objs", "*.obj"), client)
+    return carved - start, time.time() - carved, len(obj.fracList), 0.0
+
+
+def run_memory(seg_path, obj_path, work, min_meshes, client):
+    mesh = vedo.load(seg_path)
+    start = time.time()
+    fragments, _ = process_mesh_split_boolean(mesh, obj_path, os.path.join(work, "objs"),
+                                              min_meshes, export="async")
+    carved = time.time()
+    obj = breakable(obj_path, client)
+    obj.loadFragmentMeshes(fragments, client)
+    loaded = time.time()
+    wait_exports()
+    return carved - start, loaded - carved, len(obj.fracList), time.time() - loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("seg", help="isosurface (seg/vol_1.obj)")
+    parser.add_argument("obj", help="target mesh B")
+    parser.add_argument("--min-meshes", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    client = p.connect(p.DIRECT)
+    rows = []
+    for name, fn in (("files", run_files), ("in memory", run_memory)):
+        times = []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as work, contextlib.redirect_stdout(io.StringIO()):
+                times.append(fn(args.seg, args.obj, work, args.min_meshes, client))
+        best = min(times, key=lambda t: t[0] + t[1])
+        rows.append("%-10s %8.3fs %8.3fs %8.3fs %6d %8.3fs" % (
+            name, best[0], best[1], best[0] + best[1], best[2], best[3]))
+    p.disconnect(client)
+
+    print("%-10s %9s %9s %9s %6s %9s" % ("handoff", "carve", "physics", "total", "frags", "export"))
+    print("\n".join(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Fragment meshing: sequential extract_fragments vs runtime.meshing.MeshingPool.
+
+Partitions a sphere into Voronoi fragments (like a segmented GS-SDF) and
+meshes it sequentially and through process / thread pools of each requested
+size. Every pooled run is checked against the sequential meshes; the first
+call of each pool includes its start-up, the best of the remaining repeats
+is reported as steady state.
+
+    python 05.Measure/Benchmarks/meshing_pool.py --res 256 --fragments 32 --workers 4 8 16
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import ndimage as ndi
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '05.Colab-Runtime'))
+from runtime.meshing import MeshingPool
+from runtime.segmentation import extract_fragments
+
+
+def synthetic_labels(res, fragments, seed=0):
+    rng = np.random.default_rng(seed)
+    seeds = np.zeros((res, res, res), np.int32)
+    points = rng.integers(res // 8, res - res // 8, size=(fragments, 3))
+    seeds[points[:, 0], points[:, 1], points[:, 2]] = np.arange(1, fragments + 1)
+    _, nearest = ndi.distance_transform_edt(seeds == 0, return_indices=True)
+    labels = seeds[nearest[0], nearest[1], nearest[2]]
+    ax = (np.arange(res) + 0.5) / res * 2 - 1
+    x, y, z = np.meshgrid(ax, ax, ax, indexing="ij")
+    labels[x ** 2 + y ** 2 + z ** 2 > 0.8 ** 2] = 0
+    return labels
+
+
+def same(a, b):
+    return len(a) == len(b) and all(
+        np.array_equal(x.vertices, y.vertices) and np.array_equal(x.faces, y.faces)
+        for x, y in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--res", type=int, default=256)
+    parser.add_argument("--fragments", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    labels = synthetic_labels(args.res, args.fragments)
+    print("%d^3 grid, %d fragments, %d cores" % (
+        args.res, len(np.unique(labels)) - 1, os.cpu_count()))
+
+    start = time.time()
+    reference = extract_fragments(labels, pool=False)
+    sequential = time.time() - start
+    print("sequential            %8.3f s" % sequential)
+
+    for kind in ("process", "thread"):
+        for workers in args.workers:
+            with MeshingPool(workers, kind) as pool:
+                times = []
+                for _ in range(args.repeat):
+                    start = time.time()
+                    meshes = extract_fragments(labels, pool=pool)
+                    times.append(time.time() - start)
+                    assert same(meshes, reference), "%s pool differs from sequential" % kind
+            print("%-7s x%-3d first %6.3f s   steady %6.3f s   x%.2f" % (
+                kind, workers, times[0], min(times[1:] or times), sequential / min(times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Accuracy of the reduced-precision decoders against fp32.
+
+For a sample of cookbook entries of every shape, decodes the volume with each
+precision of runtime.quantize, segments it with runtime.segmentation and
+reports against the fp32 result:
+
+    fragments  fp32 / reduced fragment counts (and how many entries differ)
+    solid IoU  IoU of the interior (label > 0) voxels
+    frag IoU   mean over fp32 fragments of the IoU with the best-overlapping
+               reduced fragment
+    decode     mean decode time per entry, and the resident model size
+
+    python 05.Measure/Benchmarks/quantized_accuracy.py --codes 16
+    python 05.Measure/Benchmarks/quantized_accuracy.py squirrel --resolution 256
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '05.Colab-Runtime'))
+from runtime.predictor import SHAPES, decode_code, load_models, model_metrics
+from runtime.quantize import PRECISIONS
+from runtime.segmentation import segment_volume
+
+
+def fragment_iou(reference, labels):
+    """Mean best-match IoU of the fragments of reference within labels."""
+    ious = []
+    n = int(labels.max()) + 1
+    for frag_id in np.unique(reference[reference > 0]):
+        mask = reference == frag_id
+        overlap = np.bincount(labels[mask].ravel(), minlength=n)
+        overlap[0] = 0
+        best = int(overlap.argmax())
+        if overlap[best] == 0:
+            ious.append(0.0)
+            continue
+        union = mask.sum() + (labels == best).sum() - overlap[best]
+        ious.append(overlap[best] / union)
+    return float(np.mean(ious)) if ious else 1.0
+
+
+def solid_iou(reference, labels):
+    a, b = reference > 0, labels > 0
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def decode_timed(shape, code_idx, resolution, precision):
+    start = time.time()
+    volume = decode_code(shape, code_idx, resolution=resolution, use_cache=False,
+                         precision=precision)
+    return volume, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("shapes", nargs="*", default=SHAPES)
+    parser.add_argument("--codes", type=int, default=8, help="cookbook entries per shape")
+    parser.add_argument("--resolution", type=int, default=128, choices=[128, 256])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print("%-9s %-5s %12s %6s %9s %9s %9s %9s" % (
+        "shape", "prec", "fragments", "diff", "solidIoU", "fragIoU", "decode", "modelMB"))
+    for shape in args.shapes:
+        _encoder, decoder = load_models(shape, "fp32")
+        n_codes = int(decoder.cookbook.shape[0])
+        codes = rng.choice(n_codes, size=min(args.codes, n_codes), replace=False)
+
+        reference = {}
+        timings = {precision: [] for precision in PRECISIONS}
+        for code_idx in codes:
+            volume, elapsed = decode_timed(shape, code_idx, args.resolution, "fp32")
+            timings["fp32"].append(elapsed)
+            reference[code_idx] = segment_volume(volume)
+
+        for precision in PRECISIONS:
+            counts, solid, frag, differ = [], [], [], 0
+            for code_idx in codes:
+                ref = reference[code_idx]
+                if precision == "fp32":
+                    labels = ref
+                else:
+                    volume, elapsed = decode_timed(shape, code_idx, args.resolution, precision)
+                    timings[precision].append(elapsed)
+                    labels = segment_volume(volume)
+                n_ref = len(np.unique(ref[ref > 0]))
+                n_out = len(np.unique(labels[labels > 0]))
+                counts.append((n_ref, n_out))
+                differ += n_ref != n_out
+                solid.append(solid_iou(ref, labels))
+                frag.append(fragment_iou(ref, labels))
+            resident = model_metrics()["resident"]
+            counts = np.array(counts)
+            print("%-9s %-5s %5.1f/%5.1f %3d/%-2d %9.4f %9.4f %8.3fs %9.1f" % (
+                shape, precision, counts[:, 0].mean(), counts[:, 1].mean(), differ, len(codes),
+                np.mean(solid), np.mean(frag), np.mean(timings[precision]),
+                resident.get((shape, precision), 0) / 1024 ** 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Parity of the 04.Run-time segmentation backends (MorphoImageJ.segmentLabels).
+
+For a sample of cookbook entries of every shape, decodes the fp32 volume,
+prepares the relief exactly as processCagedSDFSeg does and segments it with
+each backend. Every backend is reported against the first one:
+
+    fragments  reference / backend fragment counts (and how many entries differ)
+    solid IoU  IoU of the fragment (label > 0) voxels
+    frag IoU   mean over reference fragments of the IoU with the
+               best-overlapping backend fragment
+    time       mean segmentation wall time per entry (the first imagej call
+               also pays for the JVM start, which is excluded)
+
+    python 05.Measure/Benchmarks/segmentation_parity.py --codes 8
+    python 05.Measure/Benchmarks/segmentation_parity.py squirrel --resolution 256
+    python 05.Measure/Benchmarks/segmentation_parity.py --backends skimage   # no Fiji
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '05.Colab-Runtime'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '04.Run-time'))
+from runtime.predictor import SHAPES, decode_code, load_models
+from runtime.segmentation import ISOLEVEL, MIN_VOXELS
+from MorphoImageJ import SegmentationBackends, getMaskForSdf, getNormForSdf, segmentLabels
+
+
+def fragment_iou(reference, labels):
+    """Mean best-match IoU of the fragments of reference within labels."""
+    labels = np.maximum(labels, 0)
+    ious = []
+    n = int(labels.max()) + 1
+    for frag_id in np.unique(reference[reference > 0]):
+        mask = reference == frag_id
+        overlap = np.bincount(labels[mask].ravel(), minlength=n)
+        overlap[0] = 0
+        best = int(overlap.argmax())
+        if overlap[best] == 0:
+            ious.append(0.0)
+            continue
+        union = mask.sum() + (labels == best).sum() - overlap[best]
+        ious.append(overlap[best] / union)
+    return float(np.mean(ious)) if ious else 1.0
+
+
+def solid_iou(reference, labels):
+    a, b = reference > 0, labels > 0
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def segment_timed(volume, backend, max_value=1.0):
+    # processCagedSDFSeg's preparation of the relief and mask
+    data = volume + ISOLEVEL / max_value
+    mask = getMaskForSdf(data)
+    discrete = getNormForSdf(data)
+    start = time.time()
+    labels = segmentLabels(discrete, mask, MIN_VOXELS.get(volume.shape[0], 50), backend)
+    return labels, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("shapes", nargs="*", default=SHAPES)
+    parser.add_argument("--codes", type=int, default=8, help="cookbook entries per shape")
+    parser.add_argument("--resolution", type=int, default=128, choices=[64, 128, 256])
+    parser.add_argument("--backends", nargs="+", default=["imagej", "skimage"],
+                        choices=list(SegmentationBackends), help="the first one is the reference")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if "imagej" in args.backends:
+        from ImageJService import getImageJService
+        getImageJService().start()
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for shape in args.shapes:
+        _encoder, decoder = load_models(shape, "fp32")
+        n_codes = int(decoder.cookbook.shape[0])
+        codes = rng.choice(n_codes, size=min(args.codes, n_codes), replace=False)
+
+        results = {backend: [] for backend in args.backends}
+        for code_idx in codes:
+            volume = decode_code(shape, code_idx, resolution=args.resolution,
+                                 use_cache=False, precision="fp32")
+            for backend in args.backends:
+                results[backend].append(segment_timed(volume, backend))
+
+        reference = results[args.backends[0]]
+        for backend in args.backends:
+            counts, solid, frag, differ = [], [], [], 0
+            for (ref, _), (labels, _) in zip(reference, results[backend]):
+                n_ref = len(np.unique(ref[ref > 0]))
+                n_out = len(np.unique(labels[labels > 0]))
+                counts.append((n_ref, n_out))
+                differ += n_ref != n_out
+                solid.append(solid_iou(ref, labels))
+                frag.append(fragment_iou(ref, labels))
+            counts = np.array(counts)
+            rows.append("%-9s %-8s %5.1f/%5.1f %3d/%-2d %9.4f %9.4f %8.3fs" % (
+                shape, backend, counts[:, 0].mean(), counts[:, 1].mean(), differ, len(codes),
+                np.mean(solid), np.mean(frag), np.mean([t for _, t in results[backend]])))
+
+    print("%-9s %-8s %12s %6s %9s %9s %9s" % (
+        "shape", "backend", "fragments", "diff", "solidIoU", "fragIoU", "time"))
+    print("\n".join(rows))
+
+
+if __name__ == "__main__":
+    main()
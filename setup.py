@@ -137,7 +137,23 @@ def generate_config_yaml(foundation_path):
         "source_runtime_path": "${foundation_path}/04.Run-time",
         "use_houdini": False,
         "houdini_path": "/Applications/Houdini/Houdini20.5.584/Frameworks/Python.framework/Versions/3.11/bin/python3.11",
-        "houdini_libs": "/Applications/Houdini/Houdini20.5.584/Frameworks/Houdini.framework/Versions/Current/Resources/houdini/python3.11libs/"
+        "houdini_libs": "/Applications/Houdini/Houdini20.5.584/Frameworks/Houdini.framework/Versions/Current/Resources/houdini/python3.11libs/",
+        "volume_cache_mb": 512,
+        "volume_cache_path": "",
+        "fracture_library_path": "",
+        "model_memory_budget_mb": 0,
+        "meshing_workers": 1,
+        "imagej_workers": 1,
+        "imagej_transfer": "pyimagej",
+        "segmentation_backend": "skimage",
+        "boolean_engine": "manifold",
+        "boolean_batch": False,
+        "boolean_workers": 1,
+        "boolean_prefilter": True,
+        "in_memory_pipeline": False,
+        "export_fragments": True,
+        "houdini_persistent": False,
+        "houdini_backend": "houdini"
     }
     
     # Write config to file